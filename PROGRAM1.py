@@ -2,10 +2,792 @@ import tkinter as tk
 from tkinter import ttk 
 from tkinter import simpledialog 
 import math 
+import os
+import random
+import time
+import threading
 from collections import deque 
 import json # Added for saving json
+import gzip
 from tkinter import filedialog 
 from tkinter import font 
+from PROGRAM2 import (ConversionCache, DFAMinimizer, SubsetConstructor, default_cache_directory, dfa_to_json_data,
+                      expand_to_minterms, format_reduction_stats, format_subset_name, has_char_classes,
+                      merge_class_transitions,
+                      nfa_fingerprint, nfa_to_json_data, open_automaton_file, reduce_nfa, regex_to_nfa,
+                      remove_epsilon, split_symbol_list, temporary_path, write_automaton_json)
+
+# Level-of-detail stages, from most to least detailed
+LOD_FULL = 0            # curved edges, edge labels and state names
+LOD_NO_LABELS = 1       # curved edges without any text
+LOD_STRAIGHT_EDGES = 2  # parallel edges merged into one straight line, smaller circles
+LOD_CLUSTERS = 3        # dense areas collapsed into one cluster marker
+
+
+class RenderScheduler:
+    """
+    Coalesces drag, pan and zoom events so the graph is redrawn at most once
+    per frame. Tk can deliver <B1-Motion> and <MouseWheel> events much faster
+    than a large graph can be redrawn, so events only record what changed and
+    a single frame callback applies everything that piled up since the last one.
+    """
+
+    def __init__(self, widget, frame_callback, target_fps=60, stats_window=120):
+        self.widget = widget
+        self.frame_callback = frame_callback
+        self.set_target_fps(target_fps)
+
+        self._after_id = None
+        self._last_frame_end = 0.0
+        self._reset_pending()
+
+        # --- Frame statistics ---
+        self.frame_times = deque(maxlen=stats_window) # seconds spent per frame
+        self.frame_count = 0
+        self.events_received = 0
+        self.events_coalesced = 0
+
+    def _reset_pending(self):
+        self.pending_moves = {}          # item -> [dx, dy]
+        self.pending_pan = [0.0, 0.0]
+        self.pending_zoom = None         # (scale, tx, ty): x' = scale * x + t
+        self.pending_redraw = False
+        self._pending_events = 0
+
+    def set_target_fps(self, target_fps):
+        """Changes the frame cap. Takes effect from the next scheduled frame."""
+        if target_fps <= 0:
+            raise ValueError("target_fps must be positive.")
+        self.target_fps = target_fps
+        self.frame_interval = 1.0 / target_fps
+
+    def has_pending(self):
+        return bool(self.pending_moves or self.pending_pan != [0.0, 0.0]
+                    or self.pending_zoom or self.pending_redraw)
+
+    # --- Event recording ---
+    def request_move(self, item, dx, dy):
+        """Queue a drag of a single canvas item."""
+        move = self.pending_moves.setdefault(item, [0.0, 0.0])
+        move[0] += dx
+        move[1] += dy
+        self._note_event()
+
+    def request_pan(self, dx, dy):
+        """Queue a pan of everything inside the drop target."""
+        self.pending_pan[0] += dx
+        self.pending_pan[1] += dy
+        self._note_event()
+
+    def request_zoom(self, factor, x, y):
+        """
+        Queue a zoom by 'factor' around canvas point (x, y).
+        Consecutive zooms are composed into one affine map, so any number of
+        wheel ticks costs a single scale pass.
+        """
+        # Zoom around (x, y): p' = factor * p + (1 - factor) * (x, y)
+        tx, ty = (1 - factor) * x, (1 - factor) * y
+        if self.pending_zoom is None:
+            self.pending_zoom = (factor, tx, ty)
+        else:
+            s, ptx, pty = self.pending_zoom
+            self.pending_zoom = (factor * s, factor * ptx + tx, factor * pty + ty)
+        self._note_event()
+
+    def request_redraw(self):
+        """Queue a plain redraw with no geometry change."""
+        self.pending_redraw = True
+        self._note_event()
+
+    def _note_event(self):
+        self.events_received += 1
+        self._pending_events += 1
+        self._schedule()
+
+    # --- Frame scheduling ---
+    def _schedule(self):
+        if self._after_id is not None:
+            return # A frame is already on its way; this event rides along.
+        wait = self.frame_interval - (time.perf_counter() - self._last_frame_end)
+        if wait <= 0:
+            self._after_id = self.widget.after_idle(self._run_frame)
+        else:
+            self._after_id = self.widget.after(max(1, int(wait * 1000)), self._run_frame)
+
+    def _run_frame(self):
+        self._after_id = None
+        self.flush()
+
+    def flush(self):
+        """
+        Apply all pending changes right now. Called by the frame timer, and
+        directly by handlers (e.g. mouse release) that need an up-to-date canvas.
+        """
+        if self._after_id is not None:
+            try:
+                self.widget.after_cancel(self._after_id)
+            except tk.TclError:
+                pass
+            self._after_id = None
+
+        if not self.has_pending():
+            return
+
+        moves, pan, zoom = self.pending_moves, tuple(self.pending_pan), self.pending_zoom
+        event_count = self._pending_events
+        self._reset_pending()
+
+        start = time.perf_counter()
+        self.frame_callback(moves, pan, zoom)
+        end = time.perf_counter()
+
+        self._last_frame_end = end
+        self.frame_times.append(end - start)
+        self.frame_count += 1
+        self.events_coalesced += max(0, event_count - 1)
+
+    def cancel(self):
+        """Drop any pending work (used when the graph is cleared)."""
+        if self._after_id is not None:
+            try:
+                self.widget.after_cancel(self._after_id)
+            except tk.TclError:
+                pass
+            self._after_id = None
+        self._reset_pending()
+
+    def frame_stats(self):
+        """Returns frame-time statistics (in milliseconds) over the recent window."""
+        times = sorted(self.frame_times)
+        if not times:
+            return {
+                "frames": self.frame_count, "events": self.events_received,
+                "coalesced": self.events_coalesced, "target_fps": self.target_fps,
+                "avg_ms": 0.0, "p95_ms": 0.0, "max_ms": 0.0
+            }
+        p95_index = min(len(times) - 1, int(len(times) * 0.95))
+        return {
+            "frames": self.frame_count,
+            "events": self.events_received,
+            "coalesced": self.events_coalesced,
+            "target_fps": self.target_fps,
+            "avg_ms": 1000 * sum(times) / len(times),
+            "p95_ms": 1000 * times[p95_index],
+            "max_ms": 1000 * times[-1]
+        }
+
+
+# --- Automatic Layout ---
+# Used for automata that come without "coords" (e.g. the DFAs PROGRAM2 saves).
+# Both layouts are pure functions of names/edges so they can run off the UI thread.
+
+def compute_bfs_depths(names, edges, start=None):
+    """
+    BFS depth of every state. States not reachable from 'start' get depths
+    from further BFS runs rooted at the first unreached state.
+    """
+    successors = {n: [] for n in names}
+    for src, dest in edges:
+        if src in successors and dest in successors:
+            successors[src].append(dest)
+
+    depth = {}
+    roots = ([start] if start in successors else []) + list(names)
+    for root in roots:
+        if root in depth:
+            continue
+        depth[root] = 0
+        q = deque([root])
+        while q:
+            current = q.popleft()
+            for nxt in successors[current]:
+                if nxt not in depth:
+                    depth[nxt] = depth[current] + 1
+                    q.append(nxt)
+    return depth
+
+def is_mostly_forward(names, edges, start=None, threshold=0.7):
+    """True if most non-loop edges go from a shallower BFS layer to a deeper one."""
+    depth = compute_bfs_depths(names, edges, start)
+    forward = total = 0
+    for src, dest in edges:
+        if src == dest or src not in depth or dest not in depth:
+            continue
+        total += 1
+        if depth[src] < depth[dest]:
+            forward += 1
+    return total == 0 or forward / total >= threshold
+
+def layered_layout(names, edges, start=None, layer_gap=160, row_gap=100, origin=(100, 100)):
+    """
+    Places states in columns by BFS depth from the start state, ordering each
+    column by the barycenter of its neighbours to cut down on crossings.
+    Runs in O(states + edges) per sweep.
+    """
+    depth = compute_bfs_depths(names, edges, start)
+    layers = {}
+    for name in names:
+        layers.setdefault(depth[name], []).append(name)
+
+    predecessors = {n: [] for n in names}
+    successors = {n: [] for n in names}
+    for src, dest in edges:
+        if src in depth and dest in depth and src != dest:
+            successors[src].append(dest)
+            predecessors[dest].append(src)
+
+    order = {}
+    for d in sorted(layers):
+        for i, name in enumerate(layers[d]):
+            order[name] = i
+
+    def sweep(layer_ids, neighbours):
+        for d in layer_ids:
+            layer = layers[d]
+            def barycenter(name):
+                ranks = [order[n] for n in neighbours[name] if depth[n] != d]
+                return sum(ranks) / len(ranks) if ranks else order[name]
+            layer.sort(key=barycenter)
+            for i, name in enumerate(layer):
+                order[name] = i
+
+    layer_ids = sorted(layers)
+    sweep(layer_ids, predecessors)
+    sweep(reversed(layer_ids), successors)
+
+    tallest = max(len(layer) for layer in layers.values()) if layers else 0
+    positions = {}
+    for d in layer_ids:
+        layer = layers[d]
+        top = origin[1] + (tallest - len(layer)) * row_gap / 2
+        for i, name in enumerate(layer):
+            positions[name] = (origin[0] + d * layer_gap, top + i * row_gap)
+    return positions
+
+def _barnes_hut_repulsion(xs, ys, k_squared, theta=1.2, leaf_size=8, max_depth=24):
+    """
+    Repulsive forces k^2/d between all pairs of points, approximated with a
+    Barnes-Hut quadtree: a far-away cell acts as one body at its center of mass.
+    Returns (fx, fy) lists. O(n log n) instead of O(n^2).
+    """
+    n = len(xs)
+    fx = [0.0] * n
+    fy = [0.0] * n
+    if n < 2:
+        return fx, fy
+
+    min_x, max_x, min_y, max_y = min(xs), max(xs), min(ys), max(ys)
+    size = max(max_x - min_x, max_y - min_y) + 1.0
+
+    # Flat node arrays; a node is a leaf while children[node] is None
+    node_x0, node_y0, node_size = [min_x], [min_y], [size]
+    mass, sum_x, sum_y = [0], [0.0], [0.0]
+    children, bodies = [None], [[]]
+
+    def new_node(x0, y0, s):
+        node_x0.append(x0); node_y0.append(y0); node_size.append(s)
+        mass.append(0); sum_x.append(0.0); sum_y.append(0.0)
+        children.append(None); bodies.append([])
+        return len(mass) - 1
+
+    def quadrant(node, x, y):
+        half = node_size[node] / 2
+        return (1 if x >= node_x0[node] + half else 0) + (2 if y >= node_y0[node] + half else 0)
+
+    for i in range(n):
+        x, y = xs[i], ys[i]
+        node, depth = 0, 0
+        while True:
+            mass[node] += 1
+            sum_x[node] += x
+            sum_y[node] += y
+            if children[node] is None:
+                if len(bodies[node]) < leaf_size or depth >= max_depth:
+                    bodies[node].append(i)
+                    break
+                # Split the leaf and push its bodies one level down
+                half = node_size[node] / 2
+                x0, y0 = node_x0[node], node_y0[node]
+                children[node] = [new_node(x0, y0, half), new_node(x0 + half, y0, half),
+                                  new_node(x0, y0 + half, half), new_node(x0 + half, y0 + half, half)]
+                for j in bodies[node]:
+                    child = children[node][quadrant(node, xs[j], ys[j])]
+                    mass[child] += 1
+                    sum_x[child] += xs[j]
+                    sum_y[child] += ys[j]
+                    bodies[child].append(j)
+                bodies[node] = []
+            node = children[node][quadrant(node, x, y)]
+            depth += 1
+
+    # Centers of mass, and the squared distance past which a cell counts as one body
+    com_x = [sum_x[i] / mass[i] if mass[i] else 0.0 for i in range(len(mass))]
+    com_y = [sum_y[i] / mass[i] if mass[i] else 0.0 for i in range(len(mass))]
+    far_squared = [(s / theta) ** 2 for s in node_size]
+
+    for i in range(n):
+        x, y = xs[i], ys[i]
+        acc_x = acc_y = 0.0
+        stack = [0]
+        pop, extend = stack.pop, stack.extend
+        while stack:
+            node = pop()
+            m = mass[node]
+            if m == 0:
+                continue
+            if children[node] is None:
+                for j in bodies[node]:
+                    if j == i:
+                        continue
+                    dx, dy = x - xs[j], y - ys[j]
+                    d2 = dx * dx + dy * dy
+                    if d2 < 0.01:
+                        # Coincident points: push apart in an arbitrary but fixed direction
+                        dx, dy, d2 = 0.1 * ((i - j) % 3 - 1) + 0.05, 0.1, 0.0125
+                    acc_x += dx * k_squared / d2
+                    acc_y += dy * k_squared / d2
+                continue
+            dx, dy = x - com_x[node], y - com_y[node]
+            d2 = dx * dx + dy * dy
+            if d2 > far_squared[node]:
+                acc_x += m * dx * k_squared / d2
+                acc_y += m * dy * k_squared / d2
+            else:
+                extend(children[node])
+        fx[i] = acc_x
+        fy[i] = acc_y
+    return fx, fy
+
+def force_directed_layout(names, edges, start=None, edge_length=150, iterations=None, seed=0, origin=(100, 100)):
+    """
+    Fruchterman-Reingold placement with Barnes-Hut repulsion. States start on
+    a grid in BFS order (so the result is deterministic), then edges pull
+    neighbours together while every state pushes the others apart.
+    """
+    names = list(names)
+    n = len(names)
+    if n == 0:
+        return {}
+    if iterations is None:
+        # The BFS grid start is already reasonable; big graphs need fewer passes to settle
+        iterations = 60 if n <= 500 else 25
+    index = {name: i for i, name in enumerate(names)}
+    edge_pairs = [(index[a], index[b]) for a, b in edges if a in index and b in index and a != b]
+
+    depth = compute_bfs_depths(names, edges, start)
+    ordered = sorted(range(n), key=lambda i: (depth[names[i]], i))
+    rng = random.Random(seed)
+    columns = max(1, int(math.ceil(math.sqrt(n))))
+    xs = [0.0] * n
+    ys = [0.0] * n
+    for rank, i in enumerate(ordered):
+        xs[i] = (rank % columns) * edge_length + rng.uniform(-0.25, 0.25) * edge_length
+        ys[i] = (rank // columns) * edge_length + rng.uniform(-0.25, 0.25) * edge_length
+
+    k = float(edge_length)
+    k_squared = k * k
+    temperature = columns * edge_length / 4
+    cooling = temperature / (iterations + 1)
+    gravity = 0.02
+
+    for _ in range(iterations):
+        fx, fy = _barnes_hut_repulsion(xs, ys, k_squared)
+
+        for a, b in edge_pairs:
+            dx, dy = xs[a] - xs[b], ys[a] - ys[b]
+            d = math.sqrt(dx * dx + dy * dy) or 0.01
+            pull = d / k # (d^2 / k) along the unit vector
+            fx[a] -= dx * pull; fy[a] -= dy * pull
+            fx[b] += dx * pull; fy[b] += dy * pull
+
+        center_x, center_y = sum(xs) / n, sum(ys) / n
+        for i in range(n):
+            # Weak pull to the centroid keeps disconnected pieces from drifting away
+            f_x = fx[i] - gravity * k * (xs[i] - center_x)
+            f_y = fy[i] - gravity * k * (ys[i] - center_y)
+            f_len = math.sqrt(f_x * f_x + f_y * f_y)
+            if f_len > 0:
+                step = min(f_len, temperature)
+                xs[i] += f_x / f_len * step
+                ys[i] += f_y / f_len * step
+        temperature -= cooling
+
+    shift_x, shift_y = origin[0] - min(xs), origin[1] - min(ys)
+    return {names[i]: (xs[i] + shift_x, ys[i] + shift_y) for i in range(n)}
+
+def auto_layout(names, edges, start=None, method="auto"):
+    """
+    Positions for every state. 'auto' uses the layered layout when most edges
+    point forward from the start state and force-directed placement otherwise.
+    """
+    if method == "auto":
+        method = "layered" if is_mostly_forward(names, edges, start) else "force"
+    if method == "layered":
+        return layered_layout(names, edges, start)
+    return force_directed_layout(names, edges, start)
+
+
+def prepare_graph_model(data, radius=25):
+    """
+    Turns a graph in the project's JSON format into the compact model the
+    editor bulk-loads: states as (name, (x, y), is_start, is_final) tuples
+    with world-space centers, transitions as (source, target, symbol).
+    States without "coords" are placed with auto_layout, to the right of
+    any states that have them. Touches no Tk objects, so it is safe to run
+    on a worker thread.
+    """
+    raw_states = [s for s in data.get("states", []) if s.get("name")]
+    placed = [s["coords"] for s in raw_states if s.get("coords")]
+    missing = [s["name"] for s in raw_states if not s.get("coords")]
+
+    transitions = []
+    for t in data.get("transitions", []):
+        src, dest, symbol = t.get("source"), t.get("target"), t.get("symbol")
+        if src and dest and symbol:
+            transitions.append((src, dest, symbol))
+
+    laid_out = {}
+    if missing:
+        missing_set = set(missing)
+        edges = [(src, dest) for src, dest, _ in transitions if src in missing_set and dest in missing_set]
+        start = next((s["name"] for s in raw_states if s.get("is_start") and s["name"] in missing_set), None)
+        positions = auto_layout(missing, edges, start)
+        # Place the laid-out part to the right of any states that already have coords
+        origin = (max(c[2] for c in placed) + 150 + radius, min(c[1] for c in placed) + radius) if placed else (100, 100)
+        min_x = min(p[0] for p in positions.values())
+        min_y = min(p[1] for p in positions.values())
+        laid_out = {name: (x - min_x + origin[0], y - min_y + origin[1]) for name, (x, y) in positions.items()}
+
+    states = []
+    max_state_id = 0
+    for s in raw_states:
+        name = s["name"]
+        coords = s.get("coords")
+        center = ((coords[0] + coords[2]) / 2, (coords[1] + coords[3]) / 2) if coords else laid_out[name]
+        states.append((name, center, bool(s.get("is_start")), bool(s.get("is_final"))))
+        if name.isdigit():
+            max_state_id = max(max_state_id, int(name))
+
+    return {
+        "states": states,
+        "transitions": transitions,
+        "max_state_id": max_state_id,
+        "fit_view": bool(missing)
+    }
+
+def parse_graph_file(filepath, radius=25, job=None, chunk_size=1 << 20):
+    """
+    Reads a project JSON file and prepares it for bulk loading (worker-thread
+    safe). The file is read in chunks so a job can show progress and cancel.
+    """
+    total = max(os.path.getsize(filepath), 1)
+    chunks = []
+    done = 0
+    with open(filepath, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            done += len(chunk)
+            if job is not None:
+                job.report(f"reading {100 * done // total}%")
+    raw = b"".join(chunks)
+    if filepath.endswith('.gz'):
+        raw = gzip.decompress(raw)
+    if job is not None:
+        job.report("parsing")
+    data = json.loads(raw.decode('utf-8'))
+    if job is not None:
+        job.report("preparing states")
+    return prepare_graph_model(data, radius)
+
+
+class StateGrid:
+    """
+    Uniform grid of state centers in world coordinates. Picking a state and
+    region queries only look at nearby cells (O(1) on average per lookup) and
+    never ask Tk, whose find_closest also returns arrows and labels.
+    """
+
+    def __init__(self, cell_size=100.0):
+        self.cell_size = cell_size
+        self.cells = {}     # (column, row) -> set of items
+        self.positions = {} # item -> (x, y)
+        self.cell_of = {}   # item -> (column, row)
+
+    def _cell(self, x, y):
+        return (math.floor(x / self.cell_size), math.floor(y / self.cell_size))
+
+    def move(self, item, x, y):
+        """Inserts the item, or updates its center."""
+        self.positions[item] = (x, y)
+        cell = self._cell(x, y)
+        old = self.cell_of.get(item)
+        if old != cell:
+            if old is not None:
+                self._leave(item, old)
+            self.cells.setdefault(cell, set()).add(item)
+            self.cell_of[item] = cell
+
+    def _leave(self, item, cell):
+        members = self.cells[cell]
+        members.discard(item)
+        if not members:
+            del self.cells[cell]
+
+    def remove(self, item):
+        cell = self.cell_of.pop(item, None)
+        if cell is not None:
+            self._leave(item, cell)
+            del self.positions[item]
+
+    def clear(self):
+        self.cells = {}
+        self.positions = {}
+        self.cell_of = {}
+
+    def items_in_rect(self, x1, y1, x2, y2):
+        """Items whose centers lie inside the rectangle."""
+        col1, row1 = self._cell(x1, y1)
+        col2, row2 = self._cell(x2, y2)
+        if (col2 - col1 + 1) * (row2 - row1 + 1) <= len(self.cells):
+            buckets = (self.cells.get((col, row), ()) for col in range(col1, col2 + 1) for row in range(row1, row2 + 1))
+        else:
+            # A large rectangle: walking the occupied cells is cheaper
+            buckets = (members for (col, row), members in self.cells.items()
+                       if col1 <= col <= col2 and row1 <= row <= row2)
+        found = []
+        for members in buckets:
+            for item in members:
+                x, y = self.positions[item]
+                if x1 <= x <= x2 and y1 <= y <= y2:
+                    found.append(item)
+        return found
+
+    def nearest(self, x, y, radius, accept=None):
+        """The accepted item whose center is closest to (x, y) and within radius, or None."""
+        best, best_distance = None, radius * radius
+        for item in self.items_in_rect(x - radius, y - radius, x + radius, y + radius):
+            if accept is not None and not accept(item):
+                continue
+            i_x, i_y = self.positions[item]
+            distance = (i_x - x) ** 2 + (i_y - y) ** 2
+            if distance <= best_distance:
+                best, best_distance = item, distance
+        return best
+
+
+class JobCancelled(Exception):
+    """Raised inside a job's work once the job has been cancelled."""
+
+
+class BackgroundJob:
+    """
+    Cancel flag and latest progress text of one worker-thread task. The
+    worker calls report(), which raises JobCancelled after cancel(); the
+    mainloop polls progress. Touches no Tk objects.
+    """
+
+    def __init__(self, title):
+        self.title = title
+        self.progress = ""
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def report(self, progress):
+        self.progress = progress
+        if self.cancelled:
+            raise JobCancelled()
+
+
+def start_arrow_coords(c_x, c_y, radius):
+    """The start-state arrow, from above-left of the circle to its rim."""
+    return (c_x - radius - 30, c_y - radius - 30, c_x - radius * 0.707, c_y - radius * 0.707)
+
+def final_ring_coords(c_x, c_y, radius):
+    """The inner circle that marks a final state."""
+    return (c_x - radius * 0.8, c_y - radius * 0.8, c_x + radius * 0.8, c_y + radius * 0.8)
+
+
+def minimize_dfa(dfa):
+    """Runs PROGRAM2's Hopcroft minimizer on a DFA in the internal dict format."""
+    return DFAMinimizer(dfa_to_json_data(dfa), verbose=False).minimize()
+
+
+class DFAGraphView:
+    """
+    A second window that draws the DFA produced by "Convert to DFA".
+    States are placed with auto_layout (the editor's layout) on a worker
+    thread; the drawing then runs a small batch at a time on the Tk event
+    loop, so DFAs with many subset states appear progressively instead of
+    freezing the editor in one long pass.
+    """
+
+    edge_tag = "dfa_edge"
+
+    def __init__(self, app, batch_size=40):
+        self.app = app
+        self.batch_size = batch_size
+        self.dfa = None
+        self._steps = None
+        self._after_id = None
+        self._generation = 0 # Bumped on every redraw/close, so stale layouts are dropped
+
+        self.window = tk.Toplevel(app.root)
+        self.window.title("DFA Graph")
+        self.window.geometry("900x600")
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+
+        controls = ttk.Frame(self.window)
+        controls.pack(fill="x", pady=5)
+        self.minimize_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            controls, text="Minimize (Hopcroft)",
+            variable=self.minimize_var, command=self.redraw
+        ).pack(side=tk.LEFT, padx=5)
+        self.status_label = ttk.Label(controls, text="")
+        self.status_label.pack(side=tk.LEFT, padx=10)
+
+        canvas_frame = ttk.Frame(self.window)
+        canvas_frame.pack(fill="both", expand=True)
+        self.canvas = tk.Canvas(canvas_frame, bg=app.colors['bg_canvas'], highlightthickness=0)
+        scroll_y = ttk.Scrollbar(canvas_frame, orient="vertical", command=self.canvas.yview)
+        scroll_x = ttk.Scrollbar(canvas_frame, orient="horizontal", command=self.canvas.xview)
+        self.canvas.configure(yscrollcommand=scroll_y.set, xscrollcommand=scroll_x.set)
+        scroll_y.pack(side="right", fill="y")
+        scroll_x.pack(side="bottom", fill="x")
+        self.canvas.pack(side="left", fill="both", expand=True)
+
+        # Pan by dragging
+        self.canvas.bind('<ButtonPress-1>', lambda e: self.canvas.scan_mark(e.x, e.y))
+        self.canvas.bind('<B1-Motion>', lambda e: self.canvas.scan_dragto(e.x, e.y, gain=1))
+
+    def is_open(self):
+        try:
+            return bool(self.window.winfo_exists())
+        except tk.TclError:
+            return False
+
+    def close(self):
+        self._cancel()
+        self.window.destroy()
+
+    def _cancel(self):
+        self._generation += 1
+        if self._after_id is not None:
+            try:
+                self.canvas.after_cancel(self._after_id)
+            except tk.TclError:
+                pass
+            self._after_id = None
+        self._steps = None
+
+    def show(self, dfa):
+        """Draws a DFA given in PROGRAM2's internal dict format."""
+        self.dfa = dfa
+        self.redraw()
+
+    def redraw(self):
+        self._cancel()
+        self.canvas.delete("all")
+        if self.dfa is None:
+            return
+
+        dfa = self.dfa
+        if self.minimize_var.get():
+            try:
+                dfa = minimize_dfa(dfa)
+            except ValueError as e:
+                self.status_label.config(text=f"Cannot minimize: {e}")
+                return
+
+        names = sorted(dfa["states"], key=lambda x: (int(x) if x.isdigit() else float('inf'), x))
+        edges = [(src, dest) for src, row in dfa["transitions"].items() for dest in row.values()]
+        generation = self._generation
+        self.status_label.config(text=f"Laying out {len(names)} states...")
+
+        def done(positions):
+            if generation != self._generation or not self.is_open():
+                return # Redrawn or closed while the layout was running
+            self._steps = self._draw_steps(dfa, positions)
+            self._run_batch()
+
+        self.app.run_in_background(lambda: auto_layout(names, edges, dfa["start_state"]), done, "DFA Graph")
+
+    def _run_batch(self):
+        self._after_id = None
+        if self._steps is None:
+            return
+        for _ in range(self.batch_size):
+            try:
+                progress = next(self._steps)
+            except StopIteration:
+                self._steps = None
+                self.status_label.config(text=f"{progress_text(self._last_progress)} (done)")
+                self.canvas.configure(scrollregion=self.canvas.bbox("all"))
+                return
+            self._last_progress = progress
+        self.status_label.config(text=progress_text(progress))
+        self.canvas.configure(scrollregion=self.canvas.bbox("all"))
+        self._after_id = self.canvas.after(1, self._run_batch)
+
+    def _draw_steps(self, dfa, positions):
+
+        """
+        Generator that draws one state per step, column by column, together
+        with its edges to the states already drawn. Yields (states_drawn, total_states).
+        """
+        r = self.app.default_radius
+        total = len(positions)
+        self._last_progress = (0, total)
+
+        grouped = {} # (src, dest) -> symbols
+        touching = {} # state -> edge keys it is an end of
+        for src, row in dfa["transitions"].items():
+            for symbol, dest in row.items():
+                if src in positions and dest in positions:
+                    if (src, dest) not in grouped:
+                        grouped[(src, dest)] = []
+                        touching.setdefault(src, []).append((src, dest))
+                        if dest != src:
+                            touching.setdefault(dest, []).append((src, dest))
+                    grouped[(src, dest)].append(symbol)
+
+        def bbox(state):
+            c_x, c_y = positions[state]
+            return (c_x - r, c_y - r, c_x + r, c_y + r)
+
+        drawn = set()
+        for state in sorted(positions, key=lambda s: positions[s]):
+            c_x, c_y = positions[state]
+            self.canvas.create_oval(*bbox(state), outline='black', width=2, fill='green')
+            if state in dfa["final_states"]:
+                self.canvas.create_oval(*final_ring_coords(c_x, c_y, r), outline='black', width=2)
+            if state == dfa["start_state"]:
+                self.canvas.create_line(*start_arrow_coords(c_x, c_y, r), arrow=tk.LAST, width=2)
+            self.canvas.create_text(c_x, c_y, text=state, font=("Arial", 8, "bold"))
+            drawn.add(state)
+
+            for src, dest in touching.get(state, ()):
+                if src in drawn and dest in drawn:
+                    self.app.draw_transition(bbox(src), bbox(dest), ",".join(sorted(grouped[(src, dest)])),
+                                             src == dest, canvas=self.canvas, tags=(self.edge_tag,))
+            # Keep the arrows underneath the circles
+            self.canvas.tag_lower(self.edge_tag)
+            yield (len(drawn), total)
+
+
+def progress_text(progress):
+    drawn, total = progress
+    return f"Drawn {drawn} of {total} states"
+
 
 class DragDropApp:
     def __init__(self, root):
@@ -105,6 +887,15 @@ class DragDropApp:
         self.upload_button.pack(side=tk.LEFT, padx=5)
 
 
+        self.regex_button = ttk.Button(
+            self.button_frame,
+            text="From Regex",
+            command=self.load_from_regex,
+            style='TButton'
+        )
+        self.regex_button.pack(side=tk.LEFT, padx=5)
+
+
         self.export_button = ttk.Button(
             self.button_frame,
             text="Export to .JSON",
@@ -114,6 +905,75 @@ class DragDropApp:
         self.export_button.pack(side=tk.LEFT, padx=5)
 
 
+        self.export_compact_var = tk.BooleanVar(value=False)
+        self.export_gzip_var = tk.BooleanVar(value=False)
+        self.export_options_button = ttk.Menubutton(self.button_frame, text="Export Options")
+        self.export_options_menu = tk.Menu(self.export_options_button, tearoff=0)
+        self.export_options_menu.add_checkbutton(label="Compact (no indentation)", variable=self.export_compact_var)
+        self.export_options_menu.add_checkbutton(label="Gzip (.json.gz)", variable=self.export_gzip_var)
+        self.export_epsilon_free_var = tk.BooleanVar(value=False)
+        self.export_options_menu.add_checkbutton(label="Epsilon-free NFA", variable=self.export_epsilon_free_var)
+        self.export_options_button["menu"] = self.export_options_menu
+        self.export_options_button.pack(side=tk.LEFT, padx=5)
+
+
+        self.layout_button = ttk.Button(
+            self.button_frame,
+            text="Auto Layout",
+            command=self.auto_layout_current_graph,
+            style='TButton'
+        )
+        self.layout_button.pack(side=tk.LEFT, padx=5)
+
+
+        self.dfa_graph_button = ttk.Button(
+            self.button_frame,
+            text="Show DFA Graph",
+            command=self.show_dfa_graph,
+            style='TButton'
+        )
+        self.dfa_graph_button.pack(side=tk.LEFT, padx=5)
+
+
+        self.live_convert_var = tk.BooleanVar(value=False)
+        self.live_convert_check = ttk.Checkbutton(
+            self.button_frame,
+            text="Live Convert",
+            variable=self.live_convert_var,
+            command=self.on_model_changed
+        )
+        self.live_convert_check.pack(side=tk.LEFT, padx=5)
+
+        self.reduce_nfa_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            self.button_frame,
+            text="Reduce NFA",
+            variable=self.reduce_nfa_var,
+            command=self.on_model_changed
+        ).pack(side=tk.LEFT, padx=5)
+
+        self.disk_cache_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            self.button_frame,
+            text="Disk Cache",
+            variable=self.disk_cache_var,
+            command=self.on_disk_cache_toggled
+        ).pack(side=tk.LEFT, padx=5)
+
+
+        self.cancel_job_button = ttk.Button(
+            self.button_frame,
+            text="Cancel",
+            command=self.cancel_current_job,
+            style='TButton',
+            state="disabled"
+        )
+        self.cancel_job_button.pack(side=tk.LEFT, padx=5)
+
+        self.status_label = ttk.Label(self.button_frame, text="")
+        self.status_label.pack(side=tk.LEFT, padx=10)
+
+
         self.graph_canvas = tk.Canvas(self.top_frame, bg=self.colors['bg_canvas'], width=1000, height=600, highlightthickness=0)
         self.graph_canvas.pack(fill="both", expand=True)
 
@@ -147,6 +1007,7 @@ class DragDropApp:
         
         # --- Item IDs and Tags ---
         self.drop_target = None
+        self.drop_target_coords = None # Cached canvas rectangle of the drop target
         self.circle_source = None
         
         self.drop_target_tag = "drop_target"
@@ -158,16 +1019,55 @@ class DragDropApp:
         self.inside_box_tag = "inside_box"
         self.cover_up_tag = "cover_up" 
         self.arrow_visuals_tag = "arrow_visuals" # Covers arrows, names, final circles
+        # Stacking layers of the pooled visuals, bottom to top
+        self.visual_layer_tags = ("visual_edges", "visual_clusters", "visual_rings", "visual_names")
+        self._visual_pool = {} # key -> [canvas item, options shown (None while hidden)]
+        self._visuals_used = set()
+        self._visuals_created = False
 
         # --- State Machine Data ---
         self.start_state_item = None
         self.final_states = set() 
         self.transitions = [] 
         self.state_names = {} 
+        self.state_positions = {} # item -> [world_x, world_y] of the circle's center
         self.next_state_id = 1 
         self.epsilon_symbols = {'e', 'epsilon', 'ε'} 
         self.default_radius = 25 
+        self.state_grid = StateGrid(cell_size=4 * self.default_radius) # Mirrors state_positions
         self.export_counter = 1 
+        self.last_dfa = None # Result of the last conversion, in PROGRAM2's internal dict format
+        self.dfa_view = None
+        self.load_batch_size = 500
+        self._load_generation = 0 # Bumped on every clear so stale load batches stop
+        self.current_job = None # The running export/upload BackgroundJob, if any
+        self.model_version = 0 # Bumped on every edit
+        self._epsilon_free_cache = None # (model_version, epsilon-free NFA)
+        self.subset_constructor = SubsetConstructor(self.epsilon_symbols)
+
+        # --- Live Conversion (re-convert shortly after each edit) ---
+        self.live_convert_delay_ms = 300
+
+        # --- Conversion Cache (results by NFA fingerprint; on disk only with "Disk Cache" checked) ---
+        self.conversion_cache = ConversionCache()
+        self.conversion_cache_min_seconds = 0.1 # Faster conversions are not written to disk
+        self._live_convert_after_id = None
+
+        # --- Viewport Transform (canvas = world * view_scale + view_offset) ---
+        self.view_scale = 1.0
+        self.view_offset = [0.0, 0.0]
+        self.min_view_scale = 0.01
+        self.max_view_scale = 100.0
+        self._shown_states = set() # State items currently mapped onto the canvas
+
+        # --- Level of Detail (chosen from view_scale) ---
+        self.lod_label_min_scale = 0.6     # Below this, no labels or names
+        self.lod_curve_min_scale = 0.35    # Below this, straight merged edges
+        self.lod_cluster_min_scale = 0.15  # Below this, dense cells become clusters
+        self.lod_cluster_cell = 60         # Cluster grid cell size, in canvas pixels
+        self.lod_cluster_min_states = 3    # States needed in a cell to form a cluster
+        self._state_clusters = {}          # item -> cell key, for states folded into a cluster
+        self._clusters = {}                # cell key -> (canvas_x, canvas_y, state_count)
         
         # --- Context Menu ---
         self.right_click_menu = tk.Menu(root, tearoff=0)
@@ -193,6 +1093,10 @@ class DragDropApp:
         self._pan_data = {"x": 0, "y": 0}
         self.is_panning = False
 
+        # --- Render Scheduler (at most one redraw per frame) ---
+        self.target_fps = 60
+        self.render_scheduler = RenderScheduler(self.graph_canvas, self.apply_frame, target_fps=self.target_fps)
+
 
         self.nfa_table = None
         self.dfa_table = None
@@ -264,6 +1168,7 @@ class DragDropApp:
         self.graph_canvas.delete(self.cover_up_tag) # Delete old mask
         
         w, h = event.width, event.height
+        self.drop_target_coords = None
         if w < 100 or h < 100: return # Avoid drawing if too small
 
 
@@ -273,6 +1178,7 @@ class DragDropApp:
             width=2,
             tags=(self.drop_target_tag,)
         )
+        self.drop_target_coords = [w * 0.05, h * 0.05, w * 0.6, h * 0.85]
         
 
         try:
@@ -356,7 +1262,7 @@ class DragDropApp:
         self.graph_canvas.lift(self.source_circle_tag)
         self.graph_canvas.lift(self.source_text_tag)
         
-        self.redraw_all_visuals()
+        self.refresh_viewport()
 
     def create_rounded_rectangle(self, x1, y1, x2, y2, radius=25, **kwargs):
 
@@ -374,13 +1280,8 @@ class DragDropApp:
             self.transition_source_item = None
             self.graph_canvas.config(cursor="")
 
-        item = self.graph_canvas.find_closest(event.x, event.y)
-        tags = []
-        if item:
-            item = item[0]
-            tags = self.graph_canvas.gettags(item)
-        
-        if self.draggable_circle_tag in tags and self.inside_box_tag in tags:
+        item = self.state_at(event.x, event.y)
+        if item is not None:
             self.right_click_menu.delete(0, "end")
             self.right_click_menu.add_command(
                 label="Set as Starting State", 
@@ -400,6 +1301,7 @@ class DragDropApp:
 
         self.start_state_item = item
         self.redraw_all_visuals()
+        self.on_model_changed()
 
     def toggle_final_state(self, item):
 
@@ -408,6 +1310,7 @@ class DragDropApp:
         else:
             self.final_states.add(item)
         self.redraw_all_visuals()
+        self.on_model_changed()
 
     def start_add_transition(self, item):
 
@@ -417,27 +1320,25 @@ class DragDropApp:
     def on_canvas_press(self, event):
 
         if self.transition_source_item:
-            item = self.graph_canvas.find_closest(event.x, event.y)
-            tags = []
-            if item:
-                item = item[0]
-                tags = self.graph_canvas.gettags(item)
-            
-            if self.draggable_circle_tag in tags and self.inside_box_tag in tags:
-                dest_item = item
-                symbol = simpledialog.askstring("Transition", "Enter symbol(s), comma-separated:", parent=self.root)
+            dest_item = self.state_at(event.x, event.y)
+            if dest_item is not None:
+                symbol = simpledialog.askstring("Transition", "Enter symbol(s), comma-separated (classes like [a-z] allowed):", parent=self.root)
                 if symbol:
-                    # Allow multiple symbols
-                    for s in symbol.split(','):
-                        s = s.strip()
-                        if s:
-                            self.transitions.append((self.transition_source_item, dest_item, s))
+                    # Allow multiple symbols; commas inside a class like [a-z] do not split
+                    for s in split_symbol_list(symbol):
+                        self.transitions.append((self.transition_source_item, dest_item, s))
                     self.redraw_all_visuals()
+                    self.on_model_changed()
             
             self.transition_source_item = None
             self.graph_canvas.config(cursor="")
             return 
 
+        state = self.state_at(event.x, event.y)
+        if state is not None:
+            self.on_press_existing(event, state)
+            return
+
         item = self.graph_canvas.find_closest(event.x, event.y)
         tags = []
         if item:
@@ -446,10 +1347,10 @@ class DragDropApp:
         
         if self.source_circle_tag in tags:
             self.on_press_source(event)
-        elif self.draggable_circle_tag in tags:
-            self.on_press_existing(event, item)
+        elif self.draggable_circle_tag in tags and item not in self.state_positions:
+            self.on_press_existing(event, item) # A fresh circle not yet dropped in the box
         else:
-            target_coords = self.graph_canvas.coords(self.drop_target)
+            target_coords = self.drop_target_coords
             if (target_coords and 
                 target_coords[0] < event.x < target_coords[2] and 
                 target_coords[1] < event.y < target_coords[3]):
@@ -504,21 +1405,185 @@ class DragDropApp:
         if self._drag_data["item"]:
             dx = event.x - self._drag_data["x"]
             dy = event.y - self._drag_data["y"]
-            self.graph_canvas.move(self._drag_data["item"], dx, dy)
+            self.render_scheduler.request_move(self._drag_data["item"], dx, dy)
             self._drag_data["x"] = event.x
             self._drag_data["y"] = event.y
-            self.redraw_all_visuals()
         
         elif self.is_panning:
             dx = event.x - self._pan_data["x"]
             dy = event.y - self._pan_data["y"]
-            for item in self.graph_canvas.find_withtag(self.inside_box_tag):
-                self.graph_canvas.move(item, dx, dy)
+            self.render_scheduler.request_pan(dx, dy)
             self._pan_data["x"] = event.x
             self._pan_data["y"] = event.y
 
+    def apply_frame(self, moves, pan, zoom):
+
+        """Applies all coalesced drags, pans and zooms, then redraws once."""
+        for item, (dx, dy) in moves.items():
+            pos = self.state_positions.get(item)
+            if pos is not None:
+                # Drags are in canvas pixels; the model stores world units
+                pos[0] += dx / self.view_scale
+                pos[1] += dy / self.view_scale
+                self.state_grid.move(item, pos[0], pos[1])
+            else:
+                try:
+                    self.graph_canvas.move(item, dx, dy) # Fresh circle not yet dropped
+                except tk.TclError:
+                    continue
+
+        if pan != (0.0, 0.0):
+            self.view_offset[0] += pan[0]
+            self.view_offset[1] += pan[1]
+
+        if zoom is not None:
+            self.apply_zoom(*zoom)
+
+        self.refresh_viewport()
+
+    def apply_zoom(self, scale, tx, ty):
+
+        """Composes a canvas-space zoom (p' = scale * p + t) into the view transform."""
+        new_scale = self.view_scale * scale
+        if not (self.min_view_scale <= new_scale <= self.max_view_scale):
+            return
+        self.view_scale = new_scale
+        self.view_offset[0] = scale * self.view_offset[0] + tx
+        self.view_offset[1] = scale * self.view_offset[1] + ty
+
+    # --- Viewport Transform Helpers ---
+
+    def world_to_canvas(self, wx, wy):
+        return (wx * self.view_scale + self.view_offset[0],
+                wy * self.view_scale + self.view_offset[1])
+
+    def canvas_to_world(self, cx, cy):
+        return ((cx - self.view_offset[0]) / self.view_scale,
+                (cy - self.view_offset[1]) / self.view_scale)
+
+    def state_canvas_coords(self, item):
+        """Canvas bounding box of a state circle, computed from its world position."""
+        pos = self.state_positions.get(item)
+        if pos is None:
+            return None
+        c_x, c_y = self.world_to_canvas(pos[0], pos[1])
+        r = self.get_state_radius()
+        return [c_x - r, c_y - r, c_x + r, c_y + r]
+
+    def set_state_position(self, item, x, y):
+        """Places a state's center in world units, keeping the spatial index in step."""
+        self.state_positions[item] = [x, y]
+        self.state_grid.move(item, x, y)
+
+    def state_at(self, cx, cy):
+        """The shown state whose circle contains the canvas point, or None (arrows and labels never match)."""
+        w_x, w_y = self.canvas_to_world(cx, cy)
+        dragged_item = self._drag_data["item"]
+        return self.state_grid.nearest(
+            w_x, w_y, self.get_state_radius() / self.view_scale,
+            accept=lambda item: item in self._shown_states or item == dragged_item
+        )
+
+    def states_in_rect(self, x1, y1, x2, y2, margin=0.0):
+        """States whose centers lie in a canvas rectangle (widened by margin canvas pixels), e.g. a rubber band."""
+        w_x1, w_y1 = self.canvas_to_world(min(x1, x2) - margin, min(y1, y2) - margin)
+        w_x2, w_y2 = self.canvas_to_world(max(x1, x2) + margin, max(y1, y2) + margin)
+        return self.state_grid.items_in_rect(w_x1, w_y1, w_x2, w_y2)
+
+    def get_state_radius(self):
+        """On-screen circle radius; circles shrink once zoomed past the straight-edge level."""
+        if self.view_scale >= self.lod_curve_min_scale:
+            return self.default_radius
+        return max(4, self.default_radius * self.view_scale / self.lod_curve_min_scale)
+
+    def get_lod_level(self):
+        """Picks the level of detail for the current zoom."""
+        if self.view_scale >= self.lod_label_min_scale:
+            return LOD_FULL
+        if self.view_scale >= self.lod_curve_min_scale:
+            return LOD_NO_LABELS
+        if self.view_scale >= self.lod_cluster_min_scale:
+            return LOD_STRAIGHT_EDGES
+        return LOD_CLUSTERS
+
+    def get_visible_region(self):
+        """The canvas rectangle graph items are shown in (the drop target), or None."""
+        return self.drop_target_coords
+
+    def rect_is_visible(self, region, x1, y1, x2, y2):
+        if region is None:
+            return True
+        return x2 >= region[0] and x1 <= region[2] and y2 >= region[1] and y1 <= region[3]
+
+    def place_states(self, region=None):
+
+        """Maps on-screen states to the canvas and hides off-screen or clustered ones."""
+        if region is None:
+            region = self.get_visible_region()
+        dragged_item = self._drag_data["item"]
+
+        if region is None:
+            visible = list(self.state_positions)
+        else:
+            # Circles overlapping the region have their centers within one radius of it
+            visible = self.states_in_rect(*region, margin=self.get_state_radius())
+            if dragged_item in self.state_positions and dragged_item not in visible:
+                visible.append(dragged_item)
+
+        self._state_clusters = {}
+        self._clusters = {}
+        if self.get_lod_level() >= LOD_CLUSTERS:
+            # Bucket on a world-aligned grid so clusters stay put while panning.
+            # Off-screen states are bucketed too, so edges leaving the view also merge.
+            cell = self.lod_cluster_cell / self.view_scale
+            cells = {}
+            for item in self.state_positions:
+                if item == dragged_item or item == self.start_state_item:
+                    continue
+                pos = self.state_positions[item]
+                cells.setdefault((int(pos[0] // cell), int(pos[1] // cell)), []).append(item)
+
+            for key, members in cells.items():
+                if len(members) < self.lod_cluster_min_states:
+                    continue
+                sum_x = sum_y = 0.0
+                for item in members:
+                    self._state_clusters[item] = key
+                    sum_x += self.state_positions[item][0]
+                    sum_y += self.state_positions[item][1]
+                c_x, c_y = self.world_to_canvas(sum_x / len(members), sum_y / len(members))
+                self._clusters[key] = (c_x, c_y, len(members))
+
+        shown = set()
+        for item in visible:
+            if item in self._state_clusters:
+                continue
+            shown.add(item)
+            try:
+                self.graph_canvas.coords(item, *self.state_canvas_coords(item))
+                if item not in self._shown_states:
+                    self.graph_canvas.itemconfig(item, state='normal')
+            except tk.TclError:
+                continue
+
+        for item in self._shown_states - shown:
+            try:
+                self.graph_canvas.itemconfig(item, state='hidden')
+            except tk.TclError:
+                pass
+
+        self._shown_states = shown
+
+    def refresh_viewport(self):
+        """Re-maps visible states from world to canvas and redraws their visuals."""
+        self.place_states()
+        self.redraw_all_visuals()
+
     def on_release_or_pan_stop(self, event):
 
+        # Land any drag/pan still waiting for its frame before inspecting positions
+        self.render_scheduler.flush()
+
         item = self._drag_data["item"]
         
         if item:
@@ -534,13 +1599,22 @@ class DragDropApp:
                         state_name = str(self.next_state_id)
                         self.state_names[item] = state_name
                         self.next_state_id += 1
+                        self.on_model_changed()
+                    if item not in self.state_positions:
+                        coords = self.graph_canvas.coords(item)
+                        self.set_state_position(item, *self.canvas_to_world(
+                            (coords[0] + coords[2]) / 2, (coords[1] + coords[3]) / 2))
+                        self._shown_states.add(item)
                 
                 self.graph_canvas.lower(item, self.cover_up_tag)
-                self.redraw_all_visuals() 
+                self._drag_data["item"] = None
+                self.refresh_viewport() 
             
             elif was_inside:
                 self.graph_canvas.itemconfig(item, fill='green')
                 self.graph_canvas.lower(item, self.cover_up_tag)
+                self._drag_data["item"] = None
+                self.refresh_viewport()
             
             else:
                 self.graph_canvas.itemconfig(item, fill='lightgray')
@@ -557,8 +1631,11 @@ class DragDropApp:
     def is_inside_target(self, target, item):
 
         try:
-            target_coords = self.graph_canvas.coords(target)
-            item_coords = self.graph_canvas.coords(item)
+            if target == self.drop_target:
+                target_coords = self.drop_target_coords
+            else:
+                target_coords = self.graph_canvas.coords(target)
+            item_coords = self.state_canvas_coords(item) or self.graph_canvas.coords(item)
             if not item_coords or not target_coords: return False
         except tk.TclError:
             return False 
@@ -573,66 +1650,49 @@ class DragDropApp:
     def on_mouse_wheel(self, event):
 
         """Handle zooming of items inside the drop target."""
-        try:
-            target_coords = self.graph_canvas.coords(self.drop_target)
-            if not (target_coords and 
-                    target_coords[0] < event.x < target_coords[2] and 
-                    target_coords[1] < event.y < target_coords[3]):
-                return # Not inside the box
-        except tk.TclError:
-            return # Box not drawn yet
+        target_coords = self.drop_target_coords
+        if not (target_coords and 
+                target_coords[0] < event.x < target_coords[2] and 
+                target_coords[1] < event.y < target_coords[3]):
+            return # Not inside the box (or the box is not drawn yet)
 
         factor = 0.0
         if event.num == 4 or event.delta > 0: factor = 1.1
         elif event.num == 5 or event.delta < 0: factor = 0.9
         if factor == 0.0: return
 
-        zoom_x, zoom_y = event.x, event.y
-        
-        for item in self.graph_canvas.find_withtag(self.inside_box_tag):
-            self.graph_canvas.scale(item, zoom_x, zoom_y, factor, factor)
-        
-        r = self.default_radius
-        for item in self.graph_canvas.find_withtag(self.draggable_circle_tag):
-            if self.inside_box_tag not in self.graph_canvas.gettags(item):
-                continue
-            try:
-                coords = self.graph_canvas.coords(item)
-                if not coords: continue
-                c_x = (coords[0] + coords[2]) / 2
-                c_y = (coords[1] + coords[3]) / 2
-                self.graph_canvas.coords(item, c_x - r, c_y - r, c_x + r, c_y + r)
-            except tk.TclError:
-                continue 
-
-        self.redraw_all_visuals()
+        self.render_scheduler.request_zoom(factor, event.x, event.y)
 
 
     def redraw_all_visuals(self):
 
-        """Delete and redraw all arrows, names, and final state circles."""
-        self.graph_canvas.delete(self.arrow_visuals_tag) # Clear all old visuals
+        """
+        Updates the arrows, names and final state circles that are on screen.
+        Every visual is a pooled canvas item moved with coords/itemconfig;
+        items are only created for new model elements and only deleted once
+        their element is gone (off-screen ones are just hidden).
+        """
+        self._visuals_used = set()
+        self._visuals_created = False
+        edge_layer, cluster_layer, ring_layer, name_layer = self.visual_layer_tags
+
+        region = self.get_visible_region()
+        lod = self.get_lod_level()
+        # Curves bulge up to 40px off the center line and self-loops rise above the circle
+        edge_margin = self.default_radius + 45
 
         if self.start_state_item:
-            try:
-                coords = self.graph_canvas.coords(self.start_state_item)
-                if coords:
-                    c_x = (coords[0] + coords[2]) / 2
-                    c_y = (coords[1] + coords[3]) / 2
-                    radius = (coords[2] - coords[0]) / 2
-                    
-                    arrow_start_x = c_x - radius - 30
-                    arrow_start_y = c_y - radius - 30
-                    arrow_end_x = c_x - (radius * 0.707)
-                    arrow_end_y = c_y - (radius * 0.707)
-
-                    self.graph_canvas.create_line(
-                        arrow_start_x, arrow_start_y, arrow_end_x, arrow_end_y,
-                        arrow=tk.LAST, width=2, 
-                        tags=(self.inside_box_tag, self.arrow_visuals_tag)
-                    )
-            except tk.TclError:
-                self.start_state_item = None 
+            coords = self.state_canvas_coords(self.start_state_item)
+            if coords is None:
+                self.start_state_item = None
+            elif self.rect_is_visible(region, coords[0] - 30, coords[1] - 30, coords[2], coords[3]):
+                c_x = (coords[0] + coords[2]) / 2
+                c_y = (coords[1] + coords[3]) / 2
+                radius = (coords[2] - coords[0]) / 2
+                self.pooled_visual(
+                    ("start",), "line", start_arrow_coords(c_x, c_y, radius), edge_layer,
+                    arrow=tk.LAST, width=2
+                )
 
         items_to_delete = []
         grouped_transitions = {} # (src, dest) -> [symbol1, symbol2]
@@ -642,50 +1702,184 @@ class DragDropApp:
                 grouped_transitions[key] = []
             grouped_transitions[key].append(symbol)
 
-        for (src_item, dest_item), symbols in grouped_transitions.items():
-            try:
-                src_coords = self.graph_canvas.coords(src_item)
-                dest_coords = self.graph_canvas.coords(dest_item)
-                if not src_coords or not dest_coords:
-                    continue
-                
-                label = ",".join(sorted(list(set(symbols))))
-                self.draw_transition(src_coords, dest_coords, label, src_item == dest_item)
-            except tk.TclError:
+        for (src_item, dest_item) in grouped_transitions:
+            if src_item not in self.state_positions or dest_item not in self.state_positions:
                 items_to_delete.append((src_item, dest_item))
+        for key in items_to_delete:
+            del grouped_transitions[key]
         
         if items_to_delete:
             self.transitions = [t for t in self.transitions if (t[0], t[1]) not in items_to_delete]
 
-        for item, name in self.state_names.items():
-            try:
-                coords = self.graph_canvas.coords(item)
-                if not coords: continue
-                c_x = (coords[0] + coords[2]) / 2
-                c_y = (coords[1] + coords[3]) / 2
+        merged_edges = {}
+        if lod >= LOD_STRAIGHT_EDGES:
+            merged_edges = self.draw_merged_edges(grouped_transitions, region)
+        else:
+            for (src_item, dest_item), symbols in grouped_transitions.items():
+                src_coords = self.state_canvas_coords(src_item)
+                dest_coords = self.state_canvas_coords(dest_item)
+
+                # Skip edges whose bounding box cannot touch the visible region
+                if not self.rect_is_visible(
+                        region,
+                        min(src_coords[0], dest_coords[0]) - edge_margin,
+                        min(src_coords[1], dest_coords[1]) - edge_margin,
+                        max(src_coords[2], dest_coords[2]) + edge_margin,
+                        max(src_coords[3], dest_coords[3]) + edge_margin):
+                    continue
 
-                if item in self.final_states:
-                    r = (coords[2] - coords[0]) / 2
-                    self.graph_canvas.create_oval(
-                        c_x - r*0.8, c_y - r*0.8, c_x + r*0.8, c_y + r*0.8, 
-                        outline='black', width=2, 
-                        tags=(self.inside_box_tag, self.arrow_visuals_tag)
-                    )
-                
-                self.graph_canvas.create_text(
-                    c_x, c_y, text=name, 
-                    tags=(self.inside_box_tag, self.arrow_visuals_tag),
-                    font=("Arial", 10, "bold")
-                )
-            except tk.TclError:
-                pass 
+                geometry = self.transition_geometry(src_coords, dest_coords, src_item == dest_item)
+                if geometry is None:
+                    continue
+                points, label_pos = geometry
+                self.pooled_visual(("edge", src_item, dest_item), "line", points, edge_layer,
+                                   smooth=True, arrow=tk.LAST, width=2)
+                if lod == LOD_FULL:
+                    label = ",".join(sorted(list(set(symbols))))
+                    self.pooled_visual(("label", src_item, dest_item), "text", label_pos, edge_layer,
+                                       text=label, fill="black")
+
+        for key, (c_x, c_y, count) in self._clusters.items():
+            r = self.get_cluster_radius(count)
+            if not self.rect_is_visible(region, c_x - r, c_y - r, c_x + r, c_y + r):
+                continue
+            self.pooled_visual(("cluster", key), "oval", (c_x - r, c_y - r, c_x + r, c_y + r), cluster_layer,
+                               outline='black', width=1, fill='#9ACD9A')
+            self.pooled_visual(("cluster_count", key), "text", (c_x, c_y), cluster_layer,
+                               text=str(count), font=("Arial", 8))
+
+        for item in self._shown_states:
+            name = self.state_names.get(item)
+            coords = self.state_canvas_coords(item)
+            if name is None or coords is None: continue
+            c_x = (coords[0] + coords[2]) / 2
+            c_y = (coords[1] + coords[3]) / 2
+
+            if item in self.final_states:
+                r = (coords[2] - coords[0]) / 2
+                self.pooled_visual(("ring", item), "oval", final_ring_coords(c_x, c_y, r), ring_layer,
+                                   outline='black', width=2)
+            
+            if lod == LOD_FULL:
+                self.pooled_visual(("name", item), "text", (c_x, c_y), name_layer,
+                                   text=name, font=("Arial", 10, "bold"))
+
+        self.retire_unused_visuals(grouped_transitions, merged_edges)
+        if self._visuals_created:
+            # New items were created on top; restore the layer order below the cover-up
+            for layer in self.visual_layer_tags:
+                self.graph_canvas.lift(layer)
+            self.graph_canvas.lower(self.arrow_visuals_tag, self.cover_up_tag)
+
+    def pooled_visual(self, key, kind, coords, layer, **options):
+
+        """Shows the pooled canvas item for key at coords, creating it the first time key is drawn."""
+        self._visuals_used.add(key)
+        entry = self._visual_pool.get(key)
+        if entry is None:
+            create = getattr(self.graph_canvas, "create_" + kind)
+            item = create(*coords, tags=(self.inside_box_tag, self.arrow_visuals_tag, layer), **options)
+            self._visual_pool[key] = [item, options]
+            self._visuals_created = True
+            return
+        self.graph_canvas.coords(entry[0], *coords)
+        if entry[1] != options:
+            self.graph_canvas.itemconfig(entry[0], state='normal', **options)
+            entry[1] = options
+
+    def retire_unused_visuals(self, grouped_transitions, merged_edges):
+
+        """Hides pooled items not drawn this frame, deleting those whose model element is gone."""
+        for key in self._visual_pool.keys() - self._visuals_used:
+            kind = key[0]
+            if kind == "start":
+                live = self.start_state_item is not None
+            elif kind in ("edge", "label"):
+                live = (key[1], key[2]) in grouped_transitions
+            elif kind == "ring":
+                live = key[1] in self.final_states and key[1] in self.state_positions
+            elif kind == "name":
+                live = key[1] in self.state_names
+            elif kind == "merged":
+                live = (key[1], key[2]) in merged_edges
+            else:
+                live = key[1] in self._clusters # Cluster keys change with the zoom level
+            entry = self._visual_pool[key]
+            if not live:
+                self.graph_canvas.delete(entry[0])
+                del self._visual_pool[key]
+            elif entry[1] is not None:
+                self.graph_canvas.itemconfig(entry[0], state='hidden')
+                entry[1] = None
+
+    def get_cluster_radius(self, count):
+        return min(self.lod_cluster_cell / 2, self.get_state_radius() + 2 * math.sqrt(count))
+
+    def draw_merged_edges(self, grouped_transitions, region):
+
+        """
+        Low-detail edges: one straight, unlabeled line per connected pair of
+        states or clusters. Returns the pairs, {(node_a, node_b): direction bits}.
+        """
+        edge_layer = self.visual_layer_tags[0]
+        state_r = self.get_state_radius()
+
+        # (node_a, node_b) -> direction bits: 1 = a->b, 2 = b->a
+        merged = {}
+        for (src_item, dest_item) in grouped_transitions:
+            src_node = self._state_clusters.get(src_item, src_item)
+            dest_node = self._state_clusters.get(dest_item, dest_item)
+            if src_node == dest_node:
+                continue # Self-loops and edges inside a cluster are not drawn at this level
+            if (dest_node, src_node) in merged:
+                merged[(dest_node, src_node)] |= 2
+            else:
+                merged[(src_node, dest_node)] = merged.get((src_node, dest_node), 0) | 1
+
+        def node_center(node):
+            if node in self._clusters:
+                c_x, c_y, count = self._clusters[node]
+                return c_x, c_y, self.get_cluster_radius(count)
+            c_x, c_y = self.world_to_canvas(*self.state_positions[node])
+            return c_x, c_y, state_r
+
+        arrows = {1: tk.LAST, 2: tk.FIRST, 3: tk.BOTH}
+        for (node_a, node_b), direction in merged.items():
+            a_x, a_y, a_r = node_center(node_a)
+            b_x, b_y, b_r = node_center(node_b)
+            if not self.rect_is_visible(region, min(a_x, b_x), min(a_y, b_y), max(a_x, b_x), max(a_y, b_y)):
+                continue
 
-        self.graph_canvas.lower(self.arrow_visuals_tag, self.cover_up_tag)
+            v_len = math.sqrt((b_x - a_x)**2 + (b_y - a_y)**2)
+            if v_len <= a_r + b_r:
+                continue # Overlapping nodes; nothing visible to draw
+            u_x, u_y = (b_x - a_x) / v_len, (b_y - a_y) / v_len
+            self.pooled_visual(
+                ("merged", node_a, node_b), "line",
+                (a_x + u_x * a_r, a_y + u_y * a_r, b_x - u_x * b_r, b_y - u_y * b_r), edge_layer,
+                arrow=arrows[direction], width=1
+            )
+        return merged
 
-    def draw_transition(self, src_coords, dest_coords, symbol, is_self_loop):
+    def draw_transition(self, src_coords, dest_coords, symbol, is_self_loop, show_label=True, canvas=None, tags=None):
  
-        tags = (self.inside_box_tag, self.arrow_visuals_tag)
-        
+        """Draws one (possibly multi-symbol) transition; defaults to the editor canvas."""
+        if canvas is None:
+            canvas = self.graph_canvas
+        if tags is None:
+            tags = (self.inside_box_tag, self.arrow_visuals_tag)
+
+        geometry = self.transition_geometry(src_coords, dest_coords, is_self_loop)
+        if geometry is None:
+            return
+        points, label_pos = geometry
+        canvas.create_line(*points, smooth=True, arrow=tk.LAST, width=2, tags=tags)
+        if show_label:
+            canvas.create_text(*label_pos, text=symbol, tags=tags, fill="black")
+
+    def transition_geometry(self, src_coords, dest_coords, is_self_loop):
+
+        """Flat line points and label position of a transition arrow, or None if it has no length."""
         if is_self_loop:
             c_x = (src_coords[0] + src_coords[2]) / 2
             c_y = src_coords[1]
@@ -693,9 +1887,7 @@ class DragDropApp:
             p1 = (c_x, c_y)
             p_control1 = (c_x + radius, c_y - radius)
             p_control2 = (c_x - radius, c_y - radius)
-            self.graph_canvas.create_line(p1, p_control1, p_control2, p1, smooth=True, arrow=tk.LAST, width=2, tags=tags)
-            text_pos = (c_x, c_y - radius)
-            self.graph_canvas.create_text(text_pos, text=symbol, tags=tags, fill="black")
+            return (p1 + p_control1 + p_control2 + p1), (c_x, c_y - radius)
             
         else:
             src_c = ( (src_coords[0] + src_coords[2]) / 2, (src_coords[1] + src_coords[3]) / 2 )
@@ -703,7 +1895,7 @@ class DragDropApp:
             
             v = (dest_c[0] - src_c[0], dest_c[1] - src_c[1])
             v_len = math.sqrt(v[0]**2 + v[1]**2)
-            if v_len == 0: return
+            if v_len == 0: return None
             p_v = (-v[1], v[0]) 
             p_v_len = math.sqrt(p_v[0]**2 + p_v[1]**2)
             if p_v_len == 0: p_v = (1,0); p_v_len = 1 
@@ -719,127 +1911,167 @@ class DragDropApp:
             
             v_to_ctrl = (ctrl_p[0] - src_c[0], ctrl_p[1] - src_c[1])
             v_to_ctrl_len = math.sqrt(v_to_ctrl[0]**2 + v_to_ctrl[1]**2)
-            if v_to_ctrl_len == 0: return
+            if v_to_ctrl_len == 0: return None
             start_p = ( src_c[0] + v_to_ctrl[0] * src_radius / v_to_ctrl_len,
                         src_c[1] + v_to_ctrl[1] * src_radius / v_to_ctrl_len )
             
             v_from_ctrl = (dest_c[0] - ctrl_p[0], dest_c[1] - ctrl_p[1])
             v_from_ctrl_len = math.sqrt(v_from_ctrl[0]**2 + v_from_ctrl[1]**2)
-            if v_from_ctrl_len == 0: return
+            if v_from_ctrl_len == 0: return None
             end_p = ( dest_c[0] - v_from_ctrl[0] * dest_radius / v_from_ctrl_len,
                       dest_c[1] - v_from_ctrl[1] * dest_radius / v_from_ctrl_len )
             
-            self.graph_canvas.create_line(start_p, ctrl_p, end_p, smooth=True, arrow=tk.LAST, width=2, tags=tags)
-            self.graph_canvas.create_text(ctrl_p[0], ctrl_p[1], text=symbol, tags=tags, fill="black") 
+            return (start_p + ctrl_p + end_p), ctrl_p
 
     # --- NFA TO DFA CONVERSION LOGIC ---
 
-    def run_nfa_to_dfa_conversion(self):
+    def run_nfa_to_dfa_conversion(self, silent=False):
 
         """The main function to build and convert the NFA."""
         
         if not self.start_state_item:
-            simpledialog.messagebox.showerror("Error", "Please set a starting state.")
+            if not silent:
+                simpledialog.messagebox.showerror("Error", "Please set a starting state.")
             return
 
-        states = set(self.state_names.values())
-        if not states: 
+        if not self.state_names:
              self.refresh_all() 
              return
-             
-        alphabet = set(t[2] for t in self.transitions if t[2] not in self.epsilon_symbols)
-        alphabet = sorted(list(alphabet))
+
+        nfa = self.build_nfa()
+        states, nfa_table = nfa["states"], nfa["table"]
+        alphabet = sorted(nfa["alphabet"])
+        start_state, final_states_names = nfa["start_state"], nfa["final_states"]
         
-        start_state = self.state_names.get(self.start_state_item)
-        final_states_names = {self.state_names.get(item) for item in self.final_states}
+        self.populate_nfa_table_gui(nfa_table, states, alphabet, start_state, final_states_names)
 
+        has_classes = has_char_classes(alphabet)
+        reduce = self.reduce_nfa_var.get()
+        options = sorted(self.epsilon_symbols) + ["epsilon-free"] + (["reduce"] if reduce else [])
+        fingerprint = nfa_fingerprint(nfa, options)
+        cached = self.conversion_cache.get(fingerprint)
+        if cached is not None:
+            alphabet, dfa = cached
+            self.set_status("DFA taken from the conversion cache")
+        else:
+            started = time.perf_counter()
+            # Subset construction runs on the cached epsilon-free NFA, so no closures are computed
+            # here; with "Reduce NFA" it is also bisimulation-reduced
+            epsilon_free = self.get_epsilon_free_nfa()
+            if reduce:
+                epsilon_free, stats = reduce_nfa(epsilon_free)
+                stats["states_before"] = len(states)
+                stats["transitions_before"] = sum(len(t) for row in nfa_table.values() for t in row.values())
+                self.set_status(format_reduction_stats(stats))
+            nfa_table, start_state = epsilon_free["table"], epsilon_free["start_state"]
+            final_states_names = epsilon_free["final_states"]
+
+            # Character classes ([a-z], ...) are converted over their minterms
+            if has_classes:
+                nfa_table, alphabet = expand_to_minterms(nfa_table, self.epsilon_symbols)
+
+            # Reuses the rows of every subset the edits since the last run did not touch
+            self.subset_constructor.update(nfa_table, start_state, final_states_names, alphabet)
+            dfa = self.subset_constructor.to_dfa()
+            self.conversion_cache.put(fingerprint, alphabet, dfa)
+            if (self.conversion_cache.directory is not None
+                    and time.perf_counter() - started >= self.conversion_cache_min_seconds):
+                threading.Thread(target=self.conversion_cache.store, args=(fingerprint, alphabet, dfa),
+                                 daemon=True).start()
+
+        dfa_transitions = {(src, symbol): dest for src, row in dfa["transitions"].items() for symbol, dest in row.items()}
+        self.populate_dfa_table_gui({name: name for name in dfa["states"]}, dfa_transitions, alphabet,
+                                    dfa["start_state"], dfa["final_states"])
+
+        self.last_dfa = dfa
+        if has_classes:
+            self.last_dfa = merge_class_transitions(self.last_dfa)
+        if self.dfa_view is not None and self.dfa_view.is_open():
+            self.dfa_view.show(self.last_dfa)
+
+    def build_nfa(self):
+
+        """The drawn NFA in PROGRAM2's NFA dict format (epsilon moves keep their symbols)."""
+        states = set(self.state_names.values())
         nfa_table = {s: {} for s in states}
         for (src_item, dest_item, symbol) in self.transitions:
             src_name = self.state_names.get(src_item)
             dest_name = self.state_names.get(dest_item)
             if src_name and dest_name:
-                if symbol not in nfa_table[src_name]:
-                    nfa_table[src_name][symbol] = set()
-                nfa_table[src_name][symbol].add(dest_name)
-        
-        self.populate_nfa_table_gui(nfa_table, states, alphabet, start_state, final_states_names)
+                nfa_table[src_name].setdefault(symbol, set()).add(dest_name)
+        return {
+            "states": states,
+            "alphabet": {t[2] for t in self.transitions if t[2] not in self.epsilon_symbols},
+            "table": nfa_table,
+            "start_state": self.state_names.get(self.start_state_item),
+            "final_states": {self.state_names.get(item) for item in self.final_states}
+        }
 
-        dfa_states = {} 
-        dfa_transitions = {} 
-        dfa_final_states = set()
-        
-        def get_epsilon_closure(state_set):
-            closure = set(state_set)
-            q = deque(state_set)
-            while q:
-                current = q.popleft()
-                if current not in nfa_table:
-                    continue
-                for e_sym in self.epsilon_symbols:
-                    if e_sym in nfa_table.get(current, {}):
-                        for next_state in nfa_table[current][e_sym]:
-                            if next_state not in closure:
-                                closure.add(next_state)
-                                q.append(next_state)
-            return frozenset(closure)
-
-        q0_nfa_set = get_epsilon_closure({start_state})
-        if not q0_nfa_set:
-            q0_nfa_set = frozenset({'Ø'}) 
-            
-        dfa_states[q0_nfa_set] = self.format_dfa_state_name(q0_nfa_set)
-        dfa_start_state = dfa_states[q0_nfa_set]
-        
-        work_list = deque([q0_nfa_set])
-        processed_states = {q0_nfa_set} 
-        
-        while work_list:
-            current_nfa_set = work_list.popleft()
-            current_dfa_name = dfa_states[current_nfa_set]
-            
-            if not current_nfa_set.isdisjoint(final_states_names):
-                dfa_final_states.add(current_dfa_name)
+    def get_epsilon_free_nfa(self):
 
-            for symbol in alphabet:
-                move_set = set()
-                for nfa_state in current_nfa_set:
-                    if nfa_state in nfa_table:
-                        move_set.update(nfa_table.get(nfa_state, {}).get(symbol, set()))
-                
-                next_nfa_set = get_epsilon_closure(move_set)
-                
-                if not next_nfa_set:
-                    next_nfa_set = frozenset({'Ø'}) 
+        """The epsilon-free equivalent of the drawn NFA, rebuilt only after an edit."""
+        if self._epsilon_free_cache is None or self._epsilon_free_cache[0] != self.model_version:
+            self._epsilon_free_cache = (self.model_version, remove_epsilon(self.build_nfa(), self.epsilon_symbols))
+        return self._epsilon_free_cache[1]
 
-                if next_nfa_set not in dfa_states:
-                    new_dfa_name = self.format_dfa_state_name(next_nfa_set)
-                    dfa_states[next_nfa_set] = new_dfa_name
-                
-                if next_nfa_set not in processed_states:
-                    work_list.append(next_nfa_set)
-                    processed_states.add(next_nfa_set)
-                
-                next_dfa_name = dfa_states[next_nfa_set]
-                dfa_transitions[(current_dfa_name, symbol)] = next_dfa_name
-        
-        self.populate_dfa_table_gui(dfa_states, dfa_transitions, alphabet, dfa_start_state, dfa_final_states)
+    def on_model_changed(self):
+
+        """Called after every edit; in live mode, schedules a debounced re-conversion."""
+        self.model_version += 1
+        if self._live_convert_after_id is not None:
+            self.root.after_cancel(self._live_convert_after_id)
+            self._live_convert_after_id = None
+        if self.live_convert_var.get():
+            self._live_convert_after_id = self.root.after(self.live_convert_delay_ms, self._run_live_conversion)
+
+    def on_disk_cache_toggled(self):
+        """Slow conversions are saved across sessions only while "Disk Cache" is checked."""
+        self.conversion_cache.directory = default_cache_directory() if self.disk_cache_var.get() else None
+
+    def _run_live_conversion(self):
+        self._live_convert_after_id = None
+        self.run_nfa_to_dfa_conversion(silent=True)
+
+    def show_dfa_graph(self):
+
+        """Opens (or refreshes) the DFA graph window for the last conversion."""
+        if self.last_dfa is None:
+            self.run_nfa_to_dfa_conversion()
+            if self.last_dfa is None:
+                return
+        if self.dfa_view is None or not self.dfa_view.is_open():
+            self.dfa_view = DFAGraphView(self)
+        self.dfa_view.show(self.last_dfa)
 
 
     def refresh_all(self):
 
         """Clears the graph, resets state, and clears the tables."""
         
+        self.render_scheduler.cancel()
+
         all_circles = self.graph_canvas.find_withtag(self.draggable_circle_tag)
         for item in all_circles:
             self.graph_canvas.delete(item)
             
         self.graph_canvas.delete(self.arrow_visuals_tag)
+        self._visual_pool = {}
         
         self.start_state_item = None
         self.final_states = set()
         self.transitions = []
         self.state_names = {}
+        self.state_positions = {}
+        self.state_grid.clear()
+        self._shown_states = set()
         self.next_state_id = 1
+        self.last_dfa = None
+        self.subset_constructor.reset()
+        self._load_generation += 1
+        self.model_version += 1
+
+        self.view_scale = 1.0
+        self.view_offset = [0.0, 0.0]
         
         self.create_table(self.nfa_table_frame, "nfa")
         self.create_table(self.dfa_table_frame, "dfa")
@@ -849,10 +2081,7 @@ class DragDropApp:
     def format_dfa_state_name(self, state_set):
  
         """Helper to format DFA state names for the table."""
-        if state_set == frozenset({'Ø'}):
-            return "Ø"
-        sorted_states = sorted(list(state_set), key=lambda x: (int(x) if x.isdigit() else float('inf'), x))
-        return "{" + ",".join(sorted_states) + "}"
+        return format_subset_name(state_set)
 
     def populate_nfa_table_gui(self, nfa_table, states, alphabet, start_state, final_states):
         """Re-create and populate the NFA table."""
@@ -925,12 +2154,11 @@ class DragDropApp:
     # ==================================================================
     def export_to_json(self):
         """Saves the current graph state to an auto-incrementing JSON file
-           with clean, sorted, and validated formatting."""
+           with clean, sorted, and validated formatting. The model is
+           snapshotted here and streamed to disk on a worker thread."""
         try:
-            states_data = []
-            transitions_data = []
             alphabet_set = set()
-            unique_transitions_set = set()
+            transitions_by_source = {} # src name -> {(dest name, symbol)}, which also de-duplicates
 
             # --- 1. Determine Start State ---
             # Use the same sorting key as the tables
@@ -948,70 +2176,101 @@ class DragDropApp:
                 if all_names:
                     start_state_name = all_names[0]
 
-            # --- 2. Process States ---
+            # The epsilon-free option exports the cached equivalent NFA instead of the drawn moves
+            epsilon_free = None
+            if self.export_epsilon_free_var.get() and self.start_state_item:
+                epsilon_free = self.get_epsilon_free_nfa()
+                start_state_name = epsilon_free["start_state"]
+
+            # --- 2. Snapshot States ---
             # Sort states by name using the same key
             sorted_items = sorted(self.state_names.items(), key=lambda item: state_sort_key(item[1]))
-            
+            r = self.default_radius
+            state_rows = []
             for item_id, name in sorted_items:
-                try:
-                    coords = self.graph_canvas.coords(item_id)
-                    if not coords: continue 
-                    
-                    # Round coordinates to 2 decimal places
-                    rounded_coords = [round(c, 2) for c in coords]
-                    
-                    # Build state dictionary with consistent key order
-                    state_dict = {
-                        "name": name,
-                        "coords": rounded_coords,
-                        "is_start": name == start_state_name,
-                        "is_final": item_id in self.final_states
-                    }
-                    states_data.append(state_dict)
-                except tk.TclError:
-                    continue 
-
-            # --- 3. Process Transitions ---
-            for (src_item, dest_item, symbol) in self.transitions:
-                src_name = self.state_names.get(src_item)
-                dest_name = self.state_names.get(dest_item)
-                
-                if src_name and dest_name:
-                    # Add to alphabet (ignore epsilon)
-                    if symbol not in self.epsilon_symbols:
-                        alphabet_set.add(symbol)
-                    
-                    # Ensure transition is unique
-                    transition_tuple = (src_name, dest_name, symbol)
-                    if transition_tuple not in unique_transitions_set:
-                        unique_transitions_set.add(transition_tuple)
-                        # Build transition dictionary with consistent key order
-                        transitions_data.append({
-                            "source": src_name,
-                            "target": dest_name,
-                            "symbol": symbol
-                        })
-            
-            # Sort transitions for readability
-            transitions_data.sort(key=lambda t: (state_sort_key(t['source']), state_sort_key(t['target']), t['symbol']))
-
-            # --- 4. Build Final JSON Output ---
-            # Build final dictionary with consistent key order
-            output_data = {
-                "alphabet": sorted(list(alphabet_set)),
-                "states": states_data,
-                "transitions": transitions_data
-            }
-
-            filename = f"OUTPUT{self.export_counter}.json"
-            with open(filename, 'w') as f:
-                json.dump(output_data, f, indent=4)
-            
-            simpledialog.messagebox.showinfo("Export Successful", f"Graph exported to {filename}")
+                pos = self.state_positions.get(item_id)
+                if pos is None: continue 
+                if epsilon_free is None:
+                    state_rows.append((name, pos[0], pos[1], item_id in self.final_states))
+                elif name in epsilon_free["states"]:
+                    state_rows.append((name, pos[0], pos[1], name in epsilon_free["final_states"]))
+
+            # --- 3. Snapshot Transitions ---
+            if epsilon_free is not None:
+                alphabet_set.update(epsilon_free["alphabet"])
+                for src_name, row in epsilon_free["table"].items():
+                    for symbol, targets in row.items():
+                        transitions_by_source.setdefault(src_name, set()).update((t, symbol) for t in targets)
+            else:
+                for (src_item, dest_item, symbol) in self.transitions:
+                    src_name = self.state_names.get(src_item)
+                    dest_name = self.state_names.get(dest_item)
+
+                    if src_name and dest_name:
+                        # Add to alphabet (ignore epsilon)
+                        if symbol not in self.epsilon_symbols:
+                            alphabet_set.add(symbol)
+                        transitions_by_source.setdefault(src_name, set()).add((dest_name, symbol))
+
+            indent = None if self.export_compact_var.get() else 4
+            filename = f"OUTPUT{self.export_counter}.json" + (".gz" if self.export_gzip_var.get() else "")
             self.export_counter += 1
 
         except Exception as e:
             simpledialog.messagebox.showerror("Export Error", f"Failed to export JSON: {e}")
+            return
+
+        # --- 4. Stream the JSON Output ---
+        def state_dicts():
+            for name, x, y, is_final in state_rows:
+                # World coordinates, so the file doesn't depend on the current zoom/pan.
+                # Round coordinates to 2 decimal places
+                # Build state dictionary with consistent key order
+                yield {
+                    "name": name,
+                    "coords": [round(c, 2) for c in (x - r, y - r, x + r, y + r)],
+                    "is_start": name == start_state_name,
+                    "is_final": is_final
+                }
+
+        transition_total = sum(len(targets) for targets in transitions_by_source.values())
+
+        def transition_dicts(job):
+            # Sorted by (source, target, symbol), one source at a time
+            written = 0
+            for src_name in sorted(transitions_by_source, key=state_sort_key):
+                targets = sorted(transitions_by_source[src_name], key=lambda t: (state_sort_key(t[0]), t[1]))
+                written += len(targets)
+                job.report(f"{written}/{transition_total} transitions")
+                for dest_name, symbol in targets:
+                    # Build transition dictionary with consistent key order
+                    yield {
+                        "source": src_name,
+                        "target": dest_name,
+                        "symbol": symbol
+                    }
+
+        def work(job):
+            # Written under a temporary name and renamed once complete, so a
+            # cancelled or failed export never leaves a half-written file behind
+            partial = temporary_path(filename)
+            try:
+                with open_automaton_file(partial, 'w') as f:
+                    write_automaton_json(f, sorted(list(alphabet_set)), state_dicts(), transition_dicts(job),
+                                         indent=indent)
+                os.replace(partial, filename)
+            except BaseException:
+                if os.path.exists(partial):
+                    os.remove(partial)
+                raise
+            return filename
+
+        self.start_job(f"Exporting {filename}", work, self._on_export_done, error_title="Export Error")
+
+    def _on_export_done(self, job, filename):
+        self.end_job(job)
+        self.set_status(f"Graph exported to {filename}")
+        simpledialog.messagebox.showinfo("Export Successful", f"Graph exported to {filename}")
     # ==================================================================
     # === END MODIFIED FUNCTION ===
     # ==================================================================
@@ -1021,69 +2280,239 @@ class DragDropApp:
         """Loads a graph state from a selected JSON file."""
         filepath = filedialog.askopenfilename(
             title="Select JSON Script",
-            filetypes=[("JSON files", "*.json"), ("All files", "*.*")]
+            filetypes=[("JSON files", "*.json *.json.gz"), ("All files", "*.*")]
         )
         if not filepath:
             return 
 
-        try:
-            self.refresh_all()
+        # Reading, parsing and any auto layout happen on a worker thread;
+        # only canvas item creation comes back to the mainloop.
+        self.start_job(
+            f"Loading {os.path.basename(filepath)}",
+            lambda job: parse_graph_file(filepath, self.default_radius, job),
+            lambda job, model: self.bulk_load_graph(model, job=job),
+            error_title="Upload Error"
+        )
 
-            with open(filepath, 'r') as f:
-                data = json.load(f)
+    def load_from_regex(self):
 
-            name_to_item_id_map = {}
-            max_state_id = 0
+        """Replaces the graph with the Thompson NFA of a regular expression."""
+        pattern = simpledialog.askstring(
+            "From Regex",
+            "Regular expression (symbols, |, *, +, ?, parentheses; e = epsilon):",
+            parent=self.root
+        )
+        if pattern is None:
+            return
 
-            for state_data in data.get("states", []):
-                name = state_data.get("name")
-                coords = state_data.get("coords")
-                if not name or not coords:
-                    continue
+        self.start_job(
+            "Compiling regular expression",
+            lambda job: prepare_graph_model(nfa_to_json_data(regex_to_nfa(pattern)), self.default_radius),
+            lambda job, model: self.bulk_load_graph(model, job=job),
+            error_title="Regex Error"
+        )
 
+    def load_graph_data(self, data):
+
+        """Replaces the current graph with one in the project's JSON format (synchronously parsed)."""
+        try:
+            model = prepare_graph_model(data, self.default_radius)
+        except Exception as e:
+            simpledialog.messagebox.showerror("Upload Error", f"Failed to load JSON: {e}")
+            return
+        self.bulk_load_graph(model)
+
+    def bulk_load_graph(self, model, batch_size=None, job=None):
+
+        """
+        Builds the editor model from a prepared graph (see prepare_graph_model).
+        Canvas ovals are created in batches from after() callbacks, visible
+        states first, so the UI stays responsive and shows progress. Cancelling
+        the job between batches leaves an empty graph.
+        """
+        if batch_size is None:
+            batch_size = self.load_batch_size
+        self.refresh_all()
+        generation = self._load_generation
+        started = time.perf_counter()
+
+        states = model["states"]
+        positions = {name: pos for name, pos, _, _ in states}
+        if model["fit_view"]:
+            self.fit_view_to_states(positions.values())
+
+        # States inside the current view go first so the screen fills in immediately
+        region = self.get_visible_region()
+        r = self.default_radius
+        def off_screen(state):
+            c_x, c_y = self.world_to_canvas(*state[1])
+            return not self.rect_is_visible(region, c_x - r, c_y - r, c_x + r, c_y + r)
+        ordered = sorted(states, key=off_screen)
+
+        name_to_item_id_map = {}
+
+        def create_batch(begin):
+            if generation != self._load_generation:
+                self.end_job(job)
+                return # The graph was cleared or replaced meanwhile
+            if job is not None and job.cancelled:
+                self.refresh_all()
+                self.end_job(job)
+                self.set_status(f"{job.title} cancelled")
+                return
+            end = min(begin + batch_size, len(ordered))
+            for name, (x, y), is_start, is_final in ordered[begin:end]:
                 item_id = self.graph_canvas.create_oval(
-                    coords, 
+                    x - r, y - r, x + r, y + r,
                     outline='black', 
                     width=2, 
                     fill='green', 
+                    state='hidden',
                     tags=(self.draggable_circle_tag, self.inside_box_tag)
                 )
-                
                 self.state_names[item_id] = name
+                self.set_state_position(item_id, x, y)
                 name_to_item_id_map[name] = item_id
-
-                if state_data.get("is_start"):
+                if is_start:
                     self.start_state_item = item_id
-                
-                if state_data.get("is_final"):
+                if is_final:
                     self.final_states.add(item_id)
-                
-                try:
-                    state_num = int(name)
-                    if state_num > max_state_id:
-                        max_state_id = state_num
-                except ValueError:
-                    pass 
-            
-            self.next_state_id = max_state_id + 1
 
-            for trans_data in data.get("transitions", []):
-                src_name = trans_data.get("source")
-                dest_name = trans_data.get("target")
-                symbol = trans_data.get("symbol")
+            self.set_status(f"Loading states {end}/{len(ordered)}...")
+            if end < len(ordered):
+                self.root.after(1, create_batch, end)
+            else:
+                finish()
+
+        def finish():
+            self.next_state_id = model["max_state_id"] + 1
+            self.transitions = [
+                (name_to_item_id_map[src], name_to_item_id_map[dest], symbol)
+                for src, dest, symbol in model["transitions"]
+                if src in name_to_item_id_map and dest in name_to_item_id_map
+            ]
+            self.graph_canvas.lower(self.draggable_circle_tag, self.cover_up_tag)
+            self.refresh_viewport()
+            self.on_model_changed()
+            self.end_job(job)
+            self.set_status(
+                f"Loaded {len(states)} states and {len(self.transitions)} transitions "
+                f"in {time.perf_counter() - started:.1f}s"
+            )
 
-                src_item = name_to_item_id_map.get(src_name)
-                dest_item = name_to_item_id_map.get(dest_name)
+        create_batch(0)
 
-                if src_item and dest_item and symbol:
-                    self.transitions.append((src_item, dest_item, symbol))
-            
-            self.redraw_all_visuals()
-            simpledialog.messagebox.showinfo("Upload Successful", "Graph loaded from file.")
+    def set_status(self, text):
+        self.status_label.config(text=text)
 
-        except Exception as e:
-            simpledialog.messagebox.showerror("Upload Error", f"Failed to load JSON: {e}")
-            self.refresh_all() 
+    # --- Automatic Layout (runs off the UI thread) ---
+
+    def start_job(self, title, work, on_done, error_title="Error"):
+
+        """
+        Runs work(job) as a cancellable BackgroundJob; its progress is shown in
+        the status bar and the Cancel button stops it. on_done(job, result) runs
+        on the mainloop and must call end_job(job) once it has finished too.
+        """
+        if self.current_job is not None:
+            simpledialog.messagebox.showerror("Busy", f"{self.current_job.title} is still running.")
+            return
+        job = BackgroundJob(title)
+        self.current_job = job
+        self.cancel_job_button.config(state="normal")
+        self.set_status(f"{title}...")
+        self.run_in_background(lambda: work(job), lambda result: on_done(job, result), error_title, job)
+
+    def end_job(self, job):
+        if job is not None and self.current_job is job:
+            self.current_job = None
+            self.cancel_job_button.config(state="disabled")
+
+    def cancel_current_job(self):
+        if self.current_job is not None:
+            self.current_job.cancel()
+            self.set_status(f"Cancelling {self.current_job.title.lower()}...")
+
+    def run_in_background(self, work, on_done, error_title="Error", job=None):
+
+        """
+        Runs work() on a worker thread and hands its result to on_done() back on
+        the Tk mainloop (Tk itself must only be touched from the main thread).
+        With a job, its progress is shown while the worker runs.
+        """
+        result = {}
+
+        def worker():
+            try:
+                result["value"] = work()
+            except Exception as e:
+                result["error"] = e
+
+        thread = threading.Thread(target=worker, daemon=True)
+        thread.start()
+
+        def poll():
+            if thread.is_alive():
+                if job is not None and job.progress and not job.cancelled:
+                    self.set_status(f"{job.title}: {job.progress}")
+                self.root.after(50, poll)
+                return
+            self.graph_canvas.config(cursor="")
+            if isinstance(result.get("error"), JobCancelled):
+                self.end_job(job)
+                self.set_status(f"{job.title} cancelled")
+            elif "error" in result:
+                self.end_job(job)
+                self.set_status("")
+                simpledialog.messagebox.showerror(error_title, str(result["error"]))
+            else:
+                on_done(result["value"])
+
+        self.graph_canvas.config(cursor="watch")
+        self.root.after(50, poll)
+
+    def auto_layout_current_graph(self):
+
+        """Re-positions every state of the current graph with the automatic layout."""
+        if not self.state_names:
+            return
+        item_for_name = {name: item for item, name in self.state_names.items()}
+        names = list(item_for_name)
+        edges = [(self.state_names.get(t[0]), self.state_names.get(t[1])) for t in self.transitions]
+        start = self.state_names.get(self.start_state_item)
+
+        def done(positions):
+            for name, (x, y) in positions.items():
+                item = item_for_name.get(name)
+                if item in self.state_positions:
+                    self.set_state_position(item, x, y)
+            self.fit_view_to_states()
+            self.refresh_viewport()
+
+        self.run_in_background(lambda: auto_layout(names, edges, start), done, error_title="Layout Error")
+
+    def fit_view_to_states(self, positions=None, margin=40):
+
+        """Sets the view transform so every state (or the given world positions) fits inside the drop target."""
+        if positions is None:
+            positions = self.state_positions.values()
+        positions = list(positions)
+        region = self.get_visible_region()
+        if not region or not positions:
+            return
+        xs = [p[0] for p in positions]
+        ys = [p[1] for p in positions]
+        r = self.default_radius
+        width = max(xs) - min(xs) + 2 * r
+        height = max(ys) - min(ys) + 2 * r
+        avail_w = max(1.0, region[2] - region[0] - 2 * margin)
+        avail_h = max(1.0, region[3] - region[1] - 2 * margin)
+
+        scale = min(1.0, avail_w / width, avail_h / height)
+        self.view_scale = max(self.min_view_scale, min(self.max_view_scale, scale))
+        center_x, center_y = (max(xs) + min(xs)) / 2, (max(ys) + min(ys)) / 2
+        self.view_offset = [(region[0] + region[2]) / 2 - center_x * self.view_scale,
+                            (region[1] + region[3]) / 2 - center_y * self.view_scale]
 
 
 if __name__ == "__main__":
@@ -1,8 +1,28 @@
 
 
+import argparse
+import asyncio
+import bisect
+import gzip
+import hashlib
+import heapq
 import json
+import mmap
+import multiprocessing
+import os
+import random
+import re
+import shutil
+import signal
 import sys
-from collections import deque
+import tempfile
+import time
+from array import array
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, islice
+from multiprocessing import shared_memory
+from urllib.parse import parse_qs, urlsplit
 
 
 
@@ -28,11 +48,17 @@ class DFAMinimizer:
     and reconstructing a DFA.
     """
     
-    def __init__(self, dfa_data):
+    def __init__(self, dfa_data, verbose=True):
+        self.verbose = verbose
         self._validate_input(dfa_data)
         self._parse_dfa(dfa_data)
         self.dead_state_name = None
 
+    def _log(self, message):
+        """Progress/warning output on stderr, silenced when verbose is False."""
+        if self.verbose:
+            print(message, file=sys.stderr)
+
     def _validate_input(self, data):
         """Basic validation of the input JSON structure."""
         required_keys = ["alphabet", "states", "transitions"]
@@ -54,13 +80,17 @@ class DFAMinimizer:
         self.states = set()
         self.start_state = None
         self.final_states = set()
+        # Optional pattern labels (see build_multi_pattern_dfa): {state -> frozenset of IDs}
+        self.state_labels = {}
         
         for state_info in data["states"]:
             name = state_info["name"]
             self.states.add(name)
+            if state_info.get("labels"):
+                self.state_labels[name] = frozenset(state_info["labels"])
             if state_info["is_start"]:
                 if self.start_state is not None:
-                    print(f"Warning: Multiple start states found. Using '{name}'.", file=sys.stderr)
+                    self._log(f"Warning: Multiple start states found. Using '{name}'.")
                 self.start_state = name
             if state_info["is_final"]:
                 self.final_states.add(name)
@@ -74,9 +104,32 @@ class DFAMinimizer:
             if sym not in self.alphabet:
                 raise ValueError(f"Transition symbol '{sym}' is not in the declared alphabet.")
             if sym in self.transitions[src]:
-                print(f"Warning: Non-deterministic transition found for ({src}, {sym}). Using last one.", file=sys.stderr)
+                self._log(f"Warning: Non-deterministic transition found for ({src}, {sym}). Using last one.")
             self.transitions[src][sym] = tgt
 
+        if has_char_classes(self.alphabet):
+            self._split_class_alphabet()
+
+    def _split_class_alphabet(self):
+        """
+        Replaces character-class symbols by their minterms, so completion
+        and Hopcroft's splits work per class of equivalent characters.
+        """
+        minterms = compute_minterms(self.alphabet)
+        labels_of = {}
+        for label, _, covering in minterms:
+            for symbol in covering:
+                labels_of.setdefault(symbol, []).append(label)
+        for state, trans_map in self.transitions.items():
+            split_map = {}
+            for symbol, target in trans_map.items():
+                for label in labels_of.get(symbol, ()):
+                    if label in split_map and split_map[label] != target:
+                        self._log(f"Warning: Overlapping classes on ({state}, {label}). Using '{symbol}'.")
+                    split_map[label] = target
+            self.transitions[state] = split_map
+        self.alphabet = {label for label, _, _ in minterms}
+
     def _complete_dfa(self):
         """
         Ensures the DFA is "complete" by adding a dead state.
@@ -124,7 +177,7 @@ class DFAMinimizer:
 
         unreachable = self.states - reachable_states
         if unreachable:
-            print(f"Removing unreachable states: {unreachable}", file=sys.stderr)
+            self._log(f"Removing unreachable states: {unreachable}")
         
         self.states = reachable_states
         self.final_states = self.final_states.intersection(reachable_states)
@@ -139,20 +192,20 @@ class DFAMinimizer:
         Implements Hopcroft's DFA minimization algorithm.
         Partitions states into blocks of indistinguishable states.
         """
-        non_final_states = self.states - self.final_states
-        
-        # 1. Initial Partitions: P = {F, Q-F}
+        # 1. Initial Partitions: P = {F, Q-F}, with states that carry
+        # different pattern labels kept apart from the start
         # Use frozenset for hashable set-of-sets
-        P = {frozenset(self.final_states), frozenset(non_final_states)}
-        if not self.final_states:
-             P = {frozenset(non_final_states)}
-        if not non_final_states:
-             P = {frozenset(self.final_states)}
+        initial_blocks = {}
+        for state in self.states:
+            key = (state in self.final_states, self.state_labels.get(state, frozenset()))
+            initial_blocks.setdefault(key, set()).add(state)
+        P = {frozenset(block) for block in initial_blocks.values()}
 
-        # 2. Worklist: W = {F, Q-F} (or just {F} as an optimization)
-        W = {frozenset(self.final_states)}
-        if len(non_final_states) < len(self.final_states):
-            W = {frozenset(non_final_states)}
+        # 2. Worklist: every initial block but the largest one
+        # (for the plain split this is just the smaller of F and Q-F)
+        W = set(P)
+        if W:
+            W.remove(max(W, key=len))
 
         # 3. Build reverse transitions: reverse_trans[symbol][target] = {source1, ...}
         reverse_trans = {sym: {s: set() for s in self.states} for sym in self.alphabet}
@@ -160,6 +213,10 @@ class DFAMinimizer:
             for symbol, target in trans_map.items():
                 reverse_trans[symbol][target].add(source)
 
+        # The partition each state is in, so that X only visits the partitions
+        # it touches (many labelled initial blocks make a full scan of P costly)
+        block_of = {state: Y for Y in P for state in Y}
+
         # 4. Process the worklist
         while W:
             A = W.pop() # Get a partition from the worklist
@@ -170,34 +227,71 @@ class DFAMinimizer:
                 for target_state in A:
                     X.update(reverse_trans[symbol][target_state])
                 
+                # Group X by partition: Y ∩ X for every partition Y that X meets
+                touched = {}
+                for state in X:
+                    touched.setdefault(block_of[state], set()).add(state)
+
                 # Refine P by splitting partitions based on X
-                P_new = set()
-                for Y in P: # For each partition Y in P
-                    Y_intersect_X = Y.intersection(X)
-                    Y_diff_X = Y.difference(X)
+                for Y, Y_intersect_X in touched.items():
+                    if len(Y_intersect_X) == len(Y):
+                        continue # No split, keep Y as is
+                    Y_intersect_X = frozenset(Y_intersect_X)
+                    Y_diff_X = Y.difference(Y_intersect_X)
+
+                    # Split Y into two new partitions
+                    P.remove(Y)
+                    P.add(Y_intersect_X)
+                    P.add(Y_diff_X)
+                    for state in Y_intersect_X:
+                        block_of[state] = Y_intersect_X
+                    for state in Y_diff_X:
+                        block_of[state] = Y_diff_X
                     
-                    if Y_intersect_X and Y_diff_X:
-                        # Split Y into two new partitions
-                        P_new.add(frozenset(Y_intersect_X))
-                        P_new.add(frozenset(Y_diff_X))
-                        
-                        # Update worklist W
-                        if Y in W:
-                            W.remove(Y)
-                            W.add(frozenset(Y_intersect_X))
-                            W.add(frozenset(Y_diff_X))
-                        else:
-                            if len(Y_intersect_X) <= len(Y_diff_X):
-                                W.add(frozenset(Y_intersect_X))
-                            else:
-                                W.add(frozenset(Y_diff_X))
+                    # Update worklist W
+                    if Y in W:
+                        W.remove(Y)
+                        W.add(Y_intersect_X)
+                        W.add(Y_diff_X)
                     else:
-                        # No split, keep Y as is
-                        P_new.add(Y)
-                P = P_new # Update P with the refined partitions
+                        if len(Y_intersect_X) <= len(Y_diff_X):
+                            W.add(Y_intersect_X)
+                        else:
+                            W.add(Y_diff_X)
         
         return P
 
+    def _signature_refinement(self, workers=1):
+        """
+        Computes the same partition as _hopcroft_algorithm by Moore-style
+        signature rounds: a state's signature is its block plus the blocks of
+        its successors, and states with equal signatures share the next
+        round's block. Rounds stop once the block count no longer grows.
+        With workers > 1, each round's signatures are computed on a process
+        pool over slices of the states (see _parallel_signature_rounds).
+        """
+        states = sorted(self.states)
+        index = {state: i for i, state in enumerate(states)}
+        symbols = sorted(self.alphabet)
+        targets = [index[self.transitions[state][symbol]] for state in states for symbol in symbols]
+
+        # Same initial split as Hopcroft: final/non-final, then pattern labels
+        initial_ids = {}
+        blocks = []
+        for state in states:
+            key = (state in self.final_states, self.state_labels.get(state, frozenset()))
+            blocks.append(initial_ids.setdefault(key, len(initial_ids)))
+
+        if workers > 1 and len(states) > 1:
+            blocks = _parallel_signature_rounds(targets, blocks, len(symbols), workers)
+        else:
+            blocks = _signature_rounds(targets, blocks, len(symbols))
+
+        partitions = {}
+        for state, block in zip(states, blocks):
+            partitions.setdefault(block, set()).add(state)
+        return {frozenset(p) for p in partitions.values()}
+
     def _reconstruct_dfa(self, partitions):
         """
         Builds the new minimized DFA from the final partitions.
@@ -207,6 +301,7 @@ class DFAMinimizer:
         new_start_state = None
         new_final_states = set()
         new_transitions = {}
+        new_labels = {}
         
         # Map old state partitions (frozensets) to new state names (strings)
         partition_to_name = {p: _format_state_name(p) for p in partitions}
@@ -232,6 +327,8 @@ class DFAMinimizer:
             # All old states in a partition are indistinguishable,
             # so we can just pick one to find the new transition.
             representative_old_state = next(iter(p))
+            if representative_old_state in self.state_labels:
+                new_labels[new_name] = self.state_labels[representative_old_state]
             new_transitions[new_name] = {}
             
             for symbol in self.alphabet:
@@ -243,23 +340,28 @@ class DFAMinimizer:
                 
                 new_transitions[new_name][symbol] = new_target_state
 
-        return {
+        minimized = {
             "states": new_states,
             "alphabet": self.alphabet,
             "transitions": new_transitions,
             "start_state": new_start_state,
             "final_states": new_final_states
         }
+        if new_labels:
+            minimized["labels"] = new_labels
+        return minimized
 
-    def minimize(self):
+    def minimize(self, workers=None):
         """
         Public method to run the full minimization pipeline.
         Returns the minimized DFA in the internal dict format.
+        workers=None uses Hopcroft's algorithm; a number selects signature
+        refinement on that many processes (same result, meant for very large DFAs).
         """
-        print("1. Completing DFA by adding dead state (if needed)...", file=sys.stderr)
+        self._log("1. Completing DFA by adding dead state (if needed)...")
         self._complete_dfa()
         
-        print("2. Removing unreachable states...", file=sys.stderr)
+        self._log("2. Removing unreachable states...")
         self._remove_unreachable_states()
         
         # Store a copy of the reachable DFA for "before" comparison
@@ -270,22 +372,3090 @@ class DFAMinimizer:
             "start_state": self.start_state,
             "final_states": self.final_states.copy()
         }
+        if self.state_labels:
+            self.reachable_dfa["labels"] = {s: l for s, l in self.state_labels.items() if s in self.states}
         
-        print("3. Running Hopcroft's minimization algorithm...", file=sys.stderr)
-        final_partitions = self._hopcroft_algorithm()
+        if workers is None:
+            self._log("3. Running Hopcroft's minimization algorithm...")
+            final_partitions = self._hopcroft_algorithm()
+        else:
+            self._log(f"3. Running signature refinement on {workers} process(es)...")
+            final_partitions = self._signature_refinement(workers)
         
-        print(f"4. Reconstructing minimized DFA from {len(final_partitions)} partitions...", file=sys.stderr)
+        self._log(f"4. Reconstructing minimized DFA from {len(final_partitions)} partitions...")
         minimized_dfa = self._reconstruct_dfa(final_partitions)
         
-        print("\nMinimization complete.", file=sys.stderr)
+        self._log("\nMinimization complete.")
         return minimized_dfa
 
+# --- Signature Refinement (Parallel Minimization) ---
+#
+# States are numbered 0..n-1 and the complete transition function is a flat
+# array: targets[i * k + a] is the successor of state i on the a-th symbol.
+# For the parallel rounds, the transition and block arrays live in shared
+# memory; each worker attaches once and computes signatures for a slice of
+# states, and the coordinator numbers the distinct signatures in state order
+# and writes the new block array back before the next round.
+
+def _state_signatures(targets, blocks, symbol_count, start, end):
+    signatures = []
+    for i in range(start, end):
+        base = i * symbol_count
+        signatures.append((blocks[i],) + tuple(blocks[targets[base + a]] for a in range(symbol_count)))
+    return signatures
+
+def _number_signatures(signatures):
+    """New block ids, numbered by first occurrence so the result is deterministic."""
+    ids = {}
+    return [ids.setdefault(signature, len(ids)) for signature in signatures], len(ids)
+
+def _signature_rounds(targets, blocks, symbol_count):
+    block_count = len(set(blocks))
+    while True:
+        new_blocks, new_count = _number_signatures(
+            _state_signatures(targets, blocks, symbol_count, 0, len(blocks)))
+        if new_count == block_count:
+            return new_blocks
+        blocks, block_count = new_blocks, new_count
+
+_signature_worker_state = None
+
+def _init_signature_worker(targets_name, blocks_name, symbol_count):
+    global _signature_worker_state
+    # Pool workers share the coordinator's resource tracker; the coordinator unlinks both segments
+    targets_shm = shared_memory.SharedMemory(name=targets_name)
+    blocks_shm = shared_memory.SharedMemory(name=blocks_name)
+    _signature_worker_state = (targets_shm, blocks_shm, symbol_count)
+
+def _signature_worker_slice(bounds):
+    targets_shm, blocks_shm, symbol_count = _signature_worker_state
+    targets = targets_shm.buf.cast('i')
+    blocks = blocks_shm.buf.cast('i')
+    try:
+        return _state_signatures(targets, blocks, symbol_count, *bounds)
+    finally:
+        targets.release()
+        blocks.release()
+
+def _parallel_signature_rounds(targets, blocks, symbol_count, workers):
+    n = len(blocks)
+    item = array('i').itemsize
+    targets_shm = shared_memory.SharedMemory(create=True, size=max(1, len(targets)) * item)
+    blocks_shm = shared_memory.SharedMemory(create=True, size=n * item)
+    shared_targets = targets_shm.buf.cast('i')
+    shared_blocks = blocks_shm.buf.cast('i')
+    try:
+        shared_targets[:len(targets)] = array('i', targets)
+        shared_blocks[:] = array('i', blocks)
+        slice_size = -(-n // (workers * 4))
+        bounds = [(start, min(n, start + slice_size)) for start in range(0, n, slice_size)]
+        block_count = len(set(blocks))
+        with multiprocessing.Pool(workers, initializer=_init_signature_worker,
+                                  initargs=(targets_shm.name, blocks_shm.name, symbol_count)) as pool:
+            while True:
+                signatures = [sig for part in pool.map(_signature_worker_slice, bounds) for sig in part]
+                new_blocks, new_count = _number_signatures(signatures)
+                if new_count == block_count:
+                    return new_blocks
+                shared_blocks[:] = array('i', new_blocks)
+                block_count = new_count
+    finally:
+        shared_targets.release()
+        shared_blocks.release()
+        targets_shm.close()
+        blocks_shm.close()
+        targets_shm.unlink()
+        blocks_shm.unlink()
+
+def random_complete_dfa(state_count, alphabet=("a", "b"), final_ratio=0.1, seed=0):
+    """A random complete DFA in project JSON format (for benchmarks)."""
+    rng = random.Random(seed)
+    names = [str(i) for i in range(state_count)]
+    return {
+        "alphabet": list(alphabet),
+        "states": [{"name": name, "is_start": name == "0", "is_final": rng.random() < final_ratio}
+                   for name in names],
+        "transitions": [{"source": name, "target": rng.choice(names), "symbol": symbol}
+                        for name in names for symbol in alphabet]
+    }
+
+def benchmark_minimization(state_count=100000, worker_counts=None, seed=0):
+    """
+    Minimizes one random DFA with Hopcroft and with signature refinement on
+    each worker count (default: 1, 2, 4, ... up to the CPU count), checking
+    that every run yields Hopcroft's partition.
+    Returns [(engine, seconds, minimized state count)].
+    """
+    worker_counts = worker_counts or scaling_worker_counts()
+    data = random_complete_dfa(state_count, seed=seed)
+    results = []
+    started = time.perf_counter()
+    reference = DFAMinimizer(data, verbose=False).minimize()
+    results.append(("hopcroft", time.perf_counter() - started, len(reference["states"])))
+    for workers in worker_counts:
+        started = time.perf_counter()
+        minimized = DFAMinimizer(data, verbose=False).minimize(workers=workers)
+        elapsed = time.perf_counter() - started
+        if minimized["states"] != reference["states"]:
+            raise RuntimeError(f"Signature refinement on {workers} worker(s) disagrees with Hopcroft.")
+        results.append((f"signature x{workers}", elapsed, len(minimized["states"])))
+    return results
+
+# --- External-Memory Minimization ---
+#
+# For DFAs whose table does not fit in RAM. An external DFA is a directory:
+#     header.json   {"format": "external-dfa", "states": n, "alphabet": [...],
+#                    "start": i, "names": [...] (optional)}
+#     targets.i32   n * k native int32, targets[i * k + a] as in the signature
+#                   refinement section (the table must be complete)
+#     finals.u8     n bytes, 1 for accepting states
+# Generators for very large DFAs should write these files directly.
+#
+# minimize_external_dfa runs the same signature rounds as _signature_rounds,
+# but the table and block arrays are memory-mapped files and the random
+# lookups of a round become sequential passes:
+#   - the (target, position) pairs of the reachable rows are sorted by target
+#     once (external merge sort: sorted runs of at most chunk_records records,
+#     merged from disk);
+#   - each round joins them with the block file in one sequential pass and
+#     distributes the successor blocks back into table order through bucket
+#     files (_scatter), sorts the signatures externally to number them, and
+#     scatters the new block numbers into the next block file.
+# RAM use depends on chunk_records and EXTERNAL_MERGE_FAN_IN, not on n.
+
+EXTERNAL_DFA_FORMAT = "external-dfa"
+EXTERNAL_CHUNK_RECORDS = 1 << 20 # Records sorted in RAM per run
+EXTERNAL_MERGE_FAN_IN = 64       # Runs merged at once (bounds open files and read buffers)
+_RUN_BLOCK_RECORDS = 4096
+
+def _external_paths(directory):
+    return (os.path.join(directory, "header.json"), os.path.join(directory, "targets.i32"),
+            os.path.join(directory, "finals.u8"))
+
+class _MappedArray:
+    """
+    A file's contents as a memoryview of typecode items, memory-mapped (use
+    with "with"). With length, the file is (re)created with that many zero
+    items and mapped writable.
+    """
+
+    def __init__(self, path, typecode, length=None):
+        self.path, self.typecode, self.length = path, typecode, length
+        self.mapping = self.view = None
+
+    def __enter__(self):
+        writable = self.length is not None
+        if writable:
+            with open(self.path, 'wb') as f:
+                f.truncate(self.length * array(self.typecode).itemsize)
+        with open(self.path, 'r+b' if writable else 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return memoryview(array(self.typecode)) # mmap cannot map an empty file
+            self.mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ)
+        self.view = memoryview(self.mapping).cast(self.typecode)
+        return self.view
+
+    def __exit__(self, *exc_info):
+        if self.mapping is not None:
+            self.view.release()
+            self.mapping.close()
+        return False
+
+def _write_run(records, width, work_dir):
+    """Writes width-tuples of ints to a new temporary file (native int64); returns its path."""
+    with tempfile.NamedTemporaryFile('wb', dir=work_dir, suffix=".run", delete=False) as f:
+        records = iter(records)
+        while True:
+            block = array('q', chain.from_iterable(islice(records, _RUN_BLOCK_RECORDS)))
+            if not block:
+                return f.name
+            if len(block) % width:
+                raise ValueError("Record width mismatch while writing a sort run.")
+            block.tofile(f)
+
+def _read_run(path, width):
+    """Yields the width-tuples stored in a run file."""
+    block_bytes = _RUN_BLOCK_RECORDS * width * array('q').itemsize
+    with open(path, 'rb') as f:
+        while True:
+            data = f.read(block_bytes)
+            if not data:
+                return
+            values = array('q', data)
+            yield from zip(*[iter(values)] * width)
+
+def _external_sort(records, width, work_dir, chunk_records=EXTERNAL_CHUNK_RECORDS):
+    """
+    Yields width-tuples of ints in sorted order, holding at most chunk_records
+    of them in RAM: sorted runs go to work_dir and are merged (in several
+    passes if there are more than EXTERNAL_MERGE_FAN_IN). Runs are deleted
+    once the output is exhausted or closed.
+    """
+    runs = []
+    try:
+        records = iter(records)
+        while True:
+            chunk = sorted(islice(records, chunk_records))
+            if not runs and len(chunk) < chunk_records:
+                yield from chunk # Everything fit in one chunk
+                return
+            if not chunk:
+                break
+            runs.append(_write_run(chunk, width, work_dir))
+            del chunk
+        while len(runs) > EXTERNAL_MERGE_FAN_IN:
+            group = runs[:EXTERNAL_MERGE_FAN_IN]
+            merged = _write_run(heapq.merge(*(_read_run(path, width) for path in group)), width, work_dir)
+            for path in group:
+                os.remove(path)
+            runs = runs[EXTERNAL_MERGE_FAN_IN:] + [merged]
+        yield from heapq.merge(*(_read_run(path, width) for path in runs))
+    finally:
+        for path in runs:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+def write_external_dfa(dfa, directory):
+    """
+    Stores a DFA in the internal dict format as an external DFA, completed
+    with a dead state like DFAMinimizer does. Pattern labels are not supported.
+    """
+    if dfa.get("labels"):
+        raise ValueError("External DFAs cannot carry pattern labels.")
+    states = sorted(dfa["states"], key=lambda x: (int(x) if x.isdigit() else float('inf'), x))
+    alphabet = sorted(dfa["alphabet"])
+    transitions = dfa["transitions"]
+    if any(symbol not in transitions.get(state, {}) for state in states for symbol in alphabet):
+        dead = "__DEAD__"
+        while dead in dfa["states"]:
+            dead += "_"
+        states.append(dead)
+    index = {name: i for i, name in enumerate(states)}
+    dead_index = len(states) - 1
+
+    os.makedirs(directory, exist_ok=True)
+    header_path, targets_path, finals_path = _external_paths(directory)
+    with open(targets_path, 'wb') as f:
+        for state in states:
+            row = transitions.get(state, {})
+            array('i', [index[row[symbol]] if symbol in row else dead_index for symbol in alphabet]).tofile(f)
+    with open(finals_path, 'wb') as f:
+        f.write(bytes(1 if state in dfa["final_states"] else 0 for state in states))
+    with open(header_path, 'w', encoding='utf-8') as f:
+        json.dump({"format": EXTERNAL_DFA_FORMAT, "states": len(states), "alphabet": alphabet,
+                   "start": index[dfa["start_state"]], "names": states}, f)
+
+def read_external_header(directory):
+    """Loads and checks the header of an external DFA."""
+    header_path, targets_path, finals_path = _external_paths(directory)
+    try:
+        with open(header_path, 'r', encoding='utf-8') as f:
+            header = json.load(f)
+        table_sizes = os.path.getsize(targets_path), os.path.getsize(finals_path)
+    except (OSError, json.JSONDecodeError) as e:
+        raise ValueError(f"'{directory}' is not a readable external DFA: {e}")
+    if header.get("format") != EXTERNAL_DFA_FORMAT:
+        raise ValueError(f"'{directory}' is not an external DFA (expected format '{EXTERNAL_DFA_FORMAT}').")
+    n, k = header["states"], len(header["alphabet"])
+    if not 0 <= header["start"] < n:
+        raise ValueError(f"Start state {header['start']} is out of range in '{directory}'.")
+    if table_sizes != (n * k * 4, n):
+        raise ValueError(f"The table files in '{directory}' do not match {n} states x {k} symbols.")
+    return header
+
+def read_external_dfa(directory):
+    """Loads an external DFA into the internal dict format (only for DFAs that fit in RAM)."""
+    header = read_external_header(directory)
+    _, targets_path, finals_path = _external_paths(directory)
+    names = header.get("names") or [str(i) for i in range(header["states"])]
+    alphabet = header["alphabet"]
+    k = len(alphabet)
+    with _MappedArray(targets_path, 'i') as targets, _MappedArray(finals_path, 'B') as finals:
+        table = targets.tolist()
+        final_flags = finals.tolist()
+    return {
+        "states": set(names),
+        "alphabet": set(alphabet),
+        "transitions": {name: {symbol: names[table[i * k + a]] for a, symbol in enumerate(alphabet)}
+                        for i, name in enumerate(names)},
+        "start_state": names[header["start"]],
+        "final_states": {name for name, flag in zip(names, final_flags) if flag}
+    }
+
+def _mark_reachable(targets, symbol_count, start, reach, stack):
+    """Depth-first search over the mapped table; marks reach[i] = 1. Returns the count."""
+    reach[start] = 1
+    stack[0] = start
+    top, count = 1, 1
+    while top:
+        top -= 1
+        base = stack[top] * symbol_count
+        for target in targets[base:base + symbol_count].tolist():
+            if not reach[target]:
+                reach[target] = 1
+                stack[top] = target
+                top += 1
+                count += 1
+    return count
+
+def _reachable_positions(targets, reach, n, symbol_count, chunk_states):
+    """(target, table position) for every transition of a reachable state."""
+    for first in range(0, n, chunk_states):
+        last = min(n, first + chunk_states)
+        table = targets[first * symbol_count:last * symbol_count].tolist()
+        for offset, flag in enumerate(reach[first:last].tolist()):
+            if flag:
+                base = offset * symbol_count
+                for a in range(symbol_count):
+                    yield table[base + a], (first + offset) * symbol_count + a
+
+def _scatter(pairs, length, path, work_dir, chunk_records):
+    """
+    Writes an int32 file of length entries, entry i = v for every (i, v) pair
+    and -1 elsewhere, without random writes: the pairs are distributed into
+    bucket files of chunk_records indices each, then every bucket is placed
+    in RAM and appended. Returns the largest value written (-1 if none).
+    """
+    bucket_count = max(1, -(-length // chunk_records))
+    bucket_paths = [os.path.join(work_dir, f"bucket{b}.q") for b in range(bucket_count)]
+    buffers = [array('q') for _ in range(bucket_count)]
+    # Buffers are flushed between batches; a single bucket never leaves RAM
+    flush_size = max(_RUN_BLOCK_RECORDS, 2 * chunk_records // bucket_count)
+    batch_size = max(_RUN_BLOCK_RECORDS, chunk_records // 4)
+    highest = -1
+    try:
+        pairs = iter(pairs)
+        while True:
+            batch = list(islice(pairs, batch_size))
+            if not batch:
+                break
+            for index, value in batch:
+                buffer = buffers[index // chunk_records]
+                buffer.append(index)
+                buffer.append(value)
+            del batch
+            for bucket, buffer in enumerate(buffers):
+                if len(buffer) > flush_size:
+                    with open(bucket_paths[bucket], 'ab') as f:
+                        buffer.tofile(f)
+                    del buffer[:]
+        with open(path, 'wb') as out:
+            for bucket, bucket_path in enumerate(bucket_paths):
+                first = bucket * chunk_records
+                part = array('i', [-1]) * min(chunk_records, length - first)
+                placed = array('q')
+                if os.path.exists(bucket_path):
+                    with open(bucket_path, 'rb') as f:
+                        placed.frombytes(f.read())
+                    os.remove(bucket_path)
+                placed.extend(buffers[bucket])
+                buffers[bucket] = None
+                values = iter(placed)
+                for index, value in zip(values, values):
+                    part[index - first] = value
+                if placed:
+                    highest = max(highest, max(placed[1::2]))
+                part.tofile(out)
+    finally:
+        for bucket_path in bucket_paths:
+            try:
+                os.remove(bucket_path)
+            except OSError:
+                pass
+    return highest
+
+def _write_successor_blocks(by_target_path, blocks, length, path, work_dir, chunk_records):
+    """
+    Writes the blocks of all successors in table order (-1 in the rows of
+    unreachable states): a sequential join of the target-sorted positions
+    with the block file, scattered back by position.
+    """
+    joined = ((position, blocks[target]) for target, position in _read_run(by_target_path, 2))
+    _scatter(joined, length, path, work_dir, chunk_records)
+
+def _reachable_rows(successors, reach, n, symbol_count, chunk_states):
+    """Pairs each reachable state with the tuple of its successor blocks (a row of the successor file)."""
+    for first in range(0, n, chunk_states):
+        last = min(n, first + chunk_states)
+        rows = successors[first * symbol_count:last * symbol_count].tolist()
+        for offset, flag in enumerate(reach[first:last].tolist()):
+            if flag:
+                base = offset * symbol_count
+                yield first + offset, tuple(rows[base:base + symbol_count])
+
+def _number_sorted_signatures(records):
+    """(state, block) for signature-sorted (signature..., state) records; equal signatures share a block."""
+    previous, block = None, -1
+    for record in records:
+        signature = record[:-1]
+        if signature != previous:
+            previous, block = signature, block + 1
+        yield record[-1], block
+
+def minimize_external_dfa(source, destination, chunk_records=EXTERNAL_CHUNK_RECORDS, work_dir=None, log=None):
+    """
+    Minimizes the external DFA in directory source into directory destination
+    (new states are numbered by block; names are not kept). Unreachable states
+    are dropped. Temporary files go to work_dir (default: destination).
+    Returns {"states", "reachable", "states_after", "rounds"}.
+    """
+    header = read_external_header(source)
+    n, alphabet = header["states"], header["alphabet"]
+    k = len(alphabet)
+    _, targets_path, finals_path = _external_paths(source)
+    os.makedirs(destination, exist_ok=True)
+    work = tempfile.mkdtemp(prefix="minimize-", dir=work_dir or destination)
+    log = log or (lambda message: None)
+    chunk_states = max(1, chunk_records // max(1, k))
+    try:
+        reach_path = os.path.join(work, "reach.u8")
+        blocks_path = os.path.join(work, "blocks.i32")
+        by_target_path = os.path.join(work, "by_target.run")
+        stack_path = os.path.join(work, "stack.i32")
+        next_path = os.path.join(work, "blocks.next.i32")
+        successors_path = os.path.join(work, "successors.i32")
+        written_path = os.path.join(work, "written.u8")
+        with _MappedArray(targets_path, 'i') as targets, _MappedArray(finals_path, 'B') as finals, \
+                _MappedArray(reach_path, 'B', n) as reach:
+            with _MappedArray(stack_path, 'i', n) as stack:
+                reachable = _mark_reachable(targets, k, header["start"], reach, stack)
+            os.remove(stack_path)
+            log(f"{reachable} of {n} states are reachable.")
+
+            # Initial split: final/non-final; unreachable states get block -1
+            present = set()
+            with _MappedArray(blocks_path, 'i', n) as blocks:
+                for first in range(0, n, chunk_states):
+                    last = min(n, first + chunk_states)
+                    row = array('i', [final if flag else -1 for final, flag
+                                      in zip(finals[first:last].tolist(), reach[first:last].tolist())])
+                    present.update(row)
+                    blocks[first:last] = row
+            present.discard(-1)
+            block_count = len(present)
+
+            positions = _reachable_positions(targets, reach, n, k, chunk_states)
+            os.replace(_write_run(_external_sort(positions, 2, work, chunk_records), 2, work), by_target_path)
+
+            rounds = 0
+            while True:
+                rounds += 1
+                with _MappedArray(blocks_path, 'i') as blocks:
+                    _write_successor_blocks(by_target_path, blocks, n * k, successors_path, work, chunk_records)
+                    with _MappedArray(successors_path, 'i') as successors:
+                        signatures = ((blocks[state],) + row + (state,)
+                                      for state, row in _reachable_rows(successors, reach, n, k, chunk_states))
+                        numbered = _number_sorted_signatures(_external_sort(signatures, k + 2, work, chunk_records))
+                        new_count = _scatter(numbered, n, next_path, work, chunk_records) + 1
+                os.replace(next_path, blocks_path)
+                log(f"Round {rounds}: {new_count} blocks.")
+                if new_count == block_count:
+                    break
+                block_count = new_count
+
+            # One representative row per block, with its successors renamed to blocks
+            header_path, new_targets_path, new_finals_path = _external_paths(destination)
+            with _MappedArray(blocks_path, 'i') as blocks:
+                _write_successor_blocks(by_target_path, blocks, n * k, successors_path, work, chunk_records)
+                with _MappedArray(successors_path, 'i') as successors, \
+                        _MappedArray(new_targets_path, 'i', block_count * k) as new_targets, \
+                        _MappedArray(new_finals_path, 'B', block_count) as new_finals, \
+                        _MappedArray(written_path, 'B', block_count) as written:
+                    for state, row in _reachable_rows(successors, reach, n, k, chunk_states):
+                        block = blocks[state]
+                        if not written[block]:
+                            written[block] = 1
+                            new_targets[block * k:(block + 1) * k] = array('i', row)
+                            new_finals[block] = finals[state]
+                start = blocks[header["start"]]
+        with open(header_path, 'w', encoding='utf-8') as f:
+            json.dump({"format": EXTERNAL_DFA_FORMAT, "states": block_count, "alphabet": alphabet,
+                       "start": start}, f)
+        return {"states": n, "reachable": reachable, "states_after": block_count, "rounds": rounds}
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+# --- NFA to DFA Subset Construction ---
+
+DEAD_SUBSET = frozenset({'Ø'})
+EPSILON_SYMBOLS = ('e', 'epsilon', 'ε')
+
+def format_subset_name(state_set):
+    """
+    Name of a DFA state built from a set of NFA states, as shown in the tables.
+    Example: frozenset({'3', '1', '2'}) -> '{1,2,3}', the empty set -> 'Ø'
+    """
+    if state_set == DEAD_SUBSET:
+        return "Ø"
+    sorted_states = sorted(list(state_set), key=lambda x: (int(x) if x.isdigit() else float('inf'), x))
+    return "{" + ",".join(sorted_states) + "}"
+
+class SubsetConstructor:
+    """
+    Subset construction that can be re-run after small edits to the NFA.
+
+    Each update() diffs the new NFA against the previous one and only
+    recomputes the DFA rows of subsets that contain an NFA state whose
+    transitions or epsilon edges changed (plus the parents of subsets that
+    an epsilon change may have grown). Every other row is reused, and
+    subsets no longer reachable from the start are dropped afterwards.
+    """
+
+    def __init__(self, epsilon_symbols=EPSILON_SYMBOLS, name_func=format_subset_name):
+        self.epsilon_symbols = set(epsilon_symbols)
+        self.name_func = name_func
+        self.reset()
+
+    def reset(self):
+        """Forgets the previous run; the next update() is a full construction."""
+        self.nfa_table = {}
+        self.alphabet = None
+        self.start_state = None
+        self.final_states = set()
+
+        self.rows = {}          # subset -> {symbol -> next subset}
+        self.names = {}         # subset -> DFA state name
+        self.parents = {}       # subset -> subsets with a row entry pointing at it
+        self.containing = {}    # NFA state -> subsets that contain it
+        self.start_subset = None
+        self.last_stats = {"recomputed": 0, "reused": 0, "dropped": 0, "full": True}
+
+    # --- Core subset operations ---
+    def _epsilon_targets(self, state):
+        targets = set()
+        for e_sym in self.epsilon_symbols:
+            targets.update(self.nfa_table.get(state, {}).get(e_sym, ()))
+        return targets
+
+    def epsilon_closure(self, state_set):
+        closure = set(state_set)
+        q = deque(state_set)
+        while q:
+            current = q.popleft()
+            if current not in self.nfa_table:
+                continue
+            for next_state in self._epsilon_targets(current):
+                if next_state not in closure:
+                    closure.add(next_state)
+                    q.append(next_state)
+        return frozenset(closure)
+
+    def _compute_row(self, subset):
+        row = {}
+        for symbol in self.alphabet:
+            move_set = set()
+            for nfa_state in subset:
+                move_set.update(self.nfa_table.get(nfa_state, {}).get(symbol, ()))
+            next_subset = self.epsilon_closure(move_set)
+            row[symbol] = next_subset if next_subset else DEAD_SUBSET
+        return row
+
+    def _add_subset(self, subset):
+        self.names[subset] = self.name_func(subset)
+        self.parents.setdefault(subset, set())
+        for nfa_state in subset:
+            self.containing.setdefault(nfa_state, set()).add(subset)
+
+    def _drop_subset(self, subset):
+        for target in self.rows.pop(subset, {}).values():
+            self.parents.get(target, set()).discard(subset)
+        self.names.pop(subset, None)
+        self.parents.pop(subset, None)
+        for nfa_state in subset:
+            holders = self.containing.get(nfa_state)
+            if holders is not None:
+                holders.discard(subset)
+                if not holders:
+                    del self.containing[nfa_state]
+
+    def _set_row(self, subset, row):
+        for target in self.rows.get(subset, {}).values():
+            self.parents.get(target, set()).discard(subset)
+        self.rows[subset] = row
+        for target in row.values():
+            self.parents.setdefault(target, set()).add(subset)
+
+    # --- Public API ---
+    def update(self, nfa_table, start_state, final_states, alphabet):
+        """
+        Brings the DFA up to date with the given NFA.
+        nfa_table is {state -> {symbol -> set(next_states)}}, epsilon symbols included.
+        Returns (dfa_states, dfa_transitions, dfa_start_state, dfa_final_states) in the
+        shape the editor's tables use: {subset -> name}, {(name, symbol) -> name}, name, {names}.
+        """
+        alphabet = list(alphabet)
+        old_table = self.nfa_table
+        full = self.alphabet is None or sorted(alphabet) != sorted(self.alphabet)
+
+        changed_moves = set()
+        changed_epsilon = set()
+        if not full:
+            for state in set(old_table) | set(nfa_table):
+                old_row = old_table.get(state)
+                new_row = nfa_table.get(state)
+                if old_row == new_row:
+                    continue
+                old_row = old_row or {}
+                new_row = new_row or {}
+                for symbol in set(old_row) | set(new_row):
+                    if old_row.get(symbol, set()) != new_row.get(symbol, set()):
+                        if symbol in self.epsilon_symbols:
+                            changed_epsilon.add(state)
+                        else:
+                            changed_moves.add(state)
+
+        # Keep private copies so later edits by the caller can be diffed
+        self.nfa_table = {s: {sym: set(t) for sym, t in row.items()} for s, row in nfa_table.items()}
+        self.alphabet = alphabet
+        self.start_state = start_state
+        new_finals = set(final_states)
+
+        if full:
+            self.rows, self.names, self.parents, self.containing = {}, {}, {}, {}
+
+        dirty = set()
+        for state in changed_moves | changed_epsilon:
+            dirty.update(self.containing.get(state, ()))
+        for state in changed_epsilon:
+            # A subset holding this state may no longer be epsilon-closed, so the
+            # rows that produced it must be recomputed too
+            for subset in self.containing.get(state, ()):
+                dirty.update(self.parents.get(subset, ()))
+
+        start_subset = self.epsilon_closure({start_state})
+        if not start_subset:
+            start_subset = DEAD_SUBSET
+        self.start_subset = start_subset
+
+        work_list = deque()
+        queued = set()
+        if start_subset not in self.rows:
+            self._add_subset(start_subset)
+            work_list.append(start_subset)
+            queued.add(start_subset)
+        for subset in dirty:
+            if subset in self.rows and subset not in queued:
+                work_list.append(subset)
+                queued.add(subset)
+
+        recomputed = 0
+        while work_list:
+            subset = work_list.popleft()
+            row = self._compute_row(subset)
+            recomputed += 1
+            self._set_row(subset, row)
+            for target in row.values():
+                if target not in self.rows and target not in queued:
+                    self._add_subset(target)
+                    work_list.append(target)
+                    queued.add(target)
+
+        # Drop subsets the edit made unreachable
+        reachable = {start_subset}
+        q = deque([start_subset])
+        while q:
+            for target in self.rows.get(q.popleft(), {}).values():
+                if target not in reachable:
+                    reachable.add(target)
+                    q.append(target)
+        unreachable = [subset for subset in self.rows if subset not in reachable]
+        for subset in unreachable:
+            self._drop_subset(subset)
+
+        self.final_states = new_finals
+        self.last_stats = {
+            "recomputed": recomputed,
+            "reused": len(self.rows) - min(recomputed, len(self.rows)),
+            "dropped": len(unreachable),
+            "full": full
+        }
+        return self.result()
+
+    def result(self):
+        """The current DFA in the editor's table format (see update())."""
+        dfa_states = {}
+        dfa_transitions = {}
+        dfa_final_states = set()
+        # BFS order from the start, matching the order the tables were filled in before
+        q = deque([self.start_subset])
+        dfa_states[self.start_subset] = self.names[self.start_subset]
+        while q:
+            subset = q.popleft()
+            name = self.names[subset]
+            if not subset.isdisjoint(self.final_states):
+                dfa_final_states.add(name)
+            for symbol in self.alphabet:
+                target = self.rows[subset][symbol]
+                if target not in dfa_states:
+                    dfa_states[target] = self.names[target]
+                    q.append(target)
+                dfa_transitions[(name, symbol)] = self.names[target]
+        return dfa_states, dfa_transitions, self.names[self.start_subset], dfa_final_states
+
+    def to_dfa(self):
+        """The current DFA in the internal dict format DFAMinimizer produces."""
+        dfa_states, dfa_transitions, start_name, final_names = self.result()
+        transitions = {name: {} for name in dfa_states.values()}
+        for (src_name, symbol), dest_name in dfa_transitions.items():
+            transitions[src_name][symbol] = dest_name
+        return {
+            "states": set(dfa_states.values()),
+            "alphabet": set(self.alphabet),
+            "transitions": transitions,
+            "start_state": start_name,
+            "final_states": final_names
+        }
+
+# --- NFA Reduction (Epsilon Elimination, Trimming and Bisimulation) ---
+#
+# Before determinization the NFA can be shrunk without changing its language:
+# epsilon moves are folded into the symbol moves, states unreachable from the
+# start or unable to reach a final state are dropped, and bisimilar states (same finality, and matching moves on every
+# symbol, epsilon included, into equivalent states) are merged. The
+# bisimulation is the coarsest stable partition, computed with Paige and
+# Tarjan's refinement over compound blocks with per-state edge counts.
+
+def _nfa_state_key(name):
+    return (int(name) if name.isdigit() else float('inf'), name)
+
+def trim_nfa(nfa):
+    """Drops unreachable and non-coaccessible states (the start state is always kept)."""
+    table = nfa["table"]
+    reachable = {nfa["start_state"]}
+    queue = deque(reachable)
+    reverse = {}
+    while queue:
+        state = queue.popleft()
+        for targets in table.get(state, {}).values():
+            for target in targets:
+                if target not in reachable:
+                    reachable.add(target)
+                    queue.append(target)
+    for state in reachable:
+        for targets in table.get(state, {}).values():
+            for target in targets:
+                reverse.setdefault(target, set()).add(state)
+
+    useful = {state for state in nfa["final_states"] if state in reachable}
+    queue = deque(useful)
+    while queue:
+        state = queue.popleft()
+        for source in reverse.get(state, ()):
+            if source not in useful:
+                useful.add(source)
+                queue.append(source)
+    keep = useful | {nfa["start_state"]}
+
+    trimmed_table = {}
+    for state in keep:
+        row = {}
+        for symbol, targets in table.get(state, {}).items():
+            kept = {t for t in targets if t in keep}
+            if kept:
+                row[symbol] = kept
+        trimmed_table[state] = row
+    return {
+        "states": keep,
+        "alphabet": set(nfa["alphabet"]),
+        "table": trimmed_table,
+        "start_state": nfa["start_state"],
+        "final_states": set(nfa["final_states"]) & keep
+    }
+
+def remove_epsilon(nfa, epsilon_symbols=EPSILON_SYMBOLS):
+    """
+    Equivalent epsilon-free NFA: p --a--> r whenever some q in the closure of p
+    has q --a--> r, and p is final when its closure holds a final state. States
+    on a common epsilon cycle have the same closure, so each cycle is merged
+    into its lowest-numbered state first; the result is trimmed.
+    """
+    table = nfa["table"]
+    epsilon_symbols = set(epsilon_symbols)
+    closures = {}
+    for state in nfa["states"]:
+        closure = {state}
+        stack = [state]
+        while stack:
+            current = stack.pop()
+            for symbol, targets in table.get(current, {}).items():
+                if symbol in epsilon_symbols:
+                    for target in targets:
+                        if target not in closure:
+                            closure.add(target)
+                            stack.append(target)
+        closures[state] = closure
+
+    representative = {}
+    for state, closure in closures.items():
+        if state not in representative:
+            cycle = [other for other in closure if state in closures[other]]
+            name = min(cycle, key=_nfa_state_key)
+            for member in cycle:
+                representative[member] = name
+
+    finals = set(nfa["final_states"])
+    free_table = {}
+    free_finals = set()
+    for state in set(representative.values()):
+        row = {}
+        for member in closures[state]:
+            if member in finals:
+                free_finals.add(state)
+            for symbol, targets in table.get(member, {}).items():
+                if symbol not in epsilon_symbols:
+                    row.setdefault(symbol, set()).update(representative[t] for t in targets)
+        free_table[state] = row
+    return trim_nfa({
+        "states": set(free_table),
+        "alphabet": set(nfa["alphabet"]) - epsilon_symbols,
+        "table": free_table,
+        "start_state": representative[nfa["start_state"]],
+        "final_states": free_finals
+    })
+
+def bisimulation_partition(states, edges, initial_key):
+    """
+    Paige-Tarjan coarsest stable partition. edges are (source, label, target)
+    triples; initial_key(state) gives the initial split. Returns a list of state sets.
+    """
+    pre = {}
+    for source, label, target in edges:
+        pre.setdefault(label, {}).setdefault(target, []).append(source)
+
+    blocks = {}         # Q-block id -> states
+    block_of = {}
+    groups = {}
+    for state in states:
+        groups.setdefault(initial_key(state), set()).add(state)
+    for block in groups.values():
+        bid = len(blocks)
+        blocks[bid] = block
+        for state in block:
+            block_of[state] = bid
+
+    # X: compound blocks, each a union of Q-blocks; initially the whole state set
+    compound_of = {bid: 0 for bid in blocks}
+    compounds = {0: set(blocks)}
+    pending = [0] if len(blocks) > 1 else []
+    count = {}          # (state, label, compound id) -> edges from state into the compound
+    for source, label, target in edges:
+        key = (source, label, 0)
+        count[key] = count.get(key, 0) + 1
+
+    def split(marked):
+        touched = {}
+        for state in marked:
+            touched.setdefault(block_of[state], set()).add(state)
+        for bid, part in touched.items():
+            block = blocks[bid]
+            if len(part) == len(block):
+                continue
+            new_bid = len(blocks)
+            blocks[new_bid] = part
+            block -= part
+            for state in part:
+                block_of[state] = new_bid
+            cid = compound_of[bid]
+            compound_of[new_bid] = cid
+            compounds[cid].add(new_bid)
+            if len(compounds[cid]) == 2:
+                pending.append(cid)
+
+    # Stabilize against the single initial compound block
+    for label, by_target in pre.items():
+        split({source for sources in by_target.values() for source in sources})
+
+    while pending:
+        cid = pending.pop()
+        members = compounds[cid]
+        if len(members) < 2:
+            continue
+        first, second = list(members)[:2]
+        bid = first if len(blocks[first]) <= len(blocks[second]) else second
+        members.discard(bid)
+        new_cid = len(compounds)
+        compounds[new_cid] = {bid}
+        compound_of[bid] = new_cid
+        if len(members) >= 2:
+            pending.append(cid)
+
+        splitter = list(blocks[bid])
+        for label, by_target in pre.items():
+            into_splitter = {}
+            for target in splitter:
+                for source in by_target.get(target, ()):
+                    into_splitter[source] = into_splitter.get(source, 0) + 1
+            if not into_splitter:
+                continue
+            split(into_splitter)
+            # States whose every label-edge into the old compound goes into the splitter
+            split({state for state, n in into_splitter.items() if n == count[(state, label, cid)]})
+            for state, n in into_splitter.items():
+                rest = count[(state, label, cid)] - n
+                if rest:
+                    count[(state, label, cid)] = rest
+                else:
+                    del count[(state, label, cid)]
+                count[(state, label, new_cid)] = n
+    return list(blocks.values())
+
+def reduce_nfa(nfa, bisimulation=True, epsilon_symbols=None):
+    """
+    Trims the NFA and merges bisimilar states; each merged state is named
+    after its lowest-numbered member. With epsilon_symbols, epsilon moves are
+    eliminated first (otherwise they are kept as ordinary labels). Returns
+    (reduced nfa, stats), where stats holds the state/transition counts
+    before, after trimming and at the end.
+    """
+    def transition_count(table):
+        return sum(len(targets) for row in table.values() for targets in row.values())
+
+    stats = {"states_before": len(nfa["states"]), "transitions_before": transition_count(nfa["table"])}
+    trimmed = remove_epsilon(nfa, epsilon_symbols) if epsilon_symbols else trim_nfa(nfa)
+    stats["states_trimmed"] = len(trimmed["states"])
+    reduced = trimmed
+    if bisimulation:
+        edges = [(source, symbol, target) for source, row in trimmed["table"].items()
+                 for symbol, targets in row.items() for target in targets]
+        finals = trimmed["final_states"]
+        partition = bisimulation_partition(trimmed["states"], edges, lambda state: state in finals)
+        representative = {}
+        for block in partition:
+            name = min(block, key=_nfa_state_key)
+            for state in block:
+                representative[state] = name
+        table = {name: {} for name in set(representative.values())}
+        for source, symbol, target in edges:
+            table[representative[source]].setdefault(symbol, set()).add(representative[target])
+        reduced = {
+            "states": set(table),
+            "alphabet": set(trimmed["alphabet"]),
+            "table": table,
+            "start_state": representative[trimmed["start_state"]],
+            "final_states": {representative[state] for state in finals}
+        }
+    stats["states_after"] = len(reduced["states"])
+    stats["transitions_after"] = transition_count(reduced["table"])
+    return reduced, stats
+
+def format_reduction_stats(stats):
+    return (f"NFA reduced from {stats['states_before']} to {stats['states_after']} states "
+            f"({stats['states_before'] - stats['states_trimmed']} removed, "
+            f"{stats['states_trimmed'] - stats['states_after']} merged), "
+            f"{stats['transitions_before']} to {stats['transitions_after']} transitions")
+
+# --- Parallel Subset Construction ---
+#
+# For large NFAs the construction runs level by level on several processes.
+# NFA states become bit positions and every (state, symbol) move is stored
+# once as the bitmask of its epsilon-closed targets, so a DFA state is a
+# single int: its row is the OR of its members' masks. The move masks are
+# written once into a shared-memory block (fixed-width little-endian byte
+# strings) that every worker maps read-only.
+#
+# Small levels are expanded in the coordinator. Once a level reaches
+# min_chunk subsets, each subset gets an owner worker by hashing its mask:
+# a worker expands the subsets it owns, sends every target straight to the
+# owner's queue, and the owner deduplicates against its own seen set. So
+# neither the frontier nor the deduplication goes through the coordinator;
+# workers keep their rows until the construction ends.
+
+def scaling_worker_counts(limit=None):
+    """1, 2, 4, ... up to limit (default: the CPU count), ending with limit itself."""
+    limit = limit or os.cpu_count() or 1
+    counts = []
+    workers = 1
+    while workers < limit:
+        counts.append(workers)
+        workers *= 2
+    counts.append(limit)
+    return counts
+
+def _expand_subset_masks(masks, moves, symbol_count):
+    """Rows (one target mask per symbol) for a list of subset masks; moves[i] is state i's move masks."""
+    rows = []
+    for mask in masks:
+        row = [0] * symbol_count
+        while mask:
+            low = mask & -mask
+            state_moves = moves[low.bit_length() - 1]
+            for k in range(symbol_count):
+                row[k] |= state_moves[k]
+            mask ^= low
+        rows.append(row)
+    return rows
+
+def _closed_move_masks(nfa_table, start_state, alphabet, epsilon_symbols):
+    """Returns (states by bit position, bit index by state, closure masks, per-state move masks)."""
+    states = set(nfa_table) | {start_state}
+    for row in nfa_table.values():
+        for targets in row.values():
+            states.update(targets)
+    states = sorted(states, key=lambda x: (int(x) if x.isdigit() else float('inf'), x))
+    index = {state: i for i, state in enumerate(states)}
+
+    closures = []
+    for state in states:
+        closure = {state}
+        queue = deque([state])
+        while queue:
+            current = queue.popleft()
+            for e_sym in epsilon_symbols:
+                for nxt in nfa_table.get(current, {}).get(e_sym, ()):
+                    if nxt not in closure:
+                        closure.add(nxt)
+                        queue.append(nxt)
+        mask = 0
+        for member in closure:
+            mask |= 1 << index[member]
+        closures.append(mask)
+
+    moves = []
+    for state in states:
+        row = nfa_table.get(state, {})
+        state_moves = []
+        for symbol in alphabet:
+            mask = 0
+            for target in row.get(symbol, ()):
+                mask |= closures[index[target]]
+            state_moves.append(mask)
+        moves.append(state_moves)
+    return states, index, closures, moves
+
+def _subset_owner(mask, workers):
+    """The worker that owns a subset (Fibonacci hashing, so masks sharing low bits still spread)."""
+    return (((hash(mask) * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF) >> 32) % workers
+
+class _SharedMoveMasks:
+    """Read-only move masks in a shared-memory buffer; each state's row is decoded on first use."""
+
+    def __init__(self, buffer, symbol_count, width):
+        self.buffer = buffer
+        self.symbol_count = symbol_count
+        self.width = width
+        self.rows = {}
+
+    def __getitem__(self, state):
+        row = self.rows.get(state)
+        if row is None:
+            width = self.width
+            base = state * self.symbol_count * width
+            row = [int.from_bytes(self.buffer[base + k * width:base + (k + 1) * width], 'little')
+                   for k in range(self.symbol_count)]
+            self.rows[state] = row
+        return row
+
+def _subset_owner_worker(worker_id, workers, shm_name, symbol_count, width, seen, frontier, queues, results):
+    """
+    One owner process: expands its frontier, routes the targets to their
+    owners and takes the new subsets it owns as its next frontier. All
+    workers stop after the first level in which every frontier was empty,
+    then send their rows to 'results'.
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    moves = None
+    try:
+        moves = _SharedMoveMasks(shm.buf, symbol_count, width)
+        seen = set(seen)
+        rows = {}
+        inbox = queues[worker_id]
+        early = {} # sender -> messages of later levels that arrived first
+        while True:
+            outgoing = [set() for _ in range(workers)]
+            for mask, row in zip(frontier, _expand_subset_masks(frontier, moves, symbol_count)):
+                rows[mask] = row
+                for target in row:
+                    outgoing[_subset_owner(target, workers)].add(target)
+            any_active = bool(frontier)
+            for owner, targets in enumerate(outgoing):
+                if owner != worker_id:
+                    queues[owner].put((worker_id, any_active, list(targets)))
+            candidates = outgoing[worker_id]
+            # Exactly one message per other worker and level; each sender's messages arrive in order
+            for sender in range(workers):
+                if sender == worker_id:
+                    continue
+                while not early.get(sender):
+                    message = inbox.get()
+                    early.setdefault(message[0], deque()).append(message)
+                _, active, targets = early[sender].popleft()
+                any_active = any_active or active
+                candidates.update(targets)
+            if not any_active:
+                break
+            frontier = [mask for mask in candidates if mask not in seen]
+            seen.update(frontier)
+        results.put((worker_id, rows, None))
+    except Exception as e:
+        results.put((worker_id, None, f"{type(e).__name__}: {e}"))
+    finally:
+        moves = None
+        shm.close()
+
+def _owned_subset_construction(moves, symbol_count, state_count, seen, frontier, workers):
+    """Finishes the construction from 'frontier' on owner processes; returns {mask: row} for what they expanded."""
+    width = max(1, (state_count + 7) // 8)
+    shm = shared_memory.SharedMemory(create=True, size=max(1, state_count * symbol_count * width))
+    processes = []
+    try:
+        shm.buf[:state_count * symbol_count * width] = b"".join(
+            mask.to_bytes(width, 'little') for state_moves in moves for mask in state_moves)
+        owned_seen = [[] for _ in range(workers)]
+        owned_frontier = [[] for _ in range(workers)]
+        for mask in seen:
+            owned_seen[_subset_owner(mask, workers)].append(mask)
+        for mask in frontier:
+            owned_frontier[_subset_owner(mask, workers)].append(mask)
+
+        context = multiprocessing.get_context()
+        queues = [context.Queue() for _ in range(workers)]
+        results = context.Queue()
+        for worker_id in range(workers):
+            process = context.Process(target=_subset_owner_worker, daemon=True,
+                                      args=(worker_id, workers, shm.name, symbol_count, width,
+                                            owned_seen[worker_id], owned_frontier[worker_id], queues, results))
+            process.start()
+            processes.append(process)
+
+        rows = {}
+        for _ in range(workers):
+            worker_id, worker_rows, error = results.get()
+            if error is not None:
+                raise RuntimeError(f"Subset construction worker {worker_id} failed: {error}")
+            rows.update(worker_rows)
+        for process in processes:
+            process.join()
+        return rows
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        shm.close()
+        shm.unlink()
+
+def parallel_subset_construction(nfa_table, start_state, final_states, alphabet, workers=None,
+                                 epsilon_symbols=EPSILON_SYMBOLS, min_chunk=256):
+    """
+    Subset construction on 'workers' owner processes (default: one per CPU),
+    which start once a BFS level holds min_chunk subsets; smaller levels are
+    expanded in-process, where the processes would cost more than they save.
+    Takes the same arguments as SubsetConstructor.update() and returns the
+    DFA in the internal dict format, identical to SubsetConstructor.to_dfa().
+    """
+    alphabet = list(alphabet)
+    states, index, closures, moves = _closed_move_masks(nfa_table, start_state, alphabet, set(epsilon_symbols))
+    final_mask = 0
+    for state in final_states:
+        if state in index:
+            final_mask |= 1 << index[state]
+
+    start_mask = closures[index[start_state]]
+    seen = {start_mask}
+    rows = {}
+    frontier = [start_mask]
+    workers = workers or os.cpu_count() or 1
+    while frontier and (workers == 1 or len(frontier) < min_chunk):
+        next_frontier = []
+        for mask, row in zip(frontier, _expand_subset_masks(frontier, moves, len(alphabet))):
+            rows[mask] = row
+            for target in row:
+                if target not in seen:
+                    seen.add(target)
+                    next_frontier.append(target)
+        frontier = next_frontier
+    if frontier:
+        rows.update(_owned_subset_construction(moves, len(alphabet), len(states), seen, frontier, workers))
+
+    def name(mask):
+        if mask == 0:
+            return format_subset_name(DEAD_SUBSET)
+        members = []
+        while mask:
+            low = mask & -mask
+            members.append(states[low.bit_length() - 1])
+            mask ^= low
+        return format_subset_name(frozenset(members))
+
+    names = {mask: name(mask) for mask in rows}
+    return {
+        "states": set(names.values()),
+        "alphabet": set(alphabet),
+        "transitions": {names[mask]: {symbol: names[target] for symbol, target in zip(alphabet, row)}
+                        for mask, row in rows.items()},
+        "start_state": names[start_mask],
+        "final_states": {names[mask] for mask in rows if mask & final_mask}
+    }
+
+def benchmark_parallel_subsets(n=14, worker_counts=None):
+    """
+    Times parallel_subset_construction on (a|b)*a(a|b)^n, whose DFA has
+    2^(n+1) states, for each worker count (default: scaling_worker_counts()).
+    Returns [(workers, seconds, states)].
+    """
+    nfa = regex_to_nfa("(a|b)*a" + "(a|b)" * n)
+    results = []
+    for workers in worker_counts or scaling_worker_counts():
+        started = time.perf_counter()
+        dfa = parallel_subset_construction(nfa["table"], nfa["start_state"], nfa["final_states"],
+                                           sorted(nfa["alphabet"]), workers=workers)
+        results.append((workers, time.perf_counter() - started, len(dfa["states"])))
+    return results
+
+# --- Character Classes (Symbolic Alphabets) ---
+#
+# A symbol written in brackets, like '[a-z]', '[^0-9]' or '[\\w.]', stands for
+# a set of characters, stored as sorted, disjoint (low, high) code point
+# intervals. Before subset construction or minimization, the classes in use
+# are split into minterms: the coarsest pieces of the character space on which
+# every class either fully applies or not at all. The minterms then serve as
+# the alphabet, so the tables grow with the number of distinct pieces rather
+# than with the number of characters the classes cover.
+
+MAX_CODEPOINT = 0x10FFFF
+CLASS_SHORTHANDS = {
+    'd': ((48, 57),),
+    'w': ((48, 57), (65, 90), (95, 95), (97, 122)),
+    's': ((9, 13), (32, 32)),
+}
+_CLASS_SPECIAL = set('\\[]-^,')
+
+def is_char_class(symbol):
+    return len(symbol) >= 3 and symbol[0] == '[' and symbol[-1] == ']'
+
+def _normalize_intervals(intervals):
+    merged = []
+    for low, high in sorted(intervals):
+        if merged and low <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], high))
+        else:
+            merged.append((low, high))
+    return tuple(merged)
+
+def _negate_intervals(intervals):
+    negated = []
+    next_low = 0
+    for low, high in intervals:
+        if low > next_low:
+            negated.append((next_low, low - 1))
+        next_low = high + 1
+    if next_low <= MAX_CODEPOINT:
+        negated.append((next_low, MAX_CODEPOINT))
+    return tuple(negated)
+
+def parse_char_class(symbol):
+    """
+    '[a-z_]' -> ((95, 95), (97, 122)). Supports ranges, a leading '^' for
+    negation ('[^]' is any character), backslash escapes, \\uXXXX, and the
+    ASCII shorthands \\d, \\w and \\s.
+    """
+    if not is_char_class(symbol):
+        raise ValueError(f"'{symbol}' is not a character class.")
+    body = symbol[1:-1]
+    negate = body[0] == '^'
+    if negate:
+        body = body[1:]
+
+    intervals = []
+    i = 0
+
+    def read_char():
+        """Returns (code point, None) or (None, shorthand intervals)."""
+        nonlocal i
+        c = body[i]
+        if c != '\\':
+            i += 1
+            return ord(c), None
+        if i + 1 >= len(body):
+            raise ValueError(f"Character class '{symbol}' ends with a lone backslash.")
+        c = body[i + 1]
+        if c in CLASS_SHORTHANDS:
+            i += 2
+            return None, CLASS_SHORTHANDS[c]
+        if c == 'u':
+            digits = body[i + 2:i + 6]
+            if len(digits) != 4:
+                raise ValueError(f"Bad \\u escape in '{symbol}'.")
+            i += 6
+            return int(digits, 16), None
+        i += 2
+        return ord(c), None
+
+    while i < len(body):
+        low, shorthand = read_char()
+        if shorthand is not None:
+            intervals.extend(shorthand)
+            continue
+        if i + 1 < len(body) and body[i] == '-':
+            i += 1
+            high, shorthand = read_char()
+            if shorthand is not None:
+                raise ValueError(f"A shorthand cannot end a range in '{symbol}'.")
+            if high < low:
+                raise ValueError(f"Reversed range in '{symbol}'.")
+            intervals.append((low, high))
+        else:
+            intervals.append((low, low))
+
+    intervals = _normalize_intervals(intervals)
+    return _negate_intervals(intervals) if negate else intervals
+
+def _class_char(code):
+    c = chr(code)
+    if c in _CLASS_SPECIAL:
+        return '\\' + c
+    if not c.isprintable() or c.isspace():
+        return f"\\u{code:04x}" if code <= 0xFFFF else c
+    return c
+
+def format_char_class(intervals, epsilon_symbols=EPSILON_SYMBOLS):
+    """
+    The shortest label for a set of intervals: a lone character stays as
+    itself (unless it would read as epsilon), otherwise a bracketed class,
+    negated when that is shorter.
+    """
+    if len(intervals) == 1 and intervals[0][0] == intervals[0][1]:
+        c = chr(intervals[0][0])
+        if c not in epsilon_symbols and c.isprintable() and not c.isspace() and c not in ',[':
+            return c
+
+    def body(ivs):
+        parts = []
+        for low, high in ivs:
+            if low == high:
+                parts.append(_class_char(low))
+            elif high == low + 1:
+                parts.append(_class_char(low) + _class_char(high))
+            else:
+                parts.append(_class_char(low) + "-" + _class_char(high))
+        return "".join(parts)
+
+    positive = "[" + body(intervals) + "]"
+    negative = "[^" + body(_negate_intervals(intervals)) + "]"
+    return negative if len(negative) < len(positive) else positive
+
+def split_symbol_list(text):
+    """Splits 'a, [a-z], b' on the commas outside brackets; '\\,' keeps a comma inside a class."""
+    symbols = []
+    current = []
+    depth = 0
+    escaped = False
+    for c in text:
+        if escaped:
+            current.append(c)
+            escaped = False
+        elif c == '\\':
+            current.append(c)
+            escaped = True
+        elif c == '[':
+            depth += 1
+            current.append(c)
+        elif c == ']' and depth:
+            depth -= 1
+            current.append(c)
+        elif c == ',' and not depth:
+            symbols.append("".join(current).strip())
+            current = []
+        else:
+            current.append(c)
+    symbols.append("".join(current).strip())
+    return [symbol for symbol in symbols if symbol]
+
+def has_char_classes(symbols):
+    return any(is_char_class(symbol) for symbol in symbols)
+
+def compute_minterms(symbols, epsilon_symbols=EPSILON_SYMBOLS):
+    """
+    Splits the characters named by the symbols (single characters and
+    classes) into minterms. Returns [(label, intervals, covering symbols)],
+    ordered by lowest character. Symbols that are neither a single character
+    nor a class (e.g. 'if') stay opaque, each as its own minterm at the end.
+    """
+    starts = {}
+    ends = {}
+    opaque = []
+    for symbol in set(symbols):
+        if is_char_class(symbol):
+            intervals = parse_char_class(symbol)
+        elif len(symbol) == 1:
+            intervals = ((ord(symbol), ord(symbol)),)
+        else:
+            opaque.append(symbol)
+            continue
+        for low, high in intervals:
+            starts.setdefault(low, []).append(symbol)
+            ends.setdefault(high + 1, []).append(symbol)
+
+    # Sweep the boundaries; each gap between two is covered by a fixed set of symbols
+    points = sorted(set(starts) | set(ends))
+    pieces = {}
+    active = set()
+    for position, point in enumerate(points):
+        active.difference_update(ends.get(point, ()))
+        active.update(starts.get(point, ()))
+        if active and position + 1 < len(points):
+            pieces.setdefault(frozenset(active), []).append((point, points[position + 1] - 1))
+
+    minterms = []
+    for covering, intervals in pieces.items():
+        intervals = _normalize_intervals(intervals)
+        minterms.append((format_char_class(intervals, epsilon_symbols), intervals, covering))
+    minterms.sort(key=lambda minterm: minterm[1][0])
+    for symbol in sorted(opaque):
+        minterms.append((symbol, None, frozenset([symbol])))
+    return minterms
+
+def expand_to_minterms(nfa_table, epsilon_symbols=EPSILON_SYMBOLS):
+    """
+    Rewrites an NFA table ({state -> {symbol -> targets}}) over minterm
+    labels. Returns (table, alphabet of minterm labels); epsilon edges are kept.
+    """
+    symbols = {symbol for row in nfa_table.values() for symbol in row if symbol not in epsilon_symbols}
+    minterms = compute_minterms(symbols, epsilon_symbols)
+    labels_of = {}
+    for label, _, covering in minterms:
+        for symbol in covering:
+            labels_of.setdefault(symbol, []).append(label)
+
+    table = {}
+    for state, row in nfa_table.items():
+        new_row = {}
+        for symbol, targets in row.items():
+            for label in ([symbol] if symbol in epsilon_symbols else labels_of[symbol]):
+                new_row.setdefault(label, set()).update(targets)
+        table[state] = new_row
+    return table, [label for label, _, _ in minterms]
+
+def merge_class_transitions(dfa):
+    """
+    Readable form of a DFA over minterm labels: the transitions a state sends
+    to the same target are merged into one class label. Returns a new DFA dict.
+    """
+    merged_transitions = {}
+    alphabet = set()
+    for state, row in dfa["transitions"].items():
+        by_target = {}
+        for label, target in row.items():
+            by_target.setdefault(target, []).append(label)
+        merged_row = {}
+        for target, labels in by_target.items():
+            opaque = [label for label in labels if not is_char_class(label) and len(label) != 1]
+            intervals = []
+            for label in labels:
+                if is_char_class(label):
+                    intervals.extend(parse_char_class(label))
+                elif len(label) == 1:
+                    intervals.append((ord(label), ord(label)))
+            if intervals:
+                merged_row[format_char_class(_normalize_intervals(intervals))] = target
+            for label in opaque:
+                merged_row[label] = target
+        merged_transitions[state] = merged_row
+        alphabet.update(merged_row)
+    merged = dict(dfa)
+    merged["transitions"] = merged_transitions
+    merged["alphabet"] = alphabet
+    return merged
+
+def symbolic_dfa_accepts(dfa, text):
+    """Runs a DFA whose labels may be character classes over a string, one character at a time."""
+    tables = {}
+    for state, row in dfa["transitions"].items():
+        spans = []
+        for label, target in row.items():
+            if is_char_class(label):
+                spans.extend((low, high, target) for low, high in parse_char_class(label))
+            elif len(label) == 1:
+                spans.append((ord(label), ord(label), target))
+        spans.sort()
+        tables[state] = ([span[0] for span in spans], spans)
+
+    state = dfa["start_state"]
+    for c in text:
+        lows, spans = tables.get(state, ((), ()))
+        position = bisect.bisect_right(lows, ord(c)) - 1
+        if position < 0 or spans[position][1] < ord(c):
+            return False
+        state = spans[position][2]
+    return state in dfa["final_states"]
+
+# --- Regular Expressions to Automata ---
+#
+# Syntax: single-character symbols, character classes like '[a-z]',
+# concatenation, '|', '*', '+', '?', and parentheses. 'e' and 'ε' stand for the empty string, as on the editor's
+# transitions, so they cannot be used as symbols. A backslash makes the next
+# character a literal symbol (e.g. '\*' or '\(').
+# Both sides of '|' must be non-empty: write 'a|e', not 'a|'.
+
+REGEX_OPERATORS = set("|*+?()")
+REGEX_EPSILON = {'e', 'ε'}
+
+def parse_regex(pattern):
+    """
+    Parses a pattern into a small AST of tuples:
+    ('sym', c), ('eps',), ('cat', a, b), ('alt', a, b), ('star', a), ('plus', a), ('opt', a).
+    """
+    tokens = []
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if c == '\\':
+            if i + 1 >= len(pattern):
+                raise ValueError("Pattern ends with a lone backslash.")
+            if pattern[i + 1] in REGEX_EPSILON:
+                raise ValueError(f"'{pattern[i + 1]}' is reserved for epsilon and cannot be a symbol.")
+            tokens.append(('sym', pattern[i + 1]))
+            i += 2
+            continue
+        if c == '[':
+            end = i + 1
+            while end < len(pattern) and pattern[end] != ']':
+                end += 2 if pattern[end] == '\\' else 1
+            if end >= len(pattern) or end == i + 1:
+                raise ValueError("Unterminated character class in pattern.")
+            symbol = pattern[i:end + 1]
+            parse_char_class(symbol)
+            tokens.append(('sym', symbol))
+            i = end + 1
+            continue
+        if c in REGEX_OPERATORS:
+            tokens.append(('op', c))
+        elif c in REGEX_EPSILON:
+            tokens.append(('eps', c))
+        elif not c.isspace():
+            tokens.append(('sym', c))
+        i += 1
+
+    pos = 0
+
+    def peek():
+        return tokens[pos] if pos < len(tokens) else None
+
+    def parse_alt():
+        nonlocal pos
+        node = parse_cat()
+        while peek() == ('op', '|'):
+            pos += 1
+            right = parse_cat()
+            if node is None or right is None:
+                # Almost always a typo; the empty word is written 'e' or 'ε'
+                raise ValueError("Empty alternative around '|' in pattern.")
+            node = ('alt', node, right)
+        return node if node is not None else ('eps',)
+
+    def parse_cat():
+        node = None
+        while peek() is not None and peek() not in (('op', '|'), ('op', ')')):
+            part = parse_repeat()
+            node = part if node is None else ('cat', node, part)
+        return node
+
+    def parse_repeat():
+        nonlocal pos
+        node = parse_atom()
+        while peek() in (('op', '*'), ('op', '+'), ('op', '?')):
+            node = ({'*': 'star', '+': 'plus', '?': 'opt'}[peek()[1]], node)
+            pos += 1
+        return node
+
+    def parse_atom():
+        nonlocal pos
+        token = peek()
+        if token is None:
+            raise ValueError("Unexpected end of pattern.")
+        pos += 1
+        if token == ('op', '('):
+            node = parse_alt()
+            if peek() != ('op', ')'):
+                raise ValueError("Missing ')' in pattern.")
+            pos += 1
+            return node
+        if token[0] == 'sym':
+            return ('sym', token[1])
+        if token[0] == 'eps':
+            return ('eps',)
+        raise ValueError(f"Unexpected '{token[1]}' in pattern.")
+
+    tree = parse_alt()
+    if pos != len(tokens):
+        raise ValueError(f"Unexpected '{tokens[pos][1]}' in pattern.")
+    return tree
+
+def regex_to_nfa(pattern):
+    """
+    Thompson construction. Returns the NFA as
+    {"states", "alphabet", "table", "start_state", "final_states"}, where
+    table is {state -> {symbol -> set(states)}} with 'ε' for epsilon edges,
+    the same shape SubsetConstructor.update() takes. States are named "1", "2", ...
+    """
+    tree = parse_regex(pattern)
+    table = {}
+    alphabet = set()
+
+    def new_state():
+        name = str(len(table) + 1)
+        table[name] = {}
+        return name
+
+    def edge(src, symbol, dest):
+        table[src].setdefault(symbol, set()).add(dest)
+
+    def build(node):
+        kind = node[0]
+        if kind in ('sym', 'eps'):
+            start, accept = new_state(), new_state()
+            if kind == 'sym':
+                alphabet.add(node[1])
+                edge(start, node[1], accept)
+            else:
+                edge(start, 'ε', accept)
+            return start, accept
+        if kind == 'cat':
+            # Concatenation chains are left-nested; walk them iteratively
+            parts = []
+            while node[0] == 'cat':
+                parts.append(node[2])
+                node = node[1]
+            parts.append(node)
+            start, accept = build(parts.pop())
+            while parts:
+                part_start, part_accept = build(parts.pop())
+                edge(accept, 'ε', part_start)
+                accept = part_accept
+            return start, accept
+        if kind == 'alt':
+            start = new_state()
+            left_start, left_accept = build(node[1])
+            right_start, right_accept = build(node[2])
+            accept = new_state()
+            edge(start, 'ε', left_start)
+            edge(start, 'ε', right_start)
+            edge(left_accept, 'ε', accept)
+            edge(right_accept, 'ε', accept)
+            return start, accept
+        # star / plus / opt
+        start = new_state()
+        inner_start, inner_accept = build(node[1])
+        accept = new_state()
+        edge(start, 'ε', inner_start)
+        edge(inner_accept, 'ε', accept)
+        if kind in ('star', 'opt'):
+            edge(start, 'ε', accept)
+        if kind in ('star', 'plus'):
+            edge(inner_accept, 'ε', inner_start)
+        return start, accept
+
+    start, accept = build(tree)
+    return {
+        "states": set(table),
+        "alphabet": alphabet,
+        "table": table,
+        "start_state": start,
+        "final_states": {accept}
+    }
+
+def nfa_to_json_data(nfa):
+    """An NFA from regex_to_nfa in the project's JSON format (no coords; the editor lays it out)."""
+    def key(name):
+        return (int(name) if name.isdigit() else float('inf'), name)
+    return {
+        "alphabet": sorted(nfa["alphabet"]),
+        "states": [
+            {"name": name, "is_start": name == nfa["start_state"], "is_final": name in nfa["final_states"]}
+            for name in sorted(nfa["states"], key=key)
+        ],
+        "transitions": [
+            {"source": src, "target": dest, "symbol": symbol}
+            for src in sorted(nfa["table"], key=key)
+            for symbol, targets in sorted(nfa["table"][src].items())
+            for dest in sorted(targets, key=key)
+        ]
+    }
+
+def determinize_nfa(nfa, reduce=False):
+    """
+    Subset construction of an NFA dict (see regex_to_nfa) into the internal DFA
+    format; with reduce, the NFA is made epsilon-free, trimmed and
+    bisimulation-reduced first.
+    """
+    if reduce:
+        nfa, _ = reduce_nfa(nfa, epsilon_symbols=EPSILON_SYMBOLS)
+    table, alphabet = nfa["table"], sorted(nfa["alphabet"])
+    if has_char_classes(alphabet):
+        table, alphabet = expand_to_minterms(table)
+    constructor = SubsetConstructor()
+    constructor.update(table, nfa["start_state"], nfa["final_states"], alphabet)
+    return constructor.to_dfa()
+
+def regex_to_dfa(pattern, minimize=True):
+    """Regex -> Thompson NFA -> subset construction -> (optionally) Hopcroft-minimized DFA."""
+    dfa = determinize_nfa(regex_to_nfa(pattern))
+    if minimize:
+        dfa = DFAMinimizer(dfa_to_json_data(dfa), verbose=False).minimize()
+    return dfa
+
+def dfa_accepts(dfa, word):
+    """Runs a DFA (internal dict format) over a sequence of symbols."""
+    state = dfa["start_state"]
+    transitions = dfa["transitions"]
+    for symbol in word:
+        state = transitions.get(state, {}).get(symbol)
+        if state is None:
+            return False
+    return state in dfa["final_states"]
+
+def regex_to_python_re(tree):
+    """Renders a parse_regex AST as an equivalent Python 're' pattern (for benchmarking)."""
+    kind = tree[0]
+    if kind == 'sym':
+        return tree[1] if is_char_class(tree[1]) else re.escape(tree[1])
+    if kind == 'eps':
+        return '(?:)'
+    if kind == 'cat':
+        return regex_to_python_re(tree[1]) + regex_to_python_re(tree[2])
+    if kind == 'alt':
+        return '(?:' + regex_to_python_re(tree[1]) + '|' + regex_to_python_re(tree[2]) + ')'
+    suffix = {'star': '*', 'plus': '+', 'opt': '?'}[kind]
+    return '(?:' + regex_to_python_re(tree[1]) + ')' + suffix
+
+def _random_regex(rng, alphabet, depth):
+    """A random pattern in this module's syntax (used by the benchmark)."""
+    if depth == 0 or rng.random() < 0.25:
+        return rng.choice(alphabet)
+    roll = rng.random()
+    if roll < 0.45:
+        return _random_regex(rng, alphabet, depth - 1) + _random_regex(rng, alphabet, depth - 1)
+    if roll < 0.7:
+        return "(" + _random_regex(rng, alphabet, depth - 1) + "|" + _random_regex(rng, alphabet, depth - 1) + ")"
+    return "(" + _random_regex(rng, alphabet, depth - 1) + ")" + rng.choice("*+?")
+
+def benchmark_regex(pattern_count=200, words_per_pattern=200, max_word_length=20, depth=5, seed=0):
+    """
+    Compares regex_to_dfa against Python's 're' on a random pattern set:
+    total compile time, and full-match throughput on random words.
+    Also cross-checks that both agree on every word. Returns a dict of results.
+    """
+    rng = random.Random(seed)
+    alphabet = ['a', 'b', 'c']
+    patterns = [_random_regex(rng, alphabet, depth) for _ in range(pattern_count)]
+    words = [''.join(rng.choice(alphabet) for _ in range(rng.randint(0, max_word_length)))
+             for _ in range(words_per_pattern)]
+
+    started = time.perf_counter()
+    dfas = [regex_to_dfa(p) for p in patterns]
+    dfa_compile = time.perf_counter() - started
+
+    re.purge()
+    started = time.perf_counter()
+    compiled = [re.compile(regex_to_python_re(parse_regex(p))) for p in patterns]
+    re_compile = time.perf_counter() - started
+
+    started = time.perf_counter()
+    dfa_results = [[dfa_accepts(dfa, w) for w in words] for dfa in dfas]
+    dfa_match = time.perf_counter() - started
+
+    started = time.perf_counter()
+    re_results = [[c.fullmatch(w) is not None for w in words] for c in compiled]
+    re_match = time.perf_counter() - started
+
+    matches = pattern_count * len(words)
+    return {
+        "patterns": pattern_count,
+        "matches": matches,
+        "agree": dfa_results == re_results,
+        "dfa_states_total": sum(len(d["states"]) for d in dfas),
+        "dfa_compile_s": dfa_compile,
+        "re_compile_s": re_compile,
+        "dfa_matches_per_s": matches / dfa_match if dfa_match else float('inf'),
+        "re_matches_per_s": matches / re_match if re_match else float('inf'),
+    }
+
+def print_regex_benchmark(results):
+    print(f"Patterns: {results['patterns']}   full matches: {results['matches']}   "
+          f"results agree: {'yes' if results['agree'] else 'NO'}")
+    print(f"Total minimized DFA states: {results['dfa_states_total']}")
+    print("Engine".ljust(15) + " | " + "Compile (s)".ljust(12) + " | " + "Matches/s")
+    print("-" * 45)
+    print("DFA".ljust(15) + " | " + f"{results['dfa_compile_s']:.4f}".ljust(12) + " | " + f"{results['dfa_matches_per_s']:,.0f}")
+    print("Python re".ljust(15) + " | " + f"{results['re_compile_s']:.4f}".ljust(12) + " | " + f"{results['re_matches_per_s']:,.0f}")
+
+# --- Multi-Pattern Automata ---
+#
+# Many patterns are compiled into one DFA whose accepting states are labelled
+# with the IDs (list positions) of the patterns they complete, so a single
+# pass over the input serves every pattern. Literal keywords share a prefix
+# trie; other patterns hang off the start state as Thompson NFAs. In search
+# mode the start state also loops on every symbol, and the determinized
+# result is the Aho-Corasick automaton of the keywords (failure links are
+# folded into the transitions by the subset construction).
+
+def _literal_symbols(tree):
+    """The symbols of a pattern that is a plain concatenation of symbols, else None."""
+    symbols = []
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        if node[0] == 'cat':
+            stack.append(node[2])
+            stack.append(node[1])
+        elif node[0] == 'sym':
+            symbols.append(node[1])
+        else:
+            return None
+    return symbols
+
+def build_multi_pattern_nfa(patterns, search=False, literal=False):
+    """
+    Returns (nfa, accept_labels): one NFA (regex_to_nfa format) for all the
+    patterns, and {accepting NFA state -> set of pattern IDs}. With literal,
+    every pattern is a plain keyword (so 'e', '*', ... are ordinary symbols).
+    """
+    table = {"0": {}}
+    alphabet = set()
+    accept_labels = {}
+
+    def new_state():
+        name = str(len(table))
+        table[name] = {}
+        return name
+
+    trie_children = {}
+    for pattern_id, pattern in enumerate(patterns):
+        symbols = list(pattern) if literal else _literal_symbols(parse_regex(pattern))
+        if symbols is not None:
+            node = "0"
+            for symbol in symbols:
+                alphabet.add(symbol)
+                child = trie_children.get((node, symbol))
+                if child is None:
+                    child = trie_children[(node, symbol)] = new_state()
+                    table[node].setdefault(symbol, set()).add(child)
+                node = child
+            accept_labels.setdefault(node, set()).add(pattern_id)
+            continue
+
+        # Non-literal pattern: its own Thompson NFA, renumbered into this one
+        sub = regex_to_nfa(pattern)
+        renamed = {old: new_state() for old in sorted(sub["states"], key=int)}
+        for old, row in sub["table"].items():
+            for symbol, targets in row.items():
+                table[renamed[old]][symbol] = {renamed[t] for t in targets}
+        alphabet.update(sub["alphabet"])
+        table["0"].setdefault('ε', set()).add(renamed[sub["start_state"]])
+        for old in sub["final_states"]:
+            accept_labels.setdefault(renamed[old], set()).add(pattern_id)
+
+    if search:
+        for symbol in alphabet:
+            table["0"].setdefault(symbol, set()).add("0")
+
+    nfa = {
+        "states": set(table),
+        "alphabet": alphabet,
+        "table": table,
+        "start_state": "0",
+        "final_states": set(accept_labels)
+    }
+    return nfa, accept_labels
+
+def renumber_dfa(dfa):
+    """Renames DFA states to "0", "1", ... in breadth-first order from the start."""
+    order = {dfa["start_state"]: "0"}
+    queue = deque([dfa["start_state"]])
+    alphabet = sorted(dfa["alphabet"])
+    while queue:
+        state = queue.popleft()
+        for symbol in alphabet:
+            target = dfa["transitions"].get(state, {}).get(symbol)
+            if target is not None and target not in order:
+                order[target] = str(len(order))
+                queue.append(target)
+    renumbered = {
+        "states": set(order.values()),
+        "alphabet": set(dfa["alphabet"]),
+        "transitions": {order[s]: {sym: order[t] for sym, t in row.items()}
+                        for s, row in dfa["transitions"].items() if s in order},
+        "start_state": "0",
+        "final_states": {order[s] for s in dfa["final_states"] if s in order}
+    }
+    if dfa.get("labels"):
+        renumbered["labels"] = {order[s]: labels for s, labels in dfa["labels"].items() if s in order}
+    return renumbered
+
+def build_multi_pattern_dfa(patterns, search=False, literal=False, minimize=True):
+    """
+    One labelled DFA for all the patterns (see build_multi_pattern_nfa).
+    dfa["labels"] maps each accepting state to the frozenset of pattern IDs
+    it matches. Minimization keeps differently labelled states apart, so
+    labels survive it. States are renumbered "0", "1", ...
+    """
+    nfa, accept_labels = build_multi_pattern_nfa(patterns, search, literal)
+    # Only 'ε' marks epsilon edges here; literal keywords may use the letter e
+    constructor = SubsetConstructor(epsilon_symbols=('ε',))
+    constructor.update(nfa["table"], nfa["start_state"], nfa["final_states"], sorted(nfa["alphabet"]))
+    dfa = constructor.to_dfa()
+    labels = {}
+    for subset, name in constructor.names.items():
+        ids = set()
+        for state in subset:
+            ids.update(accept_labels.get(state, ()))
+        if ids:
+            labels[name] = frozenset(ids)
+    dfa["labels"] = labels
+    if minimize:
+        dfa = DFAMinimizer(dfa_to_json_data(dfa), verbose=False).minimize()
+    return renumber_dfa(dfa)
+
+def scan_multi_pattern(dfa, text):
+    """
+    Runs a search-mode multi-pattern DFA over text once and returns
+    (end_position, pattern_id) for every match; end_position is the index
+    just past the match. Symbols outside the alphabet restart the scan.
+    """
+    transitions = dfa["transitions"]
+    labels = dfa.get("labels", {})
+    start = dfa["start_state"]
+    matches = [(0, pattern_id) for pattern_id in sorted(labels.get(start, ()))]
+    state = start
+    for position, symbol in enumerate(text, 1):
+        state = transitions.get(state, {}).get(symbol, start)
+        if state in labels:
+            matches.extend((position, pattern_id) for pattern_id in sorted(labels[state]))
+    return matches
+
+# --- Compressed Transition Tables ---
+#
+# A full dict-of-dicts table costs a dict per state and an entry per
+# (state, symbol). CompressedDFA stores the same DFA the way lex does: each
+# row keeps its most frequent target as a default, identical rows are stored
+# once, and the remaining entries of every row are packed into shared
+# next/check arrays at an offset (base) chosen so that no two rows collide
+# (comb-vector / row-displacement packing). A lookup is
+#     i = base[r] + c;  target = next[i] if check[i] == r else default[r]
+# which is O(1). All arrays are array('i'); -1 means "no transition".
+
+COMPRESSED_DFA_FORMAT = "compressed-dfa"
+PACKING_ATTEMPTS = 8 # Offsets tried per row before it is appended at the end
+
+class CompressedDFA:
+    """Row-displacement compressed DFA with integer state and symbol numbers."""
+
+    def __init__(self, states, alphabet, start, finals, row_of, default, base, next_state, check, labels=None):
+        self.states = list(states)                       # state number -> name
+        self.alphabet = list(alphabet)                   # symbol number -> symbol
+        self.state_index = {name: i for i, name in enumerate(self.states)}
+        self.symbol_index = {symbol: c for c, symbol in enumerate(self.alphabet)}
+        self.start = start
+        self.finals = bytearray(len(self.states))
+        for state in finals:
+            self.finals[state] = 1
+        self.row_of = array('i', row_of)                 # state -> row (identical rows are shared)
+        self.default = array('i', default)               # row -> default target
+        self.base = array('i', base)                     # row -> offset into next/check
+        self.next = array('i', next_state)
+        self.check = array('i', check)                   # owning row of each next slot
+        self.labels = dict(labels or {})                 # state number -> frozenset of pattern IDs
+
+    @classmethod
+    def from_dfa(cls, dfa):
+        """Compresses a DFA in the internal dict format (e.g. from _reconstruct_dfa)."""
+        states = sorted(dfa["states"], key=lambda x: (int(x) if x.isdigit() else float('inf'), x))
+        state_index = {name: i for i, name in enumerate(states)}
+        alphabet = sorted(dfa["alphabet"])
+        transitions = dfa["transitions"]
+
+        rows = {}
+        row_of = []
+        for name in states:
+            row = transitions.get(name, {})
+            targets = [state_index.get(row.get(symbol), -1) for symbol in alphabet]
+            counts = {}
+            for target in targets:
+                counts[target] = counts.get(target, 0) + 1
+            default = max(counts, key=lambda target: (counts[target], -target)) if targets else -1
+            key = (default, tuple((c, t) for c, t in enumerate(targets) if t != default))
+            row_of.append(rows.setdefault(key, len(rows)))
+
+        default = [key[0] for key in rows]
+        base = [0] * len(rows)
+        next_state, check = [], []
+        occupied = bytearray()
+        first_free = 0
+        # Densest rows first, each at the lowest offset where all its entries fit
+        for key, row in sorted(rows.items(), key=lambda item: -len(item[0][1])):
+            entries = key[1]
+            if not entries:
+                continue
+            first_symbol = entries[0][0]
+            position = max(first_free, first_symbol)
+            for _ in range(PACKING_ATTEMPTS):
+                while position < len(occupied) and occupied[position]:
+                    position += 1
+                offset = position - first_symbol
+                if all(offset + c >= len(occupied) or not occupied[offset + c] for c, _ in entries):
+                    break
+                position += 1
+            else:
+                # The free slots near the front are too scattered; append the row instead
+                offset = max(len(occupied) - first_symbol, 0)
+            needed = offset + entries[-1][0] + 1
+            if needed > len(occupied):
+                grow = needed - len(occupied)
+                occupied.extend(bytes(grow))
+                next_state.extend([-1] * grow)
+                check.extend([-1] * grow)
+            for c, target in entries:
+                occupied[offset + c] = 1
+                next_state[offset + c] = target
+                check[offset + c] = row
+            base[row] = offset
+            while first_free < len(occupied) and occupied[first_free]:
+                first_free += 1
+        # Pad so base[r] + c is always a valid index
+        pad = max(base, default=0) + len(alphabet) - len(next_state)
+        if pad > 0:
+            next_state.extend([-1] * pad)
+            check.extend([-1] * pad)
+
+        labels = {state_index[name]: frozenset(ids) for name, ids in dfa.get("labels", {}).items()
+                  if name in state_index}
+        return cls(states, alphabet, state_index[dfa["start_state"]],
+                   [state_index[name] for name in dfa["final_states"] if name in state_index],
+                   row_of, default, base, next_state, check, labels)
+
+    def step(self, state, symbol_number):
+        """Target state number of (state number, symbol number), or -1."""
+        row = self.row_of[state]
+        i = self.base[row] + symbol_number
+        return self.next[i] if self.check[i] == row else self.default[row]
+
+    def lookup(self, state, symbol):
+        """Target state name of (state name, symbol), or None."""
+        c = self.symbol_index.get(symbol)
+        if c is None:
+            return None
+        target = self.step(self.state_index[state], c)
+        return self.states[target] if target >= 0 else None
+
+    def accepts(self, word):
+        """Same as dfa_accepts on the uncompressed DFA."""
+        row_of, base, next_state, check, default = self.row_of, self.base, self.next, self.check, self.default
+        symbol_index = self.symbol_index
+        state = self.start
+        for symbol in word:
+            c = symbol_index.get(symbol)
+            if c is None:
+                return False
+            row = row_of[state]
+            i = base[row] + c
+            state = next_state[i] if check[i] == row else default[row]
+            if state < 0:
+                return False
+        return bool(self.finals[state])
+
+    def to_dfa(self):
+        """Expands back into the internal dict format."""
+        transitions = {}
+        for state, name in enumerate(self.states):
+            row = {}
+            for c, symbol in enumerate(self.alphabet):
+                target = self.step(state, c)
+                if target >= 0:
+                    row[symbol] = self.states[target]
+            transitions[name] = row
+        dfa = {
+            "states": set(self.states),
+            "alphabet": set(self.alphabet),
+            "transitions": transitions,
+            "start_state": self.states[self.start],
+            "final_states": {name for state, name in enumerate(self.states) if self.finals[state]}
+        }
+        if self.labels:
+            dfa["labels"] = {self.states[state]: ids for state, ids in self.labels.items()}
+        return dfa
+
+    def table_bytes(self):
+        """Bytes held by the packed table arrays."""
+        return sum(len(a) * a.itemsize for a in (self.row_of, self.default, self.base, self.next, self.check))
+
+    def to_json_data(self):
+        return {
+            "format": COMPRESSED_DFA_FORMAT,
+            "states": self.states,
+            "alphabet": self.alphabet,
+            "start": self.start,
+            "finals": [state for state in range(len(self.states)) if self.finals[state]],
+            "row_of": self.row_of.tolist(),
+            "default": self.default.tolist(),
+            "base": self.base.tolist(),
+            "next": self.next.tolist(),
+            "check": self.check.tolist(),
+            "labels": {str(state): sorted(ids) for state, ids in sorted(self.labels.items())}
+        }
+
+    @classmethod
+    def from_json_data(cls, data):
+        if data.get("format") != COMPRESSED_DFA_FORMAT:
+            raise ValueError("Not a compressed DFA file.")
+        labels = {int(state): frozenset(ids) for state, ids in data.get("labels", {}).items()}
+        return cls(data["states"], data["alphabet"], data["start"], data["finals"], data["row_of"],
+                   data["default"], data["base"], data["next"], data["check"], labels)
+
+    def save(self, filepath):
+        with open_automaton_file(filepath, 'w') as f:
+            json.dump(self.to_json_data(), f, separators=(',', ':'))
+
+    @classmethod
+    def load(cls, filepath):
+        data = load_json_file(filepath)
+        if data is None:
+            raise ValueError(f"Could not read '{filepath}'.")
+        return cls.from_json_data(data)
+
+def dict_table_bytes(dfa):
+    """Approximate bytes held by a dict-of-dicts transition table (keys and values are shared strings)."""
+    transitions = dfa["transitions"]
+    return sys.getsizeof(transitions) + sum(sys.getsizeof(row) for row in transitions.values())
+
+# --- Product Automata (Set Operations) ---
+#
+# Products are explored lazily: only pairs reachable from the pair of start
+# states are ever built, and pairs that can no longer accept under the chosen
+# operation (e.g. one side dead in an intersection) are left out, so they
+# become the implicit dead state of the result.
+
+PRODUCT_OPERATIONS = {
+    "union": lambda a, b: a or b,
+    "intersection": lambda a, b: a and b,
+    "difference": lambda a, b: a and not b,
+    "symmetric_difference": lambda a, b: a != b,
+}
+
+def dfa_from_json_data(dfa_json_data):
+    """Parses project JSON into the internal dict format (the inverse of dfa_to_json_data)."""
+    parsed = DFAMinimizer(dfa_json_data, verbose=False)
+    dfa = {
+        "states": parsed.states,
+        "alphabet": parsed.alphabet,
+        "transitions": parsed.transitions,
+        "start_state": parsed.start_state,
+        "final_states": parsed.final_states
+    }
+    if parsed.state_labels:
+        dfa["labels"] = parsed.state_labels
+    return dfa
+
+def _product_pair_is_live(operation, p, q):
+    """False for pairs from which the operation can never accept (None = dead side)."""
+    if p is None and q is None:
+        return False
+    if operation == "intersection":
+        return p is not None and q is not None
+    if operation == "difference":
+        return p is not None
+    return True
+
+def _explore_product(dfa_a, dfa_b, operation, stop_at_final=False):
+    """
+    Breadth-first walk over the reachable live pairs of the product.
+    Returns (pairs, transitions, parents, first_final), where parents maps a
+    pair to (previous pair, symbol) for rebuilding words. With stop_at_final,
+    the walk ends at the first accepting pair (the one with the shortest word).
+    """
+    if operation not in PRODUCT_OPERATIONS:
+        raise ValueError(f"Unknown operation '{operation}'. Use one of: {', '.join(PRODUCT_OPERATIONS)}.")
+    accepts = PRODUCT_OPERATIONS[operation]
+    alphabet = sorted(set(dfa_a["alphabet"]) | set(dfa_b["alphabet"]))
+    trans_a, trans_b = dfa_a["transitions"], dfa_b["transitions"]
+    finals_a, finals_b = dfa_a["final_states"], dfa_b["final_states"]
+
+    start = (dfa_a["start_state"], dfa_b["start_state"])
+    pairs = [start]
+    transitions = {}
+    parents = {start: None}
+    first_final = None
+    queue = deque([start])
+    while queue:
+        pair = queue.popleft()
+        p, q = pair
+        if accepts(p in finals_a, q in finals_b) and first_final is None:
+            first_final = pair
+            if stop_at_final:
+                break
+        row = {}
+        for symbol in alphabet:
+            next_pair = (trans_a.get(p, {}).get(symbol) if p is not None else None,
+                         trans_b.get(q, {}).get(symbol) if q is not None else None)
+            if not _product_pair_is_live(operation, *next_pair):
+                continue
+            row[symbol] = next_pair
+            if next_pair not in parents:
+                parents[next_pair] = (pair, symbol)
+                pairs.append(next_pair)
+                queue.append(next_pair)
+        transitions[pair] = row
+    return pairs, transitions, parents, first_final
+
+def _word_to(parents, pair):
+    word = []
+    while parents[pair] is not None:
+        pair, symbol = parents[pair]
+        word.append(symbol)
+    return word[::-1]
+
+def product_dfa(dfa_a, dfa_b, operation, minimize=False):
+    """
+    Builds the reachable product of two DFAs (internal dict format) for
+    union, intersection, difference (A minus B) or symmetric_difference.
+    Missing transitions are treated as going to a dead state.
+    """
+    accepts = PRODUCT_OPERATIONS.get(operation)
+    pairs, transitions, _, _ = _explore_product(dfa_a, dfa_b, operation)
+
+    def name(pair):
+        return "(" + ",".join("Ø" if s is None else s for s in pair) + ")"
+
+    product = {
+        "states": {name(pair) for pair in pairs},
+        "alphabet": set(dfa_a["alphabet"]) | set(dfa_b["alphabet"]),
+        "transitions": {name(pair): {symbol: name(dest) for symbol, dest in row.items()}
+                        for pair, row in transitions.items()},
+        "start_state": name(pairs[0]),
+        "final_states": {name(pair) for pair in pairs
+                         if accepts(pair[0] in dfa_a["final_states"], pair[1] in dfa_b["final_states"])}
+    }
+    if minimize:
+        product = DFAMinimizer(dfa_to_json_data(product), verbose=False).minimize()
+    return product
+
+def product_witness(dfa_a, dfa_b, operation):
+    """
+    Shortest word accepted by the product, or None when its language is empty.
+    Stops exploring as soon as an accepting pair is reached.
+    """
+    _, _, parents, first_final = _explore_product(dfa_a, dfa_b, operation, stop_at_final=True)
+    return None if first_final is None else _word_to(parents, first_final)
+
+def product_is_empty(dfa_a, dfa_b, operation):
+    return product_witness(dfa_a, dfa_b, operation) is None
+
+def dfa_equivalence_witness(dfa_a, dfa_b):
+    """A shortest word on which the two DFAs disagree, or None if they are equivalent."""
+    return product_witness(dfa_a, dfa_b, "symmetric_difference")
+
+def complement_dfa(dfa, alphabet=None, minimize=False):
+    """
+    Complement with respect to alphabet* (default: the DFA's own alphabet).
+    The DFA is completed with an explicit dead state before the finals are flipped.
+    """
+    alphabet = set(dfa["alphabet"]) | set(alphabet or ())
+    dead = "Ø"
+    while dead in dfa["states"]:
+        dead += "_"
+    transitions = {}
+    needs_dead = False
+    for state in dfa["states"]:
+        row = dict(dfa["transitions"].get(state, {}))
+        for symbol in alphabet:
+            if symbol not in row:
+                row[symbol] = dead
+                needs_dead = True
+        transitions[state] = row
+    states = set(dfa["states"])
+    if needs_dead:
+        states.add(dead)
+        transitions[dead] = {symbol: dead for symbol in alphabet}
+    complement = {
+        "states": states,
+        "alphabet": alphabet,
+        "transitions": transitions,
+        "start_state": dfa["start_state"],
+        "final_states": states - set(dfa["final_states"])
+    }
+    if minimize:
+        complement = DFAMinimizer(dfa_to_json_data(complement), verbose=False).minimize()
+    return complement
+
+# --- NFA Inclusion and Universality (Antichains) ---
+#
+# L(A) ⊆ L(B) is decided without determinizing B: the search walks pairs
+# (state of A, set of states of B) and keeps, per A state, only the minimal
+# B-sets seen so far. A pair whose B-set contains an already seen one is
+# skipped, since the smaller set reaches a counterexample whenever the larger
+# one does. Those skipped pairs are the subsets determinization would have built.
+
+def nfa_from_json_data(data, epsilon_symbols=EPSILON_SYMBOLS):
+    """Project JSON (as Program 1 exports it) into the NFA dict format of regex_to_nfa."""
+    for key in ("states", "transitions"):
+        if key not in data:
+            raise ValueError(f"Invalid JSON format. Missing: {key}")
+    states = {info["name"] for info in data["states"]}
+    starts = [info["name"] for info in data["states"] if info.get("is_start")]
+    if not starts:
+        raise ValueError("NFA must have a start state.")
+    table = {name: {} for name in states}
+    for trans in data["transitions"]:
+        src, dest, symbol = trans["source"], trans["target"], trans["symbol"]
+        if src not in states or dest not in states:
+            raise ValueError(f"Transition '{src}' -> '{dest}' references a non-existent state.")
+        table[src].setdefault('ε' if symbol in epsilon_symbols else symbol, set()).add(dest)
+    alphabet = {t["symbol"] for t in data["transitions"] if t["symbol"] not in epsilon_symbols}
+    alphabet.update(sym for sym in data.get("alphabet", ()) if sym not in epsilon_symbols)
+    return {
+        "states": states,
+        "alphabet": alphabet,
+        "table": table,
+        "start_state": starts[0],
+        "final_states": {info["name"] for info in data["states"] if info.get("is_final")}
+    }
+
+class _ClosedNFA:
+    """An NFA with epsilon closures folded into its moves: post(q, a) is already closed."""
+
+    def __init__(self, nfa, epsilon_symbols=EPSILON_SYMBOLS):
+        table = nfa["table"]
+        epsilons = set(epsilon_symbols) | {'ε'}
+        closures = {}
+        for state in nfa["states"]:
+            closure = {state}
+            queue = deque([state])
+            while queue:
+                current = queue.popleft()
+                for e_sym in epsilons:
+                    for nxt in table.get(current, {}).get(e_sym, ()):
+                        if nxt not in closure:
+                            closure.add(nxt)
+                            queue.append(nxt)
+            closures[state] = frozenset(closure)
+
+        self.alphabet = set(nfa["alphabet"])
+        self.start = closures[nfa["start_state"]]
+        self.accepting = {q for q in nfa["states"] if closures[q] & nfa["final_states"]}
+        self.post = {}
+        for state in nfa["states"]:
+            row = {}
+            for symbol, targets in table.get(state, {}).items():
+                if symbol in epsilons:
+                    continue
+                row[symbol] = frozenset().union(*(closures[t] for t in targets))
+            self.post[state] = row
+
+    def step(self, states, symbol):
+        result = set()
+        for state in states:
+            result.update(self.post[state].get(symbol, ()))
+        return result
+
+    def simulation(self):
+        """
+        The largest direct simulation: sim[q] holds every r that can mimic q
+        (r accepts whenever q does, and answers each move of q). Quadratic in
+        the number of states, so it is only computed on request.
+        """
+        states = list(self.post)
+        sim = {q: {r for r in states if q not in self.accepting or r in self.accepting} for q in states}
+        changed = True
+        while changed:
+            changed = False
+            for q in states:
+                for r in list(sim[q]):
+                    for symbol, q_targets in self.post[q].items():
+                        r_targets = self.post[r].get(symbol, frozenset())
+                        if any(not (sim[q2] & r_targets) for q2 in q_targets):
+                            sim[q].discard(r)
+                            changed = True
+                            break
+        return sim
+
+def _prune_simulated(states, sim, order):
+    """Drops states that another member simulates (L(q) ⊆ L(r)); keeps one of each equivalent pair."""
+    kept = set(states)
+    for q in states:
+        for r in sim[q]:
+            if r != q and r in kept and (q not in sim[r] or order[r] < order[q]):
+                kept.discard(q)
+                break
+    return frozenset(kept)
+
+def check_nfa_inclusion(nfa_a, nfa_b, use_simulation=False, epsilon_symbols=EPSILON_SYMBOLS):
+    """
+    Decides L(A) ⊆ L(B) for two NFAs in the regex_to_nfa dict format.
+    Returns {"included", "counterexample" (a word in L(A) - L(B), or None),
+    "explored", "avoided", "antichain_size"}; "avoided" counts the
+    subset pairs that were skipped or discarded as subsumed.
+    With use_simulation, B-sets are reduced by a simulation preorder on B
+    and subsumption compares sets up to simulation, which prunes further.
+    """
+    a = _ClosedNFA(nfa_a, epsilon_symbols)
+    b = _ClosedNFA(nfa_b, epsilon_symbols)
+    alphabet = sorted(a.alphabet | b.alphabet)
+
+    if use_simulation:
+        sim = b.simulation()
+        order = {q: i for i, q in enumerate(sorted(b.post))}
+        reduce = lambda states: _prune_simulated(states, sim, order)
+        # Larger is at least as powerful as smaller: each member of smaller is simulated in larger
+        covers = lambda larger, smaller: all(sim[q] & larger for q in smaller)
+    else:
+        reduce = frozenset
+        covers = lambda larger, smaller: smaller <= larger
+
+    antichain = {}          # A state -> list of minimal B-sets seen with it
+    parents = {}
+    queue = deque()
+    stats = {"explored": 0, "avoided": 0}
+
+    def offer(p, b_set, parent):
+        """Queues (p, b_set) unless subsumed; returns the pair if it is a counterexample."""
+        kept = antichain.setdefault(p, [])
+        if any(covers(b_set, seen) for seen in kept):
+            stats["avoided"] += 1
+            return None
+        # The new set subsumes any larger ones; their queued pairs become stale
+        smaller = [seen for seen in kept if not covers(seen, b_set)]
+        stats["avoided"] += len(kept) - len(smaller)
+        smaller.append(b_set)
+        antichain[p] = smaller
+        pair = (p, b_set)
+        parents[pair] = parent
+        queue.append(pair)
+        if p in a.accepting and not (b_set & b.accepting):
+            return pair
+        return None
+
+    def word_to(pair):
+        word = []
+        while parents[pair] is not None:
+            pair, symbol = parents[pair]
+            word.append(symbol)
+        return word[::-1]
+
+    def result(failure):
+        return {
+            "included": failure is None,
+            "counterexample": None if failure is None else word_to(failure),
+            "explored": stats["explored"],
+            "avoided": stats["avoided"],
+            "antichain_size": sum(len(sets) for sets in antichain.values())
+        }
+
+    start_b = reduce(b.start)
+    for p in sorted(a.start):
+        failure = offer(p, start_b, None)
+        if failure is not None:
+            return result(failure)
+
+    while queue:
+        pair = queue.popleft()
+        p, b_set = pair
+        if b_set not in antichain[p]:
+            continue
+        stats["explored"] += 1
+        for symbol in alphabet:
+            a_targets = a.post[p].get(symbol)
+            if not a_targets:
+                continue
+            next_b = reduce(b.step(b_set, symbol))
+            for p2 in sorted(a_targets):
+                failure = offer(p2, next_b, (pair, symbol))
+                if failure is not None:
+                    return result(failure)
+    return result(None)
+
+def universal_nfa(alphabet):
+    """A one-state NFA accepting every word over alphabet."""
+    return {
+        "states": {"U"},
+        "alphabet": set(alphabet),
+        "table": {"U": {symbol: {"U"} for symbol in alphabet}},
+        "start_state": "U",
+        "final_states": {"U"}
+    }
+
+def check_nfa_universality(nfa, alphabet=None, use_simulation=False, epsilon_symbols=EPSILON_SYMBOLS):
+    """Decides L(N) = alphabet* (default: N's own alphabet); see check_nfa_inclusion for the result."""
+    alphabet = set(nfa["alphabet"]) | set(alphabet or ())
+    return check_nfa_inclusion(universal_nfa(alphabet), nfa, use_simulation, epsilon_symbols)
+
+# --- Service Mode ---
+#
+# 'PROGRAM2.py serve' keeps one process (plus a warm pool of workers) alive
+# and answers JSON requests over HTTP, on TCP or a Unix socket:
+#   POST /minimize     body: DFA JSON               -> minimized DFA JSON
+#   POST /convert      body: NFA JSON (?minimize=1) -> DFA JSON
+#   POST /equivalent   body: {"first": DFA, "second": DFA} -> {"equivalent", "counterexample"}
+#   GET  /health
+# Every response carries "timing" (queue, compute and total milliseconds).
+# Oversized bodies get 413, and requests beyond max_pending get 503 at once
+# instead of queueing without bound.
+
+def check_automaton_json(data, what="DFA", flags_required=True):
+    """
+    Raises ValueError unless data has the shape of the project's JSON format:
+    string names, symbols and alphabet entries, and (with flags_required)
+    'is_start'/'is_final' on every state. The parsers assume this shape, so
+    without the check a malformed entry fails with a KeyError or TypeError.
+    """
+    if not isinstance(data, dict):
+        raise ValueError(f"Expected a JSON object for the {what}.")
+    for key in ("states", "transitions"):
+        if not isinstance(data.get(key), list):
+            raise ValueError(f"The {what} needs a '{key}' list.")
+    if not isinstance(data.get("alphabet", []), list) or not all(isinstance(s, str) for s in data.get("alphabet", [])):
+        raise ValueError(f"The {what}'s 'alphabet' must be a list of strings.")
+    for state in data["states"]:
+        if not isinstance(state, dict) or not isinstance(state.get("name"), str):
+            raise ValueError(f"Every state of the {what} needs a string 'name'.")
+        if flags_required and not all(isinstance(state.get(key), bool) for key in ("is_start", "is_final")):
+            raise ValueError(f"State '{state['name']}' needs boolean 'is_start' and 'is_final'.")
+        if not isinstance(state.get("labels", []), list):
+            raise ValueError(f"The 'labels' of state '{state['name']}' must be a list.")
+    for trans in data["transitions"]:
+        if not isinstance(trans, dict) or not all(isinstance(trans.get(key), str) for key in ("source", "target", "symbol")):
+            raise ValueError(f"Every transition of the {what} needs string 'source', 'target' and 'symbol'.")
+
+def _service_minimize(data):
+    check_automaton_json(data, "DFA")
+    return dfa_to_json_data(DFAMinimizer(data, verbose=False).minimize())
+
+def _service_convert(data, minimize=False):
+    check_automaton_json(data, "NFA", flags_required=False)
+    dfa = determinize_nfa(nfa_from_json_data(data))
+    if minimize:
+        dfa = DFAMinimizer(dfa_to_json_data(dfa), verbose=False).minimize()
+    return dfa_to_json_data(dfa)
+
+def _service_equivalent(data):
+    if not isinstance(data, dict) or "first" not in data or "second" not in data:
+        raise ValueError("Expected an object with 'first' and 'second' DFAs.")
+    check_automaton_json(data["first"], "first DFA")
+    check_automaton_json(data["second"], "second DFA")
+    word = dfa_equivalence_witness(dfa_from_json_data(data["first"]), dfa_from_json_data(data["second"]))
+    return {"equivalent": word is None, "counterexample": None if word is None else "".join(word)}
+
+def _service_job(operation, data, options):
+    """Runs in a pool worker; returns (result, compute seconds)."""
+    started = time.perf_counter()
+    if operation == "minimize":
+        result = _service_minimize(data)
+    elif operation == "convert":
+        result = _service_convert(data, minimize=options.get("minimize", False))
+    else:
+        result = _service_equivalent(data)
+    return result, time.perf_counter() - started
+
+def _service_warmup():
+    return True
+
+class AutomataService:
+    """asyncio HTTP front end dispatching minimize/convert/equivalence jobs to a process pool."""
+
+    OPERATIONS = ("minimize", "convert", "equivalent")
+    REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+               411: "Length Required", 413: "Payload Too Large", 431: "Request Header Fields Too Large",
+               500: "Internal Server Error", 503: "Service Unavailable", 504: "Gateway Timeout"}
+    MAX_HEADER_LINES = 100 # Each line is also bounded by the stream's limit (64 KiB)
+
+    def __init__(self, workers=None, max_body=8 * 1024 * 1024, max_pending=64, timeout=60.0):
+        self.workers = workers
+        self.max_body = max_body
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.pending = 0
+        self.served = 0
+        self.executor = None
+
+    def start_pool(self):
+        """Creates the worker pool and waits until every worker has started."""
+        self.workers = self.workers or os.cpu_count() or 1
+        self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        for future in [self.executor.submit(_service_warmup) for _ in range(self.workers)]:
+            future.result()
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+            self.executor = None
+
+    def _job_done(self, loop):
+        """Executor callback (runs on a pool thread): hands the decrement to the event loop."""
+        try:
+            loop.call_soon_threadsafe(self._release_job)
+        except RuntimeError:
+            pass # The loop is already closed; nothing is counting any more
+
+    def _release_job(self):
+        self.pending -= 1
+
+    async def run_job(self, operation, data, options):
+        """Returns (status, payload); payload gets the timing added by the caller."""
+        if self.pending >= self.max_pending:
+            return 503, {"error": "Too many requests in flight; retry later."}
+        queued = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        try:
+            job = self.executor.submit(_service_job, operation, data, options)
+        except Exception as e:
+            return 500, {"error": f"{type(e).__name__}: {e}"}
+        # A job stays in flight until its worker is done with it, even after a 504:
+        # timed-out work still occupies the pool and must keep counting against max_pending
+        self.pending += 1
+        job.add_done_callback(lambda _: self._job_done(loop))
+        try:
+            result, compute = await asyncio.wait_for(asyncio.wrap_future(job), self.timeout)
+        except asyncio.TimeoutError:
+            return 504, {"error": f"Request took longer than {self.timeout} seconds."}
+        except ValueError as e:
+            return 400, {"error": str(e)}
+        except Exception as e:
+            return 500, {"error": f"{type(e).__name__}: {e}"}
+        self.served += 1
+        waited = time.perf_counter() - queued - compute
+        return 200, {"result": result, "timing": {"queue_ms": round(waited * 1000, 3),
+                                                  "compute_ms": round(compute * 1000, 3)}}
+
+    async def handle_request(self, method, path, body):
+        url = urlsplit(path)
+        operation = url.path.strip("/")
+        if operation == "health":
+            return 200, {"status": "ok", "workers": self.workers, "pending": self.pending, "served": self.served}
+        if operation not in self.OPERATIONS:
+            return 404, {"error": f"Unknown endpoint '{url.path}'."}
+        if method != "POST":
+            return 405, {"error": "Use POST."}
+        try:
+            data = json.loads(body)
+        except (ValueError, UnicodeDecodeError) as e:
+            return 400, {"error": f"Body is not valid JSON: {e}"}
+        query = parse_qs(url.query)
+        options = {"minimize": query.get("minimize", ["0"])[0].lower() in ("1", "true", "yes")}
+        return await self.run_job(operation, data, options)
+
+    async def read_head(self, reader):
+        """
+        Reads a request line and its headers; returns (request line parts, headers),
+        or None at the end of the connection. Raises ValueError when a line is
+        longer than the stream limit (readline turns LimitOverrunError into
+        ValueError) or there are more than MAX_HEADER_LINES headers.
+        """
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        headers = {}
+        for _ in range(self.MAX_HEADER_LINES + 1):
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                return request_line.decode("latin-1").split(), headers
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        raise ValueError(f"More than {self.MAX_HEADER_LINES} header lines.")
+
+    async def handle_head(self, reader, parts, headers):
+        """Answers one request whose head has been read; returns (status, payload, keep_alive)."""
+        keep_alive = headers.get("connection", "").lower() != "close"
+        if len(parts) != 3:
+            return 400, {"error": "Malformed request line."}, False
+        method, path, _ = parts
+        length = headers.get("content-length")
+        if method == "POST" and length is None:
+            return 411, {"error": "Content-Length is required."}, False
+        if length is not None and (not length.isdigit() or int(length) > self.max_body):
+            return 413, {"error": f"Bodies are limited to {self.max_body} bytes."}, False
+        body = await reader.readexactly(int(length)) if length else b""
+        status, payload = await self.handle_request(method, path, body)
+        return status, payload, keep_alive
+
+    async def handle_connection(self, reader, writer):
+        """Serves HTTP/1.1 requests on one connection, keeping it open between requests."""
+        try:
+            while True:
+                started = time.perf_counter()
+                try:
+                    head = await self.read_head(reader)
+                except ValueError:
+                    # The rest of the oversized head is still unread, so the connection cannot be reused
+                    status, payload, keep_alive = 431, {"error": "Request line or headers are too large."}, False
+                else:
+                    if head is None:
+                        break
+                    status, payload, keep_alive = await self.handle_head(reader, *head)
+
+                payload.setdefault("timing", {})["total_ms"] = round((time.perf_counter() - started) * 1000, 3)
+                data = json.dumps(payload).encode("utf-8")
+                writer.write((f"HTTP/1.1 {status} {self.REASONS.get(status, '')}\r\n"
+                              "Content-Type: application/json\r\n"
+                              f"Content-Length: {len(data)}\r\n"
+                              + ("Retry-After: 1\r\n" if status == 503 else "")
+                              + f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n").encode("latin-1")
+                             + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+            # Client went away, or the server is shutting down with this connection idle
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host="127.0.0.1", port=8765, unix_path=None, ready=None):
+        """Runs until cancelled. 'ready' (an optional callable) receives the listening server."""
+        # A plain 'kill' stops serving, so the caller can shut the worker pool down
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+        if unix_path:
+            server = await asyncio.start_unix_server(self.handle_connection, path=unix_path)
+        else:
+            server = await asyncio.start_server(self.handle_connection, host, port)
+        if ready is not None:
+            ready(server)
+        async with server:
+            await server.serve_forever()
+
+def run_service(host="127.0.0.1", port=8765, unix_path=None, workers=None,
+                max_body=8 * 1024 * 1024, max_pending=64, timeout=60.0):
+    service = AutomataService(workers, max_body, max_pending, timeout)
+    service.start_pool()
+    where = unix_path if unix_path else f"http://{host}:{port}"
+    print(f"Serving minimize/convert/equivalent on {where} with {service.workers} worker(s). Ctrl+C to stop.")
+    try:
+        asyncio.run(service.serve(host, port, unix_path))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+    finally:
+        service.close()
+
+# --- Watch Mode ---
+#
+# 'PROGRAM2.py watch DIR' keeps DIR's exports minimized. Each pass lists the
+# .json/.json.gz files, skips those whose size and mtime match the manifest,
+# hashes the rest and only re-minimizes files whose content hash changed.
+# Results go next to the inputs as NAME.min.json (or .min.json.gz), and the
+# manifest (.program2-manifest.json) records what was done, so a restarted
+# watcher picks up where it left off. Polling is used because inotify has
+# no standard-library binding.
+
+WATCH_MANIFEST = ".program2-manifest.json"
+
+def is_deterministic_data(data, epsilon_symbols=EPSILON_SYMBOLS):
+    """True when project JSON has no epsilon edges and at most one target per (state, symbol)."""
+    seen = set()
+    for trans in data["transitions"]:
+        if trans["symbol"] in epsilon_symbols:
+            return False
+        key = (trans["source"], trans["symbol"])
+        if key in seen:
+            return False
+        seen.add(key)
+    return sum(1 for state in data["states"] if state.get("is_start")) <= 1
+
+def minimize_automaton_data(data):
+    """Minimizes project JSON, determinizing first when it describes an NFA (as Program 1 exports may)."""
+    if is_deterministic_data(data):
+        return DFAMinimizer(data, verbose=False).minimize()
+    return DFAMinimizer(dfa_to_json_data(determinize_nfa(nfa_from_json_data(data))), verbose=False).minimize()
+
+def _watch_output_name(filename):
+    for suffix in (".json.gz", ".json"):
+        if filename.endswith(suffix):
+            return filename[:-len(suffix)] + ".min" + suffix
+    return None
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def load_watch_manifest(directory):
+    try:
+        with open(os.path.join(directory, WATCH_MANIFEST), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_watch_manifest(directory, manifest):
+    """Written to a temporary file first, so an interrupted watcher never leaves half a manifest."""
+    path = os.path.join(directory, WATCH_MANIFEST)
+    with open(path + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+def sync_watch_directory(directory, manifest, log=print):
+    """
+    One pass over the directory. Updates manifest in place and returns
+    {"minimized", "unchanged", "touched", "failed", "removed"} counts;
+    "touched" files had a new mtime but the same content.
+    """
+    counts = {"minimized": 0, "unchanged": 0, "touched": 0, "failed": 0, "removed": 0}
+    present = set()
+    for filename in sorted(os.listdir(directory)):
+        output_name = _watch_output_name(filename)
+        if output_name is None or ".min.json" in filename or filename.startswith(WATCH_MANIFEST):
+            continue
+        path = os.path.join(directory, filename)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        present.add(filename)
+        entry = manifest.get(filename)
+        output_path = os.path.join(directory, output_name)
+        output_ok = entry is not None and ("error" in entry or os.path.exists(output_path))
+        if entry and output_ok and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime_ns:
+            counts["unchanged"] += 1
+            continue
+
+        try:
+            digest = _file_sha256(path)
+        except OSError:
+            continue # Removed or unreadable right now; the next pass looks again
+        if entry and output_ok and entry["sha256"] == digest:
+            entry["size"], entry["mtime"] = stat.st_size, stat.st_mtime_ns
+            counts["touched"] += 1
+            continue
+
+        new_entry = {"size": stat.st_size, "mtime": stat.st_mtime_ns, "sha256": digest}
+        temp_path = temporary_path(output_path)
+        try:
+            data = load_json_file(path)
+            if data is None:
+                raise ValueError("could not be read as JSON")
+            minimized = minimize_automaton_data(data)
+            # Readers (and an interrupted watcher) never see a half-written output
+            with open_automaton_file(temp_path, 'w') as f:
+                write_automaton_json(f, sorted(minimized["alphabet"]), dfa_state_entries(minimized),
+                                     dfa_transition_entries(minimized))
+            os.replace(temp_path, output_path)
+            new_entry["output"] = output_name
+            new_entry["states"] = len(minimized["states"])
+            counts["minimized"] += 1
+            log(f"{filename} -> {output_name} ({len(minimized['states'])} states)")
+        except Exception as e:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            # Remembered with the hash, so the file is retried only once it changes
+            new_entry["error"] = str(e)
+            counts["failed"] += 1
+            log(f"{filename}: skipped ({e})")
+        manifest[filename] = new_entry
+
+    for filename in set(manifest) - present:
+        del manifest[filename]
+        counts["removed"] += 1
+    return counts
+
+def watch_directory(directory, interval=1.0, once=False, log=print):
+    """Polls the directory every 'interval' seconds (or makes a single pass with once=True)."""
+    manifest = load_watch_manifest(directory)
+    log(f"Watching '{directory}' (Ctrl+C to stop)..." if not once else f"Syncing '{directory}'...")
+    try:
+        while True:
+            counts = sync_watch_directory(directory, manifest, log)
+            if counts["minimized"] or counts["failed"] or counts["touched"] or counts["removed"]:
+                save_watch_manifest(directory, manifest)
+            if once:
+                log(f"{counts['minimized']} minimized, {counts['unchanged'] + counts['touched']} unchanged, "
+                    f"{counts['failed']} failed.")
+                return counts
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        save_watch_manifest(directory, manifest)
+
+# --- Conversion Cache ---
+#
+# NFA -> DFA results keyed by a fingerprint of the NFA's content: state
+# names, start state, final states and transitions (canvas coordinates play
+# no part), plus any options that change the result. Recent entries are kept
+# in memory. Only when given a directory does the cache also keep an on-disk
+# store: one gzipped JSON file per fingerprint, evicting the least recently
+# used files once it exceeds its size limit.
+
+def default_cache_directory():
+    """$PROGRAM1_CACHE_DIR, or ~/.program1-cache."""
+    return os.environ.get("PROGRAM1_CACHE_DIR") or os.path.join(os.path.expanduser("~"), ".program1-cache")
+
+def nfa_fingerprint(nfa, options=()):
+    """SHA-256 of a canonical form of an NFA dict (see regex_to_nfa) and the options."""
+    canonical = {
+        "states": sorted(nfa["states"]),
+        "start": nfa["start_state"],
+        "finals": sorted(nfa["final_states"]),
+        "transitions": sorted([src, symbol, dest] for src, row in nfa["table"].items()
+                              for symbol, targets in row.items() for dest in targets),
+        "options": list(options)
+    }
+    encoded = json.dumps(canonical, ensure_ascii=False, separators=(',', ':')).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+class ConversionCache:
+    """
+    Fingerprint -> (alphabet order, DFA) memo. With a directory, entries can
+    also be stored on disk (size-bounded, least recently used evicted first);
+    with directory=None it stays in memory only.
+    """
+
+    def __init__(self, directory=None, max_bytes=64 * 1024 * 1024, memory_entries=16):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.memory_entries = memory_entries
+        self.memory = OrderedDict()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json.gz")
+
+    def get(self, key):
+        """Returns (alphabet, dfa) or None; a disk hit also refreshes the file's LRU position."""
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            return self.memory[key]
+        if self.directory is None:
+            return None
+        path = self._path(key)
+        try:
+            with open_automaton_file(path, 'r') as f:
+                data = json.load(f)
+            entry = (list(data["alphabet"]), {
+                "states": set(data["states"]),
+                "alphabet": set(data["alphabet"]),
+                "transitions": {state: dict(row) for state, row in data["transitions"].items()},
+                "start_state": data["start_state"],
+                "final_states": set(data["final_states"])
+            })
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # Truncated, corrupt or foreign file: treat it as a miss and drop it
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        self._remember(key, entry)
+        return entry
+
+    def _remember(self, key, entry):
+        self.memory[key] = entry
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_entries:
+            self.memory.popitem(last=False)
+
+    def put(self, key, alphabet, dfa):
+        """Keeps the result in memory (call store() to persist it)."""
+        self._remember(key, (list(alphabet), dfa))
+
+    def store(self, key, alphabet, dfa):
+        """Writes the entry to disk, then evicts old files; safe to run on a worker thread."""
+        if self.directory is None:
+            return
+        data = {
+            "alphabet": list(alphabet),
+            "states": sorted(dfa["states"]),
+            "transitions": dfa["transitions"],
+            "start_state": dfa["start_state"],
+            "final_states": sorted(dfa["final_states"])
+        }
+        path = self._path(key)
+        temp_path = temporary_path(path)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open_automaton_file(temp_path, 'w') as f:
+                json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(temp_path, path)
+            self._evict()
+        except OSError:
+            # The cache is only an optimization; a failed write is not an error
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+
+    def _evict(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".json.gz"):
+                path = os.path.join(self.directory, name)
+                try:
+                    info = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((info.st_mtime, info.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+    def clear(self):
+        self.memory.clear()
+        if self.directory is not None and os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if name.endswith(".json.gz"):
+                    os.remove(os.path.join(self.directory, name))
+
 # --- Standalone Functions for I/O and Display ---
 
+def open_automaton_file(filepath, mode='r'):
+    """Opens a project JSON file, transparently (de)compressing '.gz' paths."""
+    if filepath.endswith('.gz'):
+        return gzip.open(filepath, mode + 't', encoding='utf-8')
+    return open(filepath, mode)
+
+def temporary_path(filepath):
+    """
+    A sibling name to write to before os.replace(filepath). It keeps '.gz'
+    last, so open_automaton_file still compresses, and never ends in '.json'
+    or '.json.gz', so watch mode does not mistake it for an export.
+    """
+    base, gz = (filepath[:-3], '.gz') if filepath.endswith('.gz') else (filepath, '')
+    return f"{base}.{os.getpid()}.tmp{gz}"
+
+def write_automaton_json(f, alphabet, states, transitions, indent=4):
+    """
+    Streams an automaton to an open text file in the project's JSON format.
+    'states' and 'transitions' may be any iterables (e.g. generators); each
+    entry is serialized and written on its own, so the full document is
+    never held in memory. indent=4 produces the same text as
+    json.dump(..., indent=4); indent=None writes compact JSON.
+    """
+    if indent is None:
+        separators = (',', ':')
+        pad = newline = ""
+    else:
+        separators = (',', ': ')
+        pad = " " * indent
+        newline = "\n"
+
+    def write_list(key, items):
+        f.write(f'{pad}"{key}":{" " if indent is not None else ""}[')
+        first = True
+        for item in items:
+            text = json.dumps(item, indent=indent, separators=separators)
+            if indent is not None:
+                text = text.replace("\n", "\n" + pad * 2)
+            f.write(("" if first else ",") + newline + pad * 2 + text)
+            first = False
+        if not first:
+            f.write(newline + pad)
+        f.write("]")
+
+    f.write("{" + newline)
+    write_list("alphabet", alphabet)
+    f.write("," + newline)
+    write_list("states", states)
+    f.write("," + newline)
+    write_list("transitions", transitions)
+    f.write(newline + "}")
+
 def load_json_file(filepath):
     """Loads and parses a JSON file."""
     try:
-        with open(filepath, 'r') as f:
+        with open_automaton_file(filepath, 'r') as f:
             data = json.load(f)
         return data
     except FileNotFoundError:
@@ -308,6 +3478,7 @@ def print_transition_table(dfa_data):
     transitions = dfa_data["transitions"]
     start_state = dfa_data["start_state"]
     final_states = dfa_data["final_states"]
+    labels = dfa_data.get("labels", {})
 
     if not states:
         print("DFA is empty.")
@@ -323,6 +3494,8 @@ def print_transition_table(dfa_data):
     
     # --- Print Header ---
     header = "State".ljust(15) + " | " + " | ".join(alphabet)
+    if labels:
+        header += " | Patterns"
     print(header)
     print("-" * len(header))
     
@@ -346,47 +3519,318 @@ def print_transition_table(dfa_data):
             trans_cells.append(target)
         
         row += " | ".join(trans_cells)
+        if labels:
+            row += " | " + ",".join(str(label) for label in sorted(labels.get(state, ())))
         print(row)
 
-def save_dfa_to_json(dfa_data, filepath):
-    """
-    Saves the minimized DFA (in internal dict format) back to
-    the JSON format required by the project.
-    """
-    output = {
-        "alphabet": sorted(list(dfa_data["alphabet"])),
-        "states": [],
-        "transitions": []
-    }
-    
+def dfa_state_entries(dfa_data):
+    """Yields the project's JSON state entries of an internal-format DFA, sorted by name."""
+    labels = dfa_data.get("labels", {})
     for state_name in sorted(list(dfa_data["states"])):
-        output["states"].append({
+        state_info = {
             "name": state_name,
             "is_start": state_name == dfa_data["start_state"],
             "is_final": state_name in dfa_data["final_states"]
-        })
-        
+        }
+        if labels.get(state_name):
+            state_info["labels"] = sorted(labels[state_name])
+        yield state_info
+
+def dfa_transition_entries(dfa_data):
+    """Yields the project's JSON transition entries of an internal-format DFA."""
     for source, trans_map in dfa_data["transitions"].items():
         for symbol, target in trans_map.items():
-            output["transitions"].append({
+            yield {
                 "source": source,
                 "target": target,
                 "symbol": symbol
-            })
-            
+            }
+
+def dfa_to_json_data(dfa_data):
+    """
+    Converts a DFA in the internal dict format into the project's
+    list-based JSON structure (the inverse of DFAMinimizer._parse_dfa).
+    """
+    return {
+        "alphabet": sorted(list(dfa_data["alphabet"])),
+        "states": list(dfa_state_entries(dfa_data)),
+        "transitions": list(dfa_transition_entries(dfa_data))
+    }
+
+def save_dfa_to_json(dfa_data, filepath, compact=False):
+    """
+    Saves the minimized DFA (in internal dict format) back to
+    the JSON format required by the project. States and transitions
+    are streamed to the file; a '.gz' path is written gzip-compressed.
+    """
     try:
-        with open(filepath, 'w') as f:
-            json.dump(output, f, indent=4)
+        with open_automaton_file(filepath, 'w') as f:
+            write_automaton_json(f, sorted(list(dfa_data["alphabet"])), dfa_state_entries(dfa_data),
+                                 dfa_transition_entries(dfa_data), indent=None if compact else 4)
         print(f"\nSuccessfully saved minimized DFA to '{filepath}'")
     except Exception as e:
         print(f"\nError saving file: {e}", file=sys.stderr)
 
 # --- Main Execution ---
 
+def _load_dfa_argument(filepath):
+    data = load_json_file(filepath)
+    if data is None:
+        sys.exit(1)
+    return dfa_from_json_data(data)
+
+def _load_nfa_argument(filepath):
+    data = load_json_file(filepath)
+    if data is None:
+        sys.exit(1)
+    return nfa_from_json_data(data)
+
+def _print_inclusion_result(result, failure_text):
+    if result["included"]:
+        print("Yes.")
+    else:
+        print(f"No: {failure_text} '{''.join(result['counterexample'])}'.")
+    print(f"Pairs explored: {result['explored']}   subsets avoided: {result['avoided']}   "
+          f"antichain size: {result['antichain_size']}")
+
+def _save_or_print(dfa, output, title):
+    print(f"\n--- {title} ---")
+    print_transition_table(dfa)
+    if output:
+        save_dfa_to_json(dfa, output)
+
+def minimize_external_command(source, output, chunk_records, tmpdir):
+    """minimize-external: JSON input and output are converted through temporary external DFAs."""
+    as_json = output.endswith((".json", ".json.gz"))
+    scratch = tempfile.mkdtemp(prefix="minimize-external-",
+                               dir=tmpdir or os.path.dirname(os.path.abspath(output)))
+    try:
+        if not os.path.isdir(source):
+            write_external_dfa(_load_dfa_argument(source), os.path.join(scratch, "input"))
+            source = os.path.join(scratch, "input")
+        destination = os.path.join(scratch, "output") if as_json else output
+        stats = minimize_external_dfa(source, destination, chunk_records, work_dir=tmpdir or scratch, log=print)
+        print(f"Minimized from {stats['reachable']} reachable states ({stats['states']} in total) "
+              f"to {stats['states_after']} in {stats['rounds']} rounds.")
+        if as_json:
+            save_dfa_to_json(read_external_dfa(destination), output)
+        else:
+            print(f"\nSuccessfully saved minimized DFA to '{output}'")
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+def command_main(args):
+    """
+    Non-interactive commands:
+      PROGRAM2.py regex PATTERN [OUTPUT.json] [--nfa]
+      PROGRAM2.py bench-regex [PATTERN_COUNT] [WORDS_PER_PATTERN]
+      PROGRAM2.py product OPERATION A.json B.json [OUTPUT.json] [--minimize] [--check-empty]
+      PROGRAM2.py complement A.json [OUTPUT.json] [--minimize]
+      PROGRAM2.py includes A.json B.json [--simulation]
+      PROGRAM2.py universal A.json [--simulation]
+      PROGRAM2.py patterns PATTERNS.txt [OUTPUT.json] [--search] [--literal] [--scan TEXT.txt]
+      PROGRAM2.py determinize NFA.json [OUTPUT.json] [--workers N] [--reduce]
+      PROGRAM2.py bench-determinize [N] [--workers 1 2 4 ...]
+      PROGRAM2.py minimize DFA.json [OUTPUT.json] [--workers N]
+      PROGRAM2.py bench-minimize [STATE_COUNT] [--workers 1 2 4 ...]
+      PROGRAM2.py minimize-external INPUT OUTPUT [--chunk-records N] [--tmpdir DIR]
+      PROGRAM2.py compress DFA.json [OUTPUT.json] [--minimize]
+      PROGRAM2.py watch [DIRECTORY] [--interval SECONDS] [--once]
+      PROGRAM2.py serve [--host H] [--port P | --unix PATH] [--workers N] [--max-body BYTES]
+                        [--max-pending N] [--timeout SECONDS]
+    """
+    parser = argparse.ArgumentParser(prog="PROGRAM2.py")
+    commands = parser.add_subparsers(dest="command", required=True)
+    compile_cmd = commands.add_parser("regex", help="compile a regular expression to a minimal DFA")
+    compile_cmd.add_argument("pattern")
+    compile_cmd.add_argument("output", nargs="?", help="save as JSON (.json or .json.gz)")
+    compile_cmd.add_argument("--nfa", action="store_true",
+                             help="save the Thompson NFA instead (loadable in PROGRAM1)")
+    bench_cmd = commands.add_parser("bench-regex", help="benchmark against Python's re module")
+    bench_cmd.add_argument("patterns", nargs="?", type=int, default=200)
+    bench_cmd.add_argument("words", nargs="?", type=int, default=200)
+    product_cmd = commands.add_parser("product", help="union/intersection/difference of two DFAs")
+    product_cmd.add_argument("operation", choices=sorted(PRODUCT_OPERATIONS))
+    product_cmd.add_argument("first")
+    product_cmd.add_argument("second")
+    product_cmd.add_argument("output", nargs="?")
+    product_cmd.add_argument("--minimize", action="store_true")
+    product_cmd.add_argument("--check-empty", action="store_true",
+                             help="only decide emptiness (stops at the first accepted word)")
+    complement_cmd = commands.add_parser("complement", help="complement of a DFA")
+    complement_cmd.add_argument("first")
+    complement_cmd.add_argument("output", nargs="?")
+    complement_cmd.add_argument("--minimize", action="store_true")
+    includes_cmd = commands.add_parser("includes", help="is L(A) contained in L(B)? (NFAs)")
+    includes_cmd.add_argument("first")
+    includes_cmd.add_argument("second")
+    includes_cmd.add_argument("--simulation", action="store_true", help="prune with a simulation preorder")
+    universal_cmd = commands.add_parser("universal", help="does an NFA accept every word?")
+    universal_cmd.add_argument("first")
+    universal_cmd.add_argument("--simulation", action="store_true", help="prune with a simulation preorder")
+    patterns_cmd = commands.add_parser("patterns", help="one labelled DFA for many patterns (one per line)")
+    patterns_cmd.add_argument("patterns_file")
+    patterns_cmd.add_argument("output", nargs="?")
+    patterns_cmd.add_argument("--search", action="store_true", help="match patterns anywhere in the input")
+    patterns_cmd.add_argument("--literal", action="store_true", help="treat every line as a plain keyword")
+    patterns_cmd.add_argument("--scan", metavar="TEXT_FILE", help="report the matches in a text file (implies --search)")
+    determinize_cmd = commands.add_parser("determinize", help="subset construction on a process pool")
+    determinize_cmd.add_argument("first")
+    determinize_cmd.add_argument("output", nargs="?")
+    determinize_cmd.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    determinize_cmd.add_argument("--reduce", action="store_true", help="trim and bisimulation-reduce the NFA first")
+    bench_subsets_cmd = commands.add_parser("bench-determinize", help="time parallel subset construction")
+    bench_subsets_cmd.add_argument("n", nargs="?", type=int, default=14)
+    bench_subsets_cmd.add_argument("--workers", type=int, nargs="+", default=None,
+                                   help="worker counts to time (default: 1, 2, 4, ... up to the CPU count)")
+    minimize_cmd = commands.add_parser("minimize", help="minimize a DFA without prompts")
+    minimize_cmd.add_argument("first")
+    minimize_cmd.add_argument("output", nargs="?")
+    minimize_cmd.add_argument("--workers", type=int, default=None,
+                              help="use signature refinement on N processes instead of Hopcroft")
+    external_cmd = commands.add_parser("minimize-external", help="minimize a DFA larger than RAM on disk")
+    external_cmd.add_argument("first", help="external DFA directory, or a JSON DFA to convert first")
+    external_cmd.add_argument("output", help="external DFA directory, or .json/.json.gz to convert the result")
+    external_cmd.add_argument("--chunk-records", type=int, default=EXTERNAL_CHUNK_RECORDS,
+                              help="records sorted in RAM at a time (bounds memory use)")
+    external_cmd.add_argument("--tmpdir", default=None, help="directory for temporary files (default: next to OUTPUT)")
+    bench_minimize_cmd = commands.add_parser("bench-minimize", help="Hopcroft vs. parallel signature refinement")
+    bench_minimize_cmd.add_argument("state_count", nargs="?", type=int, default=100000)
+    bench_minimize_cmd.add_argument("--workers", type=int, nargs="+", default=None,
+                                    help="worker counts to time (default: 1, 2, 4, ... up to the CPU count)")
+    compress_cmd = commands.add_parser("compress", help="pack a DFA into a compressed transition table")
+    compress_cmd.add_argument("first")
+    compress_cmd.add_argument("output", nargs="?")
+    compress_cmd.add_argument("--minimize", action="store_true", help="minimize before compressing")
+    serve_cmd = commands.add_parser("serve", help="answer minimize/convert/equivalent requests over HTTP")
+    serve_cmd.add_argument("--host", default="127.0.0.1")
+    serve_cmd.add_argument("--port", type=int, default=8765)
+    serve_cmd.add_argument("--unix", metavar="PATH", help="listen on a Unix socket instead of TCP")
+    serve_cmd.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    serve_cmd.add_argument("--max-body", type=int, default=8 * 1024 * 1024, help="largest request body in bytes")
+    serve_cmd.add_argument("--max-pending", type=int, default=64, help="requests in flight before answering 503")
+    serve_cmd.add_argument("--timeout", type=float, default=60.0, help="seconds before a request answers 504")
+    watch_cmd = commands.add_parser("watch", help="keep minimized copies of a directory's exports up to date")
+    watch_cmd.add_argument("directory", nargs="?", default=".")
+    watch_cmd.add_argument("--interval", type=float, default=1.0, help="seconds between polls")
+    watch_cmd.add_argument("--once", action="store_true", help="make a single pass and exit")
+    options = parser.parse_args(args)
+
+    try:
+        if options.command == "bench-regex":
+            print_regex_benchmark(benchmark_regex(options.patterns, options.words))
+        elif options.command == "regex" and options.nfa:
+            nfa = regex_to_nfa(options.pattern)
+            print(f"Thompson NFA: {len(nfa['states'])} states")
+            if options.output:
+                data = nfa_to_json_data(nfa)
+                with open_automaton_file(options.output, 'w') as f:
+                    write_automaton_json(f, data["alphabet"], data["states"], data["transitions"])
+                print(f"\nSuccessfully saved NFA to '{options.output}'")
+        elif options.command == "regex":
+            _save_or_print(regex_to_dfa(options.pattern), options.output, "Minimized DFA")
+        elif options.command == "product":
+            first, second = _load_dfa_argument(options.first), _load_dfa_argument(options.second)
+            if options.check_empty:
+                word = product_witness(first, second, options.operation)
+                if word is None:
+                    print(f"The {options.operation} is empty.")
+                else:
+                    print(f"The {options.operation} is not empty; it accepts '{''.join(word)}'.")
+                return
+            result = product_dfa(first, second, options.operation, minimize=options.minimize)
+            _save_or_print(result, options.output, f"Product DFA ({options.operation})")
+        elif options.command == "complement":
+            result = complement_dfa(_load_dfa_argument(options.first), minimize=options.minimize)
+            _save_or_print(result, options.output, "Complement DFA")
+        elif options.command == "includes":
+            result = check_nfa_inclusion(_load_nfa_argument(options.first), _load_nfa_argument(options.second),
+                                         use_simulation=options.simulation)
+            _print_inclusion_result(result, "A accepts but B rejects")
+        elif options.command == "universal":
+            result = check_nfa_universality(_load_nfa_argument(options.first), use_simulation=options.simulation)
+            _print_inclusion_result(result, "it rejects")
+        elif options.command == "determinize":
+            nfa = _load_nfa_argument(options.first)
+            if options.reduce:
+                nfa, stats = reduce_nfa(nfa, epsilon_symbols=EPSILON_SYMBOLS)
+                print(format_reduction_stats(stats))
+            table, alphabet = nfa["table"], sorted(nfa["alphabet"])
+            if has_char_classes(alphabet):
+                table, alphabet = expand_to_minterms(table)
+            dfa = parallel_subset_construction(table, nfa["start_state"], nfa["final_states"],
+                                               alphabet, workers=options.workers)
+            print(f"DFA: {len(dfa['states'])} states")
+            if options.output:
+                save_dfa_to_json(dfa, options.output)
+        elif options.command == "bench-determinize":
+            results = benchmark_parallel_subsets(options.n, options.workers)
+            base = results[0][1]
+            print(f"(a|b)*a(a|b)^{options.n} on a machine with {os.cpu_count()} CPU(s)")
+            print("Workers".ljust(10) + " | " + "Seconds".ljust(10) + " | " + "Speedup".ljust(8) + " | DFA states")
+            print("-" * 48)
+            for workers, seconds, state_count in results:
+                print(str(workers).ljust(10) + " | " + f"{seconds:.3f}".ljust(10) + " | "
+                      + f"{base / seconds:.2f}x".ljust(8) + " | " + str(state_count))
+        elif options.command == "minimize":
+            data = load_json_file(options.first)
+            if data is None:
+                sys.exit(1)
+            minimized = DFAMinimizer(data, verbose=False).minimize(workers=options.workers)
+            _save_or_print(minimized, options.output, "Minimized DFA")
+        elif options.command == "minimize-external":
+            minimize_external_command(options.first, options.output, options.chunk_records, options.tmpdir)
+        elif options.command == "compress":
+            dfa = _load_dfa_argument(options.first)
+            if options.minimize:
+                dfa = DFAMinimizer(dfa_to_json_data(dfa), verbose=False).minimize()
+            compressed = CompressedDFA.from_dfa(dfa)
+            print(f"{len(compressed.states)} states x {len(compressed.alphabet)} symbols: "
+                  f"{len(compressed.default)} distinct rows, {len(compressed.next)} packed slots")
+            print(f"Table size: {dict_table_bytes(dfa)} bytes as dicts, {compressed.table_bytes()} bytes compressed")
+            if options.output:
+                compressed.save(options.output)
+                print(f"\nSuccessfully saved compressed DFA to '{options.output}'")
+        elif options.command == "bench-minimize":
+            results = benchmark_minimization(options.state_count, options.workers)
+            base = results[0][1]
+            print(f"Random complete DFA with {options.state_count} states on a machine with {os.cpu_count()} CPU(s)")
+            print("Engine".ljust(15) + " | " + "Seconds".ljust(10) + " | " + "vs. Hopcroft".ljust(12) + " | Minimized states")
+            print("-" * 62)
+            for engine, seconds, state_count in results:
+                print(engine.ljust(15) + " | " + f"{seconds:.3f}".ljust(10) + " | "
+                      + f"{base / seconds:.2f}x".ljust(12) + " | " + str(state_count))
+        elif options.command == "watch":
+            watch_directory(options.directory, options.interval, options.once)
+        elif options.command == "serve":
+            run_service(options.host, options.port, options.unix, options.workers,
+                        options.max_body, options.max_pending, options.timeout)
+        elif options.command == "patterns":
+            with open(options.patterns_file, 'r', encoding='utf-8') as f:
+                patterns = [line.rstrip("\r\n") for line in f if line.strip()]
+            search = options.search or options.scan is not None
+            dfa = build_multi_pattern_dfa(patterns, search=search, literal=options.literal)
+            print(f"Combined DFA for {len(patterns)} patterns: {len(dfa['states'])} states, "
+                  f"{len(dfa.get('labels', {}))} of them labelled.")
+            if options.output:
+                save_dfa_to_json(dfa, options.output)
+            if options.scan:
+                with open(options.scan, 'r', encoding='utf-8') as f:
+                    text = f.read()
+                for end, pattern_id in scan_multi_pattern(dfa, text):
+                    print(f"{end}: {patterns[pattern_id]}")
+    except ValueError as e:
+        print(f"\nAn error occurred during processing: {e}", file=sys.stderr)
+        sys.exit(1)
+
 def main():
     """
     Main CLI function to run the minimization tool.
     """
+    if len(sys.argv) > 1:
+        command_main(sys.argv[1:])
+        return
+
     print("====================================")
     print("  Program 2: DFA Minimization Tool  ")
     print("====================================")
@@ -411,8 +3855,8 @@ def main():
         print("\n------------------------------------")
         save = input("Save minimized DFA to a new JSON file? (y/n): ").strip().lower()
         if save == 'y':
-            out_path = input("Enter output filename (e.g., minimized_dfa.json): ")
-            if not out_path.endswith(".json"):
+            out_path = input("Enter output filename (e.g., minimized_dfa.json, or .json.gz to compress): ")
+            if not out_path.endswith((".json", ".json.gz")):
                 out_path += ".json"
             save_dfa_to_json(minimized_dfa, out_path)
             
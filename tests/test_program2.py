@@ -0,0 +1,644 @@
+"""
+Randomized checks of PROGRAM2's optimized algorithms against simple
+brute-force references.
+"""
+import asyncio
+import gzip
+import io
+import itertools
+import json
+import os
+import random
+import re
+
+import pytest
+
+import PROGRAM2 as P
+
+WORDS = ["".join(w) for n in range(7) for w in itertools.product("ab", repeat=n)]
+
+
+def nfa_accepts(nfa, word):
+    """Reference NFA simulation straight from the table, epsilon closures included."""
+    def closure(states):
+        stack, seen = list(states), set(states)
+        while stack:
+            state = stack.pop()
+            for symbol in P.EPSILON_SYMBOLS:
+                for target in nfa["table"].get(state, {}).get(symbol, ()):
+                    if target not in seen:
+                        seen.add(target)
+                        stack.append(target)
+        return seen
+
+    current = closure({nfa["start_state"]})
+    for char in word:
+        current = closure({t for s in current for t in nfa["table"].get(s, {}).get(char, ())})
+    return bool(current & set(nfa["final_states"]))
+
+
+def random_nfa(rng, max_states=9, max_moves=20, symbols=("a", "b", "ε")):
+    names = [str(i) for i in range(1, rng.randint(1, max_states) + 1)]
+    table = {name: {} for name in names}
+    for _ in range(rng.randint(0, max_moves)):
+        table[rng.choice(names)].setdefault(rng.choice(symbols), set()).add(rng.choice(names))
+    return {"states": set(names), "alphabet": {"a", "b"}, "table": table,
+            "start_state": rng.choice(names), "final_states": {s for s in names if rng.random() < 0.3}}
+
+
+def random_dfa_data(rng, max_states=15, alphabet=None):
+    """A random, possibly partial DFA in the project's JSON format."""
+    names = [str(i) for i in range(rng.randint(1, max_states))]
+    alphabet = alphabet or ["a", "b", "c"][:rng.randint(1, 3)]
+    return {
+        "alphabet": alphabet,
+        "states": [{"name": s, "is_start": s == "0", "is_final": rng.random() < 0.4} for s in names],
+        "transitions": [{"source": s, "target": rng.choice(names), "symbol": a}
+                        for s in names for a in alphabet if rng.random() < 0.8]
+    }
+
+
+def test_incremental_subset_construction_matches_fresh_rebuild():
+    rng = random.Random(5)
+    for _ in range(100):
+        nfa = random_nfa(rng, max_states=8, max_moves=12, symbols=("a", "b", "e"))
+        table, names = nfa["table"], sorted(nfa["states"])
+        incremental = P.SubsetConstructor()
+        for _ in range(6):
+            start = rng.choice(names)
+            updated = incremental.update(table, start, nfa["final_states"], ["a", "b"])
+            fresh = P.SubsetConstructor().update(table, start, nfa["final_states"], ["a", "b"])
+            assert updated[1:] == fresh[1:]
+            assert set(updated[0].values()) == set(fresh[0].values())
+            # Edit the NFA in place, as the editor does
+            source = rng.choice(names)
+            symbol = rng.choice(["a", "b", "e"])
+            if rng.random() < 0.7:
+                table[source].setdefault(symbol, set()).add(rng.choice(names))
+            elif table[source].get(symbol):
+                table[source][symbol].pop()
+                if not table[source][symbol]:
+                    del table[source][symbol]
+            if rng.random() < 0.2:
+                nfa["final_states"] = {s for s in names if rng.random() < 0.3}
+
+
+def test_incremental_subset_construction_handles_alphabet_change():
+    rng = random.Random(8)
+    for _ in range(30):
+        nfa = random_nfa(rng, symbols=("a", "b", "c", "e"))
+        incremental = P.SubsetConstructor()
+        for alphabet in (["a", "b"], ["a", "b", "c"], ["a"]):
+            updated = incremental.update(nfa["table"], nfa["start_state"], nfa["final_states"], alphabet)
+            fresh = P.SubsetConstructor().update(nfa["table"], nfa["start_state"], nfa["final_states"], alphabet)
+            assert updated[1:] == fresh[1:]
+
+
+@pytest.mark.parametrize("with_labels", [False, True])
+def test_streamed_json_is_identical_to_json_dump(tmp_path, with_labels):
+    rng = random.Random(7)
+    for case in range(30):
+        dfa = P.dfa_from_json_data(random_dfa_data(rng))
+        if with_labels:
+            dfa["labels"] = {s: {rng.randint(0, 3)} for s in dfa["final_states"]}
+        data = P.dfa_to_json_data(dfa)
+
+        streamed = io.StringIO()
+        P.write_automaton_json(streamed, data["alphabet"], P.dfa_state_entries(dfa), P.dfa_transition_entries(dfa))
+        assert streamed.getvalue() == json.dumps(data, indent=4)
+
+        compact = io.StringIO()
+        P.write_automaton_json(compact, data["alphabet"], iter(data["states"]), iter(data["transitions"]), indent=None)
+        assert compact.getvalue() == json.dumps(data, separators=(",", ":"))
+
+        path = tmp_path / f"dfa{case}.json"
+        P.save_dfa_to_json(dfa, str(path))
+        assert path.read_text() == json.dumps(data, indent=4)
+
+
+def test_streamed_json_handles_empty_lists():
+    streamed = io.StringIO()
+    P.write_automaton_json(streamed, [], iter(()), iter(()))
+    assert streamed.getvalue() == json.dumps({"alphabet": [], "states": [], "transitions": []}, indent=4)
+
+
+def test_regex_dfa_agrees_with_python_re():
+    rng = random.Random(12)
+    words = ["".join(w) for n in range(6) for w in itertools.product("abc", repeat=n)]
+    for _ in range(150):
+        pattern = P._random_regex(rng, ["a", "b", "c"], 4)
+        compiled = re.compile(P.regex_to_python_re(P.parse_regex(pattern)))
+        dfa = P.regex_to_dfa(pattern)
+        for word in words:
+            assert P.dfa_accepts(dfa, word) == bool(compiled.fullmatch(word)), (pattern, word)
+
+
+@pytest.mark.parametrize("pattern, python_pattern", [
+    ("(a|b)*abb", "(a|b)*abb"),
+    ("a(b|e)c?", "a(b|)c?"),
+    ("(ab)+|ba*", "(ab)+|ba*"),
+    ("[a-c][b-c]*", "[a-c][b-c]*"),
+    ("\\*a", "\\*a"),
+])
+def test_regex_examples_agree_with_python_re(pattern, python_pattern):
+    dfa = P.regex_to_dfa(pattern)
+    words = ["".join(w) for n in range(6) for w in itertools.product("abc*", repeat=n)]
+    for word in words:
+        assert P.symbolic_dfa_accepts(dfa, word) == bool(re.fullmatch(python_pattern, word)), word
+
+
+def test_regex_dfa_is_minimal():
+    rng = random.Random(13)
+    for _ in range(50):
+        dfa = P.regex_to_dfa(P._random_regex(rng, ["a", "b"], 4))
+        again = P.DFAMinimizer(P.dfa_to_json_data(dfa), verbose=False).minimize()
+        assert len(again["states"]) == len(dfa["states"])
+
+
+@pytest.mark.parametrize("pattern", ["(a", "a)", "(a|b", "a(b))", "*a", "a|*", "(*)", "a|", "|a", "a||b", "(|a)",
+                                     "[a-", "a\\", "\\e"])
+def test_malformed_regex_raises_value_error(pattern):
+    with pytest.raises(ValueError):
+        P.regex_to_nfa(pattern)
+
+
+PRODUCT_REFERENCES = {
+    "union": lambda a, b: a or b,
+    "intersection": lambda a, b: a and b,
+    "difference": lambda a, b: a and not b,
+    "symmetric_difference": lambda a, b: a != b,
+}
+
+
+@pytest.mark.parametrize("operation", sorted(PRODUCT_REFERENCES))
+def test_product_matches_word_enumeration(operation):
+    rng = random.Random(14)
+    reference = PRODUCT_REFERENCES[operation]
+    for case in range(60):
+        a = P.dfa_from_json_data(random_dfa_data(rng, max_states=6, alphabet=["a", "b"]))
+        b = P.dfa_from_json_data(random_dfa_data(rng, max_states=6, alphabet=["a", "b"]))
+        product = P.product_dfa(a, b, operation, minimize=case % 2 == 0)
+        expected = [w for w in WORDS if reference(P.dfa_accepts(a, w), P.dfa_accepts(b, w))]
+        assert [w for w in WORDS if P.dfa_accepts(product, w)] == expected
+
+        witness = P.product_witness(a, b, operation)
+        if witness is None:
+            assert not expected
+        else:
+            word = "".join(witness)
+            assert reference(P.dfa_accepts(a, word), P.dfa_accepts(b, word))
+            if expected:
+                assert len(word) == len(expected[0]) # Shortest first: WORDS is ordered by length
+
+
+def test_complement_matches_word_enumeration():
+    rng = random.Random(15)
+    for case in range(60):
+        dfa = P.dfa_from_json_data(random_dfa_data(rng, max_states=6, alphabet=["a", "b"]))
+        complement = P.complement_dfa(dfa, minimize=case % 2 == 0)
+        for word in WORDS:
+            assert P.dfa_accepts(complement, word) != P.dfa_accepts(dfa, word)
+
+
+def test_dfa_inclusion_counterexample():
+    # (a|b)*abb is contained in (a|b)*a(a|b)b, but not the other way round (e.g. 'aab')
+    a = P.regex_to_dfa("(a|b)*abb")
+    b = P.regex_to_dfa("(a|b)*a(a|b)b")
+    witness = P.product_witness(b, a, "difference")
+    assert witness is not None
+    word = "".join(witness)
+    assert P.dfa_accepts(b, word) and not P.dfa_accepts(a, word)
+    assert P.product_is_empty(a, b, "difference")
+    assert P.dfa_equivalence_witness(a, P.regex_to_dfa("(a|b)*abb", minimize=False)) is None
+
+
+@pytest.mark.parametrize("use_simulation", [False, True])
+def test_nfa_inclusion_matches_determinize_and_difference(use_simulation):
+    rng = random.Random(2)
+    for _ in range(150):
+        a = random_nfa(rng, max_states=6, max_moves=14)
+        b = random_nfa(rng, max_states=6, max_moves=14)
+        witness = P.product_witness(P.determinize_nfa(a), P.determinize_nfa(b), "difference")
+        result = P.check_nfa_inclusion(a, b, use_simulation=use_simulation)
+        assert result["included"] == (witness is None)
+        if not result["included"]:
+            word = "".join(result["counterexample"])
+            assert nfa_accepts(a, word) and not nfa_accepts(b, word)
+
+
+def test_nfa_universality_matches_complement():
+    rng = random.Random(16)
+    for _ in range(150):
+        nfa = random_nfa(rng, max_states=5, max_moves=16)
+        complement = P.complement_dfa(P.determinize_nfa(nfa), alphabet=["a", "b"])
+        result = P.check_nfa_universality(nfa, alphabet=["a", "b"])
+        assert result["included"] == (P.product_witness(complement, complement, "intersection") is None)
+        if not result["included"]:
+            assert not nfa_accepts(nfa, "".join(result["counterexample"]))
+
+
+def test_multi_pattern_scan_overlapping_keywords():
+    dfa = P.build_multi_pattern_dfa(["he", "she", "his", "hers"], search=True, literal=True)
+    assert P.scan_multi_pattern(dfa, "ushers") == [(4, 0), (4, 1), (6, 3)]
+
+
+def naive_keyword_matches(patterns, text):
+    matches = []
+    for pattern_id, pattern in enumerate(patterns):
+        start = text.find(pattern)
+        while start != -1:
+            matches.append((start + len(pattern), pattern_id))
+            start = text.find(pattern, start + 1)
+    return sorted(matches)
+
+
+def test_multi_pattern_scan_matches_str_find():
+    rng = random.Random(17)
+    for _ in range(60):
+        patterns = ["".join(rng.choice("abc") for _ in range(rng.randint(1, 4))) for _ in range(rng.randint(1, 12))]
+        text = "".join(rng.choice("abcd") for _ in range(rng.randint(0, 60)))
+        dfa = P.build_multi_pattern_dfa(patterns, search=True, literal=True)
+        assert sorted(P.scan_multi_pattern(dfa, text)) == naive_keyword_matches(patterns, text)
+
+
+def test_multi_pattern_regex_scan_matches_substrings():
+    rng = random.Random(18)
+    for _ in range(30):
+        patterns = [P._random_regex(rng, ["a", "b"], 3) for _ in range(rng.randint(1, 5))]
+        text = "".join(rng.choice("abc") for _ in range(rng.randint(0, 20)))
+        dfa = P.build_multi_pattern_dfa(patterns, search=True)
+        compiled = [re.compile(P.regex_to_python_re(P.parse_regex(p))) for p in patterns]
+        expected = sorted((end, pattern_id) for pattern_id, c in enumerate(compiled) for end in range(len(text) + 1)
+                          if any(c.fullmatch(text, start, end) for start in range(end + 1)))
+        assert sorted(P.scan_multi_pattern(dfa, text)) == expected, (patterns, text)
+
+
+def test_multi_pattern_labels_in_full_match_mode():
+    patterns = ["ab", "a(b|c)", "abc", "e"]
+    dfa = P.build_multi_pattern_dfa(patterns)
+    for word in ["", "ab", "ac", "abc", "a", "b"]:
+        state = dfa["start_state"]
+        for symbol in word:
+            state = dfa["transitions"].get(state, {}).get(symbol)
+            if state is None:
+                break
+        expected = {i for i, p in enumerate(patterns) if re.fullmatch(P.regex_to_python_re(P.parse_regex(p)), word)}
+        assert set(dfa["labels"].get(state, ())) == expected, word
+
+
+def test_parallel_subset_construction_matches_sequential():
+    rng = random.Random(4)
+    for case in range(30):
+        nfa = random_nfa(rng, symbols=("a", "b", "e", "ε"))
+        constructor = P.SubsetConstructor()
+        constructor.update(nfa["table"], nfa["start_state"], nfa["final_states"], ["a", "b"])
+        assert P.parallel_subset_construction(nfa["table"], nfa["start_state"], nfa["final_states"], ["a", "b"],
+                                              workers=1 + case % 3, min_chunk=1) == constructor.to_dfa()
+
+
+def test_parallel_subset_construction_on_blowup_pattern():
+    nfa = P.regex_to_nfa("(a|b)*a(a|b)(a|b)(a|b)")
+    constructor = P.SubsetConstructor()
+    constructor.update(nfa["table"], nfa["start_state"], nfa["final_states"], ["a", "b"])
+    expected = constructor.to_dfa()
+    assert P.parallel_subset_construction(nfa["table"], nfa["start_state"], nfa["final_states"], ["a", "b"],
+                                          workers=2, min_chunk=2) == expected
+    assert len(P.DFAMinimizer(P.dfa_to_json_data(expected), verbose=False).minimize()["states"]) == 16
+
+
+def test_scaling_worker_counts():
+    assert P.scaling_worker_counts(1) == [1]
+    assert P.scaling_worker_counts(6) == [1, 2, 4, 6]
+    assert P.scaling_worker_counts(8) == [1, 2, 4, 8]
+
+
+def prepared_minimizer(data):
+    minimizer = P.DFAMinimizer(data, verbose=False)
+    minimizer._complete_dfa()
+    minimizer._remove_unreachable_states()
+    return minimizer
+
+
+def test_signature_refinement_matches_hopcroft():
+    rng = random.Random(6)
+    for case in range(100):
+        minimizer = prepared_minimizer(random_dfa_data(rng))
+        workers = 2 if case % 25 == 0 else 1
+        assert minimizer._signature_refinement(workers) == minimizer._hopcroft_algorithm()
+
+
+def test_parallel_minimize_matches_hopcroft_on_random_complete_dfa():
+    data = P.random_complete_dfa(3000, seed=3)
+    assert P.DFAMinimizer(data, verbose=False).minimize(workers=2) == P.DFAMinimizer(data, verbose=False).minimize()
+
+
+# Character class -> the characters of "abcdf" it covers, written out by hand.
+# 'e' is left out of the words: the reference tables would read it as epsilon.
+CLASS_MEMBERS = {
+    "[a-c]": "abc", "[b-d]": "bcd", "[c-f]": "cdf", "[^b]": "acdf", "[ace]": "ac",
+    "[a-bd-e]": "abd", "c": "c", "f": "f",
+}
+
+
+def test_minterm_dfa_matches_symbol_by_symbol_dfa():
+    rng = random.Random(19)
+    words = ["".join(w) for n in range(4) for w in itertools.product("abcdf", repeat=n)]
+    for _ in range(60):
+        nfa = random_nfa(rng, max_states=6, max_moves=14, symbols=tuple(CLASS_MEMBERS) + ("e",))
+        # Reference: every class spelled out as its single characters ('e' stays epsilon)
+        plain = {state: {} for state in nfa["table"]}
+        for state, row in nfa["table"].items():
+            for symbol, targets in row.items():
+                for char in "e" if symbol == "e" else CLASS_MEMBERS[symbol]:
+                    plain[state].setdefault(char, set()).update(targets)
+        reference = P.SubsetConstructor()
+        reference.update(plain, nfa["start_state"], nfa["final_states"], list("abcdf"))
+        reference = reference.to_dfa()
+
+        table, alphabet = P.expand_to_minterms(nfa["table"])
+        symbolic = P.SubsetConstructor()
+        symbolic.update(table, nfa["start_state"], nfa["final_states"], alphabet)
+        symbolic = symbolic.to_dfa()
+        merged = P.merge_class_transitions(symbolic)
+        minimized = P.DFAMinimizer(P.dfa_to_json_data(symbolic), verbose=False).minimize()
+        for word in words:
+            expected = P.dfa_accepts(reference, word)
+            assert P.symbolic_dfa_accepts(symbolic, word) == expected, word
+            assert P.symbolic_dfa_accepts(merged, word) == expected, word
+            assert P.symbolic_dfa_accepts(minimized, word) == expected, word
+
+
+def test_minterms_split_overlapping_ranges():
+    minterms = P.compute_minterms(["[a-m]", "[h-z]", "k"])
+    assert [intervals for _, intervals, _ in minterms] == [
+        ((97, 103),), ((104, 106), (108, 109)), ((107, 107),), ((110, 122),)]
+    assert [sorted(covering) for _, _, covering in minterms] == [
+        ["[a-m]"], ["[a-m]", "[h-z]"], ["[a-m]", "[h-z]", "k"], ["[h-z]"]]
+
+
+@pytest.fixture(scope="module")
+def service():
+    service = P.AutomataService(workers=1, timeout=30)
+    service.start_pool()
+    yield service
+    service.close()
+
+
+VALID_DFA = {"alphabet": ["a"], "states": [{"name": "0", "is_start": True, "is_final": True}],
+             "transitions": [{"source": "0", "target": "0", "symbol": "a"}]}
+
+MALFORMED_REQUESTS = [
+    ("minimize", []),
+    ("minimize", {"alphabet": ["a"], "states": [{"name": "0", "is_final": True}], "transitions": []}),
+    ("minimize", {"alphabet": ["a"], "states": [{"name": "0", "is_start": True, "is_final": False}],
+                  "transitions": {"0": "0"}}),
+    ("minimize", {"alphabet": ["a"], "states": [{"name": ["0"], "is_start": True, "is_final": False}],
+                  "transitions": []}),
+    ("minimize", {"alphabet": ["a"], "states": [{"name": "0", "is_start": True, "is_final": False}],
+                  "transitions": [{"source": "0", "target": "0"}]}),
+    ("minimize", {"alphabet": ["a"], "states": [{"name": "0", "is_start": True, "is_final": False}],
+                  "transitions": [{"source": "0", "target": "1", "symbol": "a"}]}),
+    ("convert", {"states": "0", "transitions": []}),
+    ("convert", {"states": [{"name": "0"}], "transitions": [None]}),
+    ("equivalent", {"first": VALID_DFA}),
+    ("equivalent", {"first": VALID_DFA, "second": {"states": [], "transitions": 1}}),
+    ("equivalent", "first"),
+]
+
+
+def test_service_answers_malformed_bodies_with_400(service):
+    async def run():
+        results = []
+        for operation, body in MALFORMED_REQUESTS:
+            results.append(await service.handle_request("POST", "/" + operation, json.dumps(body).encode()))
+        results.append(await service.handle_request("POST", "/minimize", b"{not json"))
+        return results, await service.handle_request("POST", "/minimize", json.dumps(VALID_DFA).encode())
+
+    results, valid = asyncio.run(run())
+    for (status, payload), request in zip(results, MALFORMED_REQUESTS + [("minimize", "{not json")]):
+        assert status == 400, (request, payload)
+    assert valid[0] == 200 and len(valid[1]["result"]["states"]) == 1
+
+
+def test_service_answers_oversized_heads_with_431(service):
+    async def exchange(head):
+        server = await asyncio.start_server(service.handle_connection, "127.0.0.1", 0)
+        async with server:
+            reader, writer = await asyncio.open_connection(*server.sockets[0].getsockname()[:2])
+            writer.write(head)
+            await writer.drain()
+            response = await reader.read()
+            writer.close()
+            return response
+
+    long_header = b"GET /health HTTP/1.1\r\nX-Long: " + b"x" * 100000 + b"\r\n\r\n"
+    many_headers = b"GET /health HTTP/1.1\r\n" + b"X-A: 1\r\n" * 500 + b"\r\n"
+    for head in (long_header, many_headers):
+        assert asyncio.run(exchange(head)).startswith(b"HTTP/1.1 431 ")
+    ok = asyncio.run(exchange(b"GET /health HTTP/1.1\r\nConnection: close\r\n\r\n"))
+    assert ok.startswith(b"HTTP/1.1 200 ")
+
+
+def test_watch_records_every_bad_input_and_keeps_going(tmp_path):
+    (tmp_path / "OUTPUT1.json").write_text(json.dumps(VALID_DFA))
+    (tmp_path / "OUTPUT2.json").write_text("[1, 2]")
+    (tmp_path / "OUTPUT3.json").write_text(json.dumps({"states": 5, "transitions": []}))
+    (tmp_path / "OUTPUT4.json.gz").write_bytes(b"not gzip")
+    (tmp_path / "OUTPUT5.json").write_text("[" * 100000 + "]" * 100000)
+    manifest = {}
+    counts = P.sync_watch_directory(str(tmp_path), manifest, log=lambda message: None)
+    assert counts["minimized"] == 1 and counts["failed"] == 4
+    assert all("error" in manifest[f"OUTPUT{i}.json"] for i in (2, 3, 5)) and "error" in manifest["OUTPUT4.json.gz"]
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        "OUTPUT1.json", "OUTPUT1.min.json", "OUTPUT2.json", "OUTPUT3.json", "OUTPUT4.json.gz", "OUTPUT5.json"]
+
+
+def test_watch_leaves_no_partial_output(tmp_path, monkeypatch):
+    with P.open_automaton_file(str(tmp_path / "OUTPUT1.json.gz"), "w") as f:
+        json.dump(VALID_DFA, f)
+
+    def failing_write(f, *args, **kwargs):
+        f.write("{")
+        raise OSError("disk full")
+
+    monkeypatch.setattr(P, "write_automaton_json", failing_write)
+    manifest = {}
+    counts = P.sync_watch_directory(str(tmp_path), manifest, log=lambda message: None)
+    assert counts["failed"] == 1 and "disk full" in manifest["OUTPUT1.json.gz"]["error"]
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["OUTPUT1.json.gz"]
+
+    monkeypatch.undo()
+    with P.open_automaton_file(str(tmp_path / "OUTPUT1.json.gz"), "w") as f:
+        json.dump(dict(VALID_DFA, alphabet=["a", "b"]), f)
+    counts = P.sync_watch_directory(str(tmp_path), manifest, log=lambda message: None)
+    assert counts["minimized"] == 1
+    assert json.loads(gzip.open(tmp_path / "OUTPUT1.min.json.gz", "rt").read())["alphabet"] == ["a", "b"]
+
+
+def naive_bisimulation_classes(states, edges, finals):
+    """Partition refinement by recomputing every state's full signature until nothing splits."""
+    block = {s: s in finals for s in states}
+    while True:
+        signature = {s: (block[s], frozenset((a, block[t]) for (x, a, t) in edges if x == s)) for s in states}
+        ids = {}
+        refined = {s: ids.setdefault(signature[s], len(ids)) for s in states}
+        if len(ids) == len(set(block.values())):
+            return len(ids)
+        block = refined
+
+
+def test_reduce_nfa_preserves_language():
+    rng = random.Random(11)
+    for _ in range(200):
+        nfa = random_nfa(rng, max_states=12, max_moves=30)
+        reduced, stats = P.reduce_nfa(nfa, epsilon_symbols=P.EPSILON_SYMBOLS)
+        assert stats["states_after"] <= stats["states_before"]
+        for word in WORDS:
+            assert nfa_accepts(reduced, word) == nfa_accepts(nfa, word)
+
+
+def test_bisimulation_matches_naive_refinement():
+    rng = random.Random(20)
+    for _ in range(200):
+        nfa = random_nfa(rng, max_states=12, max_moves=30, symbols=("a", "b"))
+        reduced, stats = P.reduce_nfa(nfa)
+        trimmed = P.trim_nfa(nfa)
+        edges = [(s, a, d) for s, row in trimmed["table"].items() for a, targets in row.items() for d in targets]
+        assert stats["states_after"] == naive_bisimulation_classes(trimmed["states"], edges, trimmed["final_states"])
+        for word in WORDS:
+            assert nfa_accepts(reduced, word) == nfa_accepts(nfa, word)
+
+
+def test_remove_epsilon_preserves_language():
+    rng = random.Random(5)
+    for _ in range(200):
+        nfa = random_nfa(rng, max_states=10, max_moves=25, symbols=("a", "b", "ε", "e", "epsilon"))
+        epsilon_free = P.remove_epsilon(nfa) # Every spelling in EPSILON_SYMBOLS by default
+        assert not any(symbol in P.EPSILON_SYMBOLS for row in epsilon_free["table"].values() for symbol in row)
+        for word in WORDS:
+            assert nfa_accepts(epsilon_free, word) == nfa_accepts(nfa, word)
+
+
+def test_determinize_with_reduce_keeps_language():
+    rng = random.Random(21)
+    for _ in range(60):
+        nfa = P.regex_to_nfa(P._random_regex(rng, ["a", "b"], 4))
+        assert P.dfa_equivalence_witness(P.determinize_nfa(nfa, reduce=True), P.determinize_nfa(nfa)) is None
+
+
+def test_compressed_dfa_round_trip_and_lookup(tmp_path):
+    rng = random.Random(3)
+    for case in range(100):
+        names = [str(i) for i in range(rng.randint(1, 30))]
+        alphabet = [chr(97 + i) for i in range(rng.randint(1, 6))]
+        transitions = {s: {a: rng.choice(names[:3]) for a in alphabet if rng.random() < 0.8} for s in names}
+        dfa = {"states": set(names), "alphabet": set(alphabet), "transitions": transitions,
+               "start_state": "0", "final_states": {s for s in names if rng.random() < 0.3}}
+        if case % 3 == 0:
+            dfa["labels"] = {s: frozenset({1}) for s in dfa["final_states"]}
+        compressed = P.CompressedDFA.from_dfa(dfa)
+        for state in names:
+            for symbol in alphabet + ["z"]:
+                assert compressed.lookup(state, symbol) == transitions[state].get(symbol)
+        restored = compressed.to_dfa()
+        assert restored["transitions"] == transitions
+        assert restored["final_states"] == dfa["final_states"]
+        for _ in range(20):
+            word = "".join(rng.choice(alphabet + ["z"]) for _ in range(rng.randint(0, 8)))
+            assert compressed.accepts(word) == P.dfa_accepts(dfa, word)
+
+        path = str(tmp_path / f"c{case}.json.gz")
+        compressed.save(path)
+        assert P.CompressedDFA.load(path).to_dfa() == restored
+
+
+def cached_conversion(pattern):
+    nfa = P.regex_to_nfa(pattern)
+    return nfa, sorted(nfa["alphabet"]), P.determinize_nfa(nfa)
+
+
+def test_conversion_cache_hit_matches_fresh_conversion(tmp_path):
+    nfa, alphabet, dfa = cached_conversion("(a|b)*abb")
+    key = P.nfa_fingerprint(nfa, ["epsilon-free"])
+    P.ConversionCache(str(tmp_path)).store(key, alphabet, dfa)
+    # A new cache (a later session) has nothing in memory and reads the file
+    hit = P.ConversionCache(str(tmp_path)).get(key)
+    assert hit == (alphabet, P.determinize_nfa(P.regex_to_nfa("(a|b)*abb")))
+
+
+def test_conversion_cache_misses_after_an_edit(tmp_path):
+    nfa, alphabet, dfa = cached_conversion("(a|b)*abb")
+    cache = P.ConversionCache(str(tmp_path))
+    key = P.nfa_fingerprint(nfa, ["epsilon-free"])
+    cache.store(key, alphabet, dfa)
+    cache.put(key, alphabet, dfa)
+
+    nfa["table"]["1"].setdefault("a", set()).add("1")
+    assert P.nfa_fingerprint(nfa, ["epsilon-free"]) != key
+    assert cache.get(P.nfa_fingerprint(nfa, ["epsilon-free"])) is None
+    nfa["table"]["1"]["a"].discard("1")
+    if not nfa["table"]["1"]["a"]:
+        del nfa["table"]["1"]["a"]
+    assert P.nfa_fingerprint(nfa, ["epsilon-free"]) == key
+    assert cache.get(P.nfa_fingerprint(nfa, ["epsilon-free", "reduce"])) is None # Options are part of the key
+
+
+def test_conversion_cache_evicts_least_recently_used(tmp_path):
+    entries = [cached_conversion(p) for p in ("a", "ab", "abc", "abcd")]
+    keys = [f"{i:064x}" for i in range(4)]
+    measure = P.ConversionCache(str(tmp_path / "measure"))
+    for key, (_, alphabet, dfa) in zip(keys, entries):
+        measure.store(key, alphabet, dfa)
+    sizes = [os.path.getsize(measure._path(key)) for key in keys]
+
+    store = tmp_path / "store"
+    cache = P.ConversionCache(str(store), max_bytes=sizes[0] + sizes[2] + sizes[3]) # Room for three of the four
+    for i, (_, alphabet, dfa) in enumerate(entries[:3]):
+        cache.store(keys[i], alphabet, dfa)
+        os.utime(cache._path(keys[i]), (1000 + i, 1000 + i))
+    assert P.ConversionCache(str(store)).get(keys[0]) is not None # Now the most recently used
+    cache.store(keys[3], entries[3][1], entries[3][2])
+    assert sorted(os.listdir(store)) == [f"{keys[i]}.json.gz" for i in (0, 2, 3)]
+
+    memory = P.ConversionCache(memory_entries=2)
+    for key, (_, alphabet, dfa) in zip(keys, entries):
+        memory.put(key, alphabet, dfa)
+    assert list(memory.memory) == keys[2:]
+
+
+@pytest.mark.parametrize("content", [b"", b"not gzip at all", gzip.compress(b'{"alphabet": ["a"'),
+                                     gzip.compress(b"[1, 2, 3]"), gzip.compress(b'{"alphabet": 5}'),
+                                     gzip.compress(b"x" * 100000)[:50]],
+                         ids=["empty", "not-gzip", "truncated-json", "not-an-object", "wrong-types", "truncated-gzip"])
+def test_conversion_cache_ignores_corrupt_files(tmp_path, content):
+    cache = P.ConversionCache(str(tmp_path))
+    key = "f" * 64
+    with open(cache._path(key), "wb") as f:
+        f.write(content)
+    assert cache.get(key) is None
+    assert not os.path.exists(cache._path(key))
+
+
+def test_conversion_cache_without_directory_stays_in_memory(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.delenv("PROGRAM1_CACHE_DIR", raising=False)
+    nfa, alphabet, dfa = cached_conversion("ab*")
+    cache = P.ConversionCache()
+    cache.store("0" * 64, alphabet, dfa)
+    assert cache.get("0" * 64) is None and os.listdir(tmp_path) == []
+    assert P.default_cache_directory() == os.path.join(str(tmp_path), ".program1-cache")
+    monkeypatch.setenv("PROGRAM1_CACHE_DIR", str(tmp_path / "elsewhere"))
+    assert P.default_cache_directory() == str(tmp_path / "elsewhere")
+
+
+@pytest.mark.parametrize("export_name", ["OUTPUT1.json", "OUTPUT1.json.gz"])
+def test_watch_ignores_exports_still_being_written(tmp_path, export_name):
+    partial = P.temporary_path(str(tmp_path / export_name))
+    assert partial.endswith(".gz") == export_name.endswith(".gz")
+    assert P._watch_output_name(os.path.basename(partial)) is None
+    with P.open_automaton_file(partial, "w") as f:
+        f.write('{"alphabet": ["a"], "states": [')
+    manifest = {}
+    counts = P.sync_watch_directory(str(tmp_path), manifest, log=lambda message: None)
+    assert counts["minimized"] == counts["failed"] == 0 and manifest == {}
+    assert os.listdir(tmp_path) == [os.path.basename(partial)]